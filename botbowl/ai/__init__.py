@@ -1,6 +1,7 @@
 from gym.envs.registration import register
 
-from .env import BotBowlEnv, EnvConf, BotBowlWrapper, RewardWrapper, ScriptedActionWrapper, PPCGWrapper
+from .env import BotBowlEnv, EnvConf, SyncBotBowlVecEnv, BotBowlWrapper, RewardWrapper, ScriptedActionWrapper, \
+    PPCGWrapper, FactorizedActionMask
 from .layers import *
 from .registry import *
 from .competition import *
@@ -0,0 +1,157 @@
+"""
+This module contains a codec that compresses the observations of BotBowlEnv into compact byte arrays, e.g. for replay
+buffers or for sending observations between processes.
+"""
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from botbowl.ai.env import BotBowlEnv, EnvObs
+
+
+class ObsCodec:
+    """
+    Encodes observations as one uint8 array per observation. Binary layers and the action mask are stored as bits,
+    layers whose values are multiples of a small step, see FeatureLayer.value_step(), as one byte per square and the
+    remaining layers and the non-spatial observation as floats. The spatial observations of an observation with
+    shape=(44, 17, 28) thus take about 8 KB instead of 84 KB as float32 or 168 KB as float64.
+
+    Decoding returns float32 observations in [0, 1], also for integer obs_dtypes. Observations with obs_dtype=np.float32
+    are decoded exactly, unless float_dtype is smaller.
+    """
+
+    def __init__(self, env: BotBowlEnv, float_dtype=np.float32):
+        """
+        :param env: the environment that produces the observations.
+        :param float_dtype: dtype used to store the layers that are neither binary nor small multiples of a step, and
+                            the non-spatial observation. np.float16 halves their size at the cost of precision.
+        """
+        layers = env.env_conf.layers
+        steps = [layer.value_step() for layer in layers]
+        self._set_schema({
+            'height': env.height,
+            'width': env.width,
+            'num_layers': len(layers),
+            'num_non_spatial': env.num_non_spatial_observables,
+            'num_actions': env.num_actions,
+            'obs_dtype': env.env_conf.obs_dtype.name,
+            'float_dtype': np.dtype(float_dtype).name,
+            'binary_layers': [i for i, layer in enumerate(layers) if layer.is_binary()],
+            'small_int_layers': [i for i, layer in enumerate(layers) if not layer.is_binary() and steps[i] is not None],
+            'value_steps': [steps[i] for i, layer in enumerate(layers) if not layer.is_binary() and steps[i] is not None],
+            'float_layers': [i for i, layer in enumerate(layers) if not layer.is_binary() and steps[i] is None]
+        })
+
+    @staticmethod
+    def from_schema(schema: Dict[str, Any]) -> 'ObsCodec':
+        """
+        Creates a codec from the schema of another codec, e.g. to decode stored observations without an environment.
+        """
+        codec = ObsCodec.__new__(ObsCodec)
+        codec._set_schema(schema)
+        return codec
+
+    def get_schema(self) -> Dict[str, Any]:
+        """
+        :return: a json-serializable description of the encoding, see from_schema().
+        """
+        return dict(self._schema)
+
+    def _set_schema(self, schema: Dict[str, Any]) -> None:
+        self._schema = schema
+        self.obs_dtype = np.dtype(schema['obs_dtype'])
+        self.obs_max = 1 if np.issubdtype(self.obs_dtype, np.floating) else np.iinfo(self.obs_dtype).max
+        self.float_dtype = np.dtype(schema['float_dtype'])
+        self.num_layers = schema['num_layers']
+        self.height = schema['height']
+        self.width = schema['width']
+        self.num_non_spatial = schema['num_non_spatial']
+        self.num_actions = schema['num_actions']
+        self.binary_layers = np.array(schema['binary_layers'], dtype=int)
+        self.small_int_layers = np.array(schema['small_int_layers'], dtype=int)
+        self.float_layers = np.array(schema['float_layers'], dtype=int)
+        self._steps = np.array(schema['value_steps'], dtype=np.float64)
+        # Decoding looks up the values, computed as the layers do, so float32 observations are restored exactly
+        self._value_tables = (np.arange(256)[None, :] * self._steps[:, None]).astype(np.float32)
+
+        squares = self.height * self.width
+        sizes = [
+            (len(self.binary_layers) * squares + 7) // 8,
+            len(self.small_int_layers) * squares,
+            len(self.float_layers) * squares * self.float_dtype.itemsize,
+            self.num_non_spatial * self.float_dtype.itemsize,
+            (self.num_actions + 7) // 8
+        ]
+        self._offsets = np.cumsum([0] + sizes)
+        self.code_size = int(self._offsets[-1])
+
+    def encode(self, obs: EnvObs) -> np.ndarray:
+        """
+        :param obs: spatial observation, non-spatial observation and action mask as returned by BotBowlEnv.get_state().
+        :return: uint8 array with shape=(code_size,).
+        """
+        spatial_obs, non_spatial_obs, action_mask = obs
+        return self.encode_batch(spatial_obs[None], non_spatial_obs[None], action_mask[None])[0]
+
+    def encode_batch(self, spatial_obs: np.ndarray, non_spatial_obs: np.ndarray, action_mask: np.ndarray) -> np.ndarray:
+        """
+        :param spatial_obs: shape=(batch_size, num_layers, height, width)
+        :param non_spatial_obs: shape=(batch_size, num_non_spatial_observations)
+        :param action_mask: shape=(batch_size, action_space)
+        :return: uint8 array with shape=(batch_size, code_size).
+        """
+        n = len(spatial_obs)
+        codes = np.empty((n, self.code_size), dtype=np.uint8)
+        o = self._offsets
+
+        codes[:, o[0]:o[1]] = np.packbits(spatial_obs[:, self.binary_layers].reshape(n, -1) > 0, axis=1)
+
+        small_values = spatial_obs[:, self.small_int_layers].astype(np.float64)
+        small_values *= 1 / (self.obs_max * self._steps)[None, :, None, None]
+        codes[:, o[1]:o[2]] = np.rint(small_values, out=small_values).reshape(n, -1)
+
+        codes[:, o[2]:o[3]] = self._to_float(spatial_obs[:, self.float_layers]).reshape(n, -1).view(np.uint8)
+        codes[:, o[3]:o[4]] = self._to_float(non_spatial_obs).view(np.uint8)
+        codes[:, o[4]:o[5]] = np.packbits(action_mask, axis=1)
+        return codes
+
+    def decode(self, code: np.ndarray) -> EnvObs:
+        """
+        :param code: uint8 array with shape=(code_size,).
+        :return: float32 spatial observation, float32 non-spatial observation and action mask.
+        """
+        spatial_obs, non_spatial_obs, action_mask = self.decode_batch(code[None])
+        return spatial_obs[0], non_spatial_obs[0], action_mask[0]
+
+    def decode_batch(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param codes: uint8 array with shape=(batch_size, code_size).
+        :return: float32 spatial observations with shape=(batch_size, num_layers, height, width), float32 non-spatial
+                 observations with shape=(batch_size, num_non_spatial_observations) and action masks with
+                 shape=(batch_size, action_space).
+        """
+        n = len(codes)
+        o = self._offsets
+        squares = self.height * self.width
+        spatial_obs = np.empty((n, self.num_layers, self.height, self.width), dtype=np.float32)
+
+        bits = np.unpackbits(codes[:, o[0]:o[1]], axis=1, count=len(self.binary_layers) * squares)
+        spatial_obs[:, self.binary_layers] = bits.reshape(n, len(self.binary_layers), self.height, self.width)
+
+        small_codes = codes[:, o[1]:o[2]].reshape(n, len(self.small_int_layers), self.height, self.width)
+        table_idx = np.arange(len(self.small_int_layers))[None, :, None, None]
+        spatial_obs[:, self.small_int_layers] = self._value_tables[table_idx, small_codes]
+
+        spatial_obs[:, self.float_layers] = self._from_float(codes[:, o[2]:o[3]]).reshape(
+            n, len(self.float_layers), self.height, self.width)
+        non_spatial_obs = self._from_float(codes[:, o[3]:o[4]]).astype(np.float32)
+        action_mask = np.unpackbits(codes[:, o[4]:o[5]], axis=1, count=self.num_actions).astype(bool)
+        return spatial_obs, non_spatial_obs, action_mask
+
+    def _to_float(self, values: np.ndarray) -> np.ndarray:
+        if self.obs_max == 1:
+            return np.ascontiguousarray(values, dtype=self.float_dtype)
+        return (values / np.float32(self.obs_max)).astype(self.float_dtype)
+
+    def _from_float(self, code_bytes: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(code_bytes).view(self.float_dtype)
@@ -0,0 +1,237 @@
+"""
+This module contains tools for starting episodes from game states collected from other games, e.g. to train on drives
+without playing through the coin toss, setup and kick-off first, and to weight the starting points as a curriculum.
+"""
+import io
+import pickle
+import time
+import uuid
+from typing import Callable, Optional, Sequence, Union
+
+import numpy as np
+
+import botbowl.core.procedure as procedures
+from botbowl.core import Game, Agent, load_arena
+from botbowl.core.forward_model import Trajectory
+from botbowl.ai.env import BotBowlEnv, BotBowlWrapper, EnvConf, EnvObs
+from botbowl.ai.registry import make_bot
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """
+    Pickles a game without the objects it shares with other games and without its agents, which are replaced when the
+    snapshot is restored.
+    """
+
+    def __init__(self, file, game: Game):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.persistent_ids = {id(game.arena): 'arena', id(game.config): 'config', id(game.ruleset): 'ruleset',
+                               id(game.home_agent): 'home_agent', id(game.away_agent): 'away_agent',
+                               id(game.trajectory): 'trajectory'}
+
+    def persistent_id(self, obj):
+        return self.persistent_ids.get(id(obj))
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+
+    def __init__(self, file, shared_objects):
+        super().__init__(file)
+        self.shared_objects = dict(shared_objects, trajectory=Trajectory())
+
+    def persistent_load(self, pid):
+        return self.shared_objects[pid]
+
+
+class StartStatePool:
+    """
+    A pool of game states to start episodes from. The states are stored as compact snapshots that are restored by
+    unpickling, which is much faster than playing to the same state from the start of a game. Each state has a weight
+    that sets how often it is sampled, which can be changed during training to form a curriculum.
+    """
+
+    def __init__(self):
+        self.snapshots = []
+        self.snapshot_times = []
+        self.weights = np.zeros(0)
+        self.arena = None
+        self.config = None
+        self.ruleset = None
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def add(self, game: Game, weight: float = 1.0) -> int:
+        """
+        Adds the current state of the game, which must wait for an action. The games in a pool must use the same arena,
+        config and ruleset, the restored games share those of the first game.
+        :return: the index of the state.
+        """
+        assert not game.state.game_over
+        if self.arena is None:
+            self.arena, self.config, self.ruleset = game.arena, game.config, game.ruleset
+        file = io.BytesIO()
+        _SnapshotPickler(file, game).dump(game)
+        self.snapshots.append(file.getvalue())
+        self.snapshot_times.append(time.time())
+        self.weights = np.append(self.weights, weight)
+        return len(self.snapshots) - 1
+
+    def set_weights(self, weights: Union[Sequence[float], np.ndarray]) -> None:
+        """
+        :param weights: the new weight of each state, e.g. higher for the states where the learner does badly.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        assert weights.shape == self.weights.shape
+        self.weights = weights
+
+    def sample(self, rnd: np.random.RandomState) -> int:
+        """
+        :return: the index of a state, sampled in proportion to the weights.
+        """
+        return int(rnd.choice(len(self.snapshots), p=self.weights / self.weights.sum()))
+
+    def restore(self, idx: int, home_agent: Agent, away_agent: Agent, seed: Optional[int] = None) -> Game:
+        """
+        Creates a new game in the state with the given index. The bots among the agents are not asked for an action, so
+        the game may still wait for one of them.
+        :param seed: the new seed of the game's dice. If None, the game continues with the dice of the collected game.
+        """
+        shared_objects = {'arena': self.arena, 'config': self.config, 'ruleset': self.ruleset,
+                          'home_agent': home_agent, 'away_agent': away_agent}
+        game = _SnapshotUnpickler(io.BytesIO(self.snapshots[idx]), shared_objects).load()
+        game.game_id = str(uuid.uuid1())
+        # The clocks continue from the time they had when the state was added
+        elapsed = time.time() - self.snapshot_times[idx]
+        for clock in game.state.clocks:
+            clock.started_at += elapsed
+            if clock.paused_at is not None:
+                clock.paused_at += elapsed
+        if seed is not None:
+            game.set_seed(seed)
+        if not away_agent.human:
+            away_agent.new_game(game, game.state.away_team)
+        if not home_agent.human:
+            home_agent.new_game(game, game.state.home_team)
+        return game
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'StartStatePool':
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+
+
+class TurnStartCollector(Agent):
+    """
+    Plays for a bot and adds the game state at the start of each of the bot's turns to a StartStatePool. It has the same
+    id as the bot, so bots that look up their team with game.get_agent_team(self) still work.
+    """
+
+    def __init__(self, bot: Agent, pool: StartStatePool, weight_func: Optional[Callable[[Game], float]] = None):
+        """
+        :param weight_func: computes the weight of a state, e.g. from the turn or the position of the ball. By default
+                            all states have weight 1.
+        """
+        super().__init__(bot.name, human=False, agent_id=bot.agent_id)
+        self.bot = bot
+        self.pool = pool
+        self.weight_func = weight_func
+        self.collected_turn = None
+
+    def new_game(self, game, team):
+        self.collected_turn = None
+        self.bot.new_game(game, team)
+
+    def act(self, game):
+        proc = game.get_procedure()
+        if type(proc) is procedures.Turn and not proc.blitz and not proc.quick_snap and proc is not self.collected_turn:
+            self.collected_turn = proc
+            self.pool.add(game, 1.0 if self.weight_func is None else self.weight_func(game))
+        return self.bot.act(game)
+
+    def end_game(self, game):
+        self.bot.end_game(game)
+
+
+def collect_start_states(bot_ids: Sequence[str], num_games: int, env_conf: Optional[EnvConf] = None,
+                         collect_home: bool = True, collect_away: bool = False,
+                         weight_func: Optional[Callable[[Game], float]] = None, seed: int = 0,
+                         pool: Optional[StartStatePool] = None) -> StartStatePool:
+    """
+    Plays games between two registered bots and collects the states at the start of their turns, see TurnStartCollector.
+    :param bot_ids: the ids of the home and away bot in the bot registry.
+    :param env_conf: the EnvConf of the environments that will start from the states.
+    :param collect_home: collect the states at the start of the home team's turns.
+    :param collect_away: collect the states at the start of the away team's turns.
+    :param seed: the seed of the first game, the following games use the next seeds.
+    :param pool: the pool to add the states to. If None, a new pool is created.
+    :return: the pool.
+    """
+    if pool is None:
+        pool = StartStatePool()
+    env = BotBowlEnv(env_conf, home_agent='human', away_agent='human')
+    arena = load_arena(env.env_conf.config.arena)
+    for game_seed in range(seed, seed + num_games):
+        home_agent, away_agent = make_bot(bot_ids[0]), make_bot(bot_ids[1])
+        if collect_home:
+            home_agent = TurnStartCollector(home_agent, pool, weight_func)
+        if collect_away:
+            away_agent = TurnStartCollector(away_agent, pool, weight_func)
+        game = Game(game_id=str(uuid.uuid1()),
+                    home_team=env.home_team,
+                    away_team=env.away_team,
+                    home_agent=home_agent,
+                    away_agent=away_agent,
+                    config=env.env_conf.config,
+                    arena=arena,
+                    ruleset=env.ruleset,
+                    seed=game_seed)
+        game.init()
+    return pool
+
+
+class StartStateWrapper(BotBowlWrapper):
+    """
+    Starts episodes from the states of a StartStatePool instead of from the start of a game. If the restored state waits
+    for a bot, e.g. the away bot, it is played until an action from a human agent is needed, and if the game ends
+    before that the episode starts from the start of a game instead. Since the restored game replaces the reset of the
+    environment, the wrapper must wrap the BotBowlEnv directly; other wrappers can wrap it.
+    """
+    pool: StartStatePool
+    start_state_prob: float
+    start_state_idx: Optional[int]
+
+    def __init__(self, env: BotBowlEnv, pool: StartStatePool, start_state_prob: float = 1.0):
+        """
+        :param start_state_prob: the probability that an episode starts from a state in the pool. The other episodes
+                                 start from the start of a game.
+        """
+        if type(env) is not BotBowlEnv:
+            raise TypeError("StartStateWrapper must wrap a BotBowlEnv directly, put the other wrappers around it")
+        super().__init__(env)
+        self.pool = pool
+        self.start_state_prob = start_state_prob
+        self.start_state_idx = None
+
+    def reset(self) -> EnvObs:
+        root_env = self.root_env
+        if len(self.pool) == 0 or root_env.rnd.rand() >= self.start_state_prob:
+            self.start_state_idx = None
+            return self.env.reset()
+
+        self.start_state_idx = self.pool.sample(root_env.rnd)
+        game = self.pool.restore(self.start_state_idx,
+                                 home_agent=BotBowlEnv._create_agent(root_env.home_agent),
+                                 away_agent=BotBowlEnv._create_agent(root_env.away_agent),
+                                 seed=root_env.rnd.randint(0, 2 ** 31))
+        while not game.state.game_over and not game.actor.human:
+            game.step(game.actor.act(game))
+        if game.state.game_over:
+            self.start_state_idx = None
+            return self.env.reset()
+        root_env.game = game
+        return root_env.get_state()
@@ -0,0 +1,394 @@
+"""
+This module contains tools for generating training data, e.g. for imitation learning, by letting bots play against each
+other and storing their decisions as observations and action indices in memory-mapped shards on disk. The observations are
+stored as ObsCodec codes.
+"""
+import copy
+import json
+import os
+import pickle
+import uuid
+from multiprocessing import Pool
+from typing import List, Optional, Tuple, Iterator, Dict, Any, Callable
+
+import numpy as np
+
+from botbowl.core import Game, Agent, Action, ActionType, Square, Replay
+from botbowl.ai.codec import ObsCodec
+from botbowl.ai.env import BotBowlEnv, EnvConf
+from botbowl.ai.registry import make_bot
+
+INDEX_FILENAME = 'index.json'
+SHARD_ARRAYS = ['codes', 'action_idx']
+
+
+def create_schema(env: BotBowlEnv) -> Dict[str, Any]:
+    """
+    :return: the names of the feature layers and the schema of the ObsCodec that encodes the observations of the given
+             environment in a dataset, see ObsCodec.get_schema().
+    """
+    return dict(ObsCodec(env).get_schema(), layers=[layer.name() for layer in env.env_conf.layers])
+
+
+class ShardWriter:
+    """
+    Appends samples of (spatial observation, non-spatial observation, action mask, action index) to fixed-size
+    memory-mapped .npy shards. The observations are encoded with the ObsCodec of the schema. The shards are named
+    <prefix>_<number> and each consists of one file per array in SHARD_ARRAYS. The last shard is only partly filled, so
+    the readers use the number of samples of each shard returned by close().
+    """
+
+    def __init__(self, directory: str, schema: Dict[str, Any], prefix: str, shard_size: int = 10000):
+        self.directory = directory
+        self.schema = schema
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.shards = []
+        self.arrays = None
+        self.num_samples = 0
+        self.codec = ObsCodec.from_schema(schema)
+        os.makedirs(directory, exist_ok=True)
+
+    def _shapes(self) -> Dict[str, Tuple[Tuple[int, ...], np.dtype]]:
+        return {
+            'codes': ((self.shard_size, self.codec.code_size), np.uint8),
+            'action_idx': ((self.shard_size,), np.int32)
+        }
+
+    def _open_shard(self) -> None:
+        name = f"{self.prefix}_{len(self.shards):05d}"
+        self.shards.append({'name': name, 'num_samples': 0})
+        self.arrays = {key: np.lib.format.open_memmap(os.path.join(self.directory, f"{name}.{key}.npy"),
+                                                      mode='w+', dtype=dtype, shape=shape)
+                       for key, (shape, dtype) in self._shapes().items()}
+        self.num_samples = 0
+
+    def _flush_shard(self) -> None:
+        name = self.shards[-1]['name']
+        arrays = self.arrays
+        self.arrays = None
+        for key in SHARD_ARRAYS:
+            array = arrays.pop(key)
+            array.flush()
+            if self.num_samples < self.shard_size:
+                # Shrink the last shard to the written samples
+                samples = np.array(array[:self.num_samples])
+                del array
+                np.save(os.path.join(self.directory, f"{name}.{key}.npy"), samples)
+        self.shards[-1]['num_samples'] = self.num_samples
+
+    def append(self, spatial_obs: np.ndarray, non_spatial_obs: np.ndarray, action_mask: np.ndarray,
+               action_idx: int) -> None:
+        if self.arrays is None:
+            self._open_shard()
+        i = self.num_samples
+        self.arrays['codes'][i] = self.codec.encode((spatial_obs, non_spatial_obs, action_mask))
+        self.arrays['action_idx'][i] = action_idx
+        self.num_samples += 1
+        if self.num_samples == self.shard_size:
+            self._flush_shard()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        :return: the name and number of samples of each written shard.
+        """
+        if self.arrays is not None:
+            self._flush_shard()
+        return self.shards
+
+
+def write_index(directory: str, schema: Dict[str, Any], shards: List[Dict[str, Any]]) -> None:
+    index = dict(schema, shards=shards)
+    with open(os.path.join(directory, INDEX_FILENAME), 'w') as f:
+        json.dump(index, f, indent=2)
+
+
+class ShardDataset:
+    """
+    Reads a dataset written by ShardWriter, e.g. by generate_dataset(). The shards are memory-mapped, so only the
+    samples that are accessed are read from disk.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILENAME)) as f:
+            self.index = json.load(f)
+        self.shards = self.index['shards']
+        self.offsets = np.cumsum([0] + [shard['num_samples'] for shard in self.shards])
+        self.codec = ObsCodec.from_schema({key: value for key, value in self.index.items()
+                                           if key not in ('layers', 'shards', 'num_skipped')})
+        self._arrays = {}
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __getitem__(self, idx: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"Sample {idx} is out of range for a dataset of {len(self)} samples")
+        shard_idx = int(np.searchsorted(self.offsets, idx, side='right')) - 1
+        i = idx - self.offsets[shard_idx]
+        spatial_obs, non_spatial_obs, action_mask, action_idx = self.get_shard_batch(shard_idx, i, i + 1)
+        return spatial_obs[0], non_spatial_obs[0], action_mask[0], int(action_idx[0])
+
+    def _get_arrays(self, shard_idx: int) -> Dict[str, np.ndarray]:
+        if shard_idx not in self._arrays:
+            name = self.shards[shard_idx]['name']
+            self._arrays[shard_idx] = {key: np.load(os.path.join(self.directory, f"{name}.{key}.npy"), mmap_mode='r')
+                                       for key in SHARD_ARRAYS}
+        return self._arrays[shard_idx]
+
+    def get_shard_batch(self, shard_idx: int, start: int, stop: int) \
+            -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decodes the samples in [start, stop) of a shard, see ObsCodec.decode_batch().
+        :return: tuple with the float32 spatial observations, the float32 non-spatial observations, the action masks and
+                 the action indices, each with the number of samples as first dimension.
+        """
+        arrays = self._get_arrays(shard_idx)
+        spatial_obs, non_spatial_obs, action_mask = self.codec.decode_batch(arrays['codes'][start:stop])
+        return spatial_obs, non_spatial_obs, action_mask, np.array(arrays['action_idx'][start:stop])
+
+    def iterate(self, batch_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Streams the dataset in order as batches of at most batch_size samples, see get_shard_batch(). Batches don't span
+        shards.
+        """
+        for shard_idx, shard in enumerate(self.shards):
+            for start in range(0, shard['num_samples'], batch_size):
+                yield self.get_shard_batch(shard_idx, start, min(start + batch_size, shard['num_samples']))
+
+
+def record_decision(env: BotBowlEnv, writer: ShardWriter, action: Action) -> bool:
+    """
+    Appends the observation of env.game and the index of the action that the active team takes in it to the writer.
+    :return: False if the action is not in the action space of the environment and wasn't recorded.
+    """
+    action_idx = env.action_to_idx(action)
+    if action_idx is None:
+        return False
+    spatial_obs, non_spatial_obs, action_mask = env.get_state()
+    writer.append(spatial_obs, non_spatial_obs, action_mask, action_idx)
+    return True
+
+
+class RecordingAgent(Agent):
+    """
+    Plays for a bot and appends the observation and action index of each of the bot's decisions to a ShardWriter. It has
+    the same id as the bot, so bots that look up their team with game.get_agent_team(self) still work.
+    """
+
+    def __init__(self, bot: Agent, env: BotBowlEnv, writer: ShardWriter):
+        super().__init__(bot.name, human=False, agent_id=bot.agent_id)
+        self.bot = bot
+        self.env = env
+        self.writer = writer
+        self.num_skipped = 0
+
+    def new_game(self, game, team):
+        self.bot.new_game(game, team)
+
+    def act(self, game):
+        action = self.bot.act(game)
+        if type(action) == Action and not record_decision(self.env, self.writer, action):
+            self.num_skipped += 1
+        return action
+
+    def end_game(self, game):
+        self.bot.end_game(game)
+
+
+def _generate_shards(args) -> Tuple[List[Dict[str, Any]], int]:
+    directory, bot_ids, game_seeds, env_conf, shard_size, prefix = args
+    env = BotBowlEnv(env_conf, home_agent='human', away_agent='human')
+    writer = ShardWriter(directory, create_schema(env), prefix, shard_size)
+    num_skipped = 0
+    for seed in game_seeds:
+        home_agent = RecordingAgent(make_bot(bot_ids[0]), env, writer)
+        away_agent = RecordingAgent(make_bot(bot_ids[1]), env, writer)
+        env.game = Game(game_id=str(uuid.uuid1()),
+                        home_team=env.home_team,
+                        away_team=env.away_team,
+                        home_agent=home_agent,
+                        away_agent=away_agent,
+                        config=env.env_conf.config,
+                        ruleset=env.ruleset,
+                        seed=int(seed))
+        env.game.init()
+        num_skipped += home_agent.num_skipped + away_agent.num_skipped
+    return writer.close(), num_skipped
+
+
+def generate_dataset(directory: str, bot_ids: Tuple[str, str], num_games: int, env_conf: Optional[EnvConf] = None,
+                     num_processes: int = 1, shard_size: int = 10000, seed: int = 0) -> ShardDataset:
+    """
+    Plays games between two registered bots and writes the observation and action index of every decision of both bots
+    to a dataset in directory. The games are split evenly between the processes and each process writes its own shards.
+    Decisions with actions that are not in the action space of env_conf are skipped. With more than one process the
+    bots must be registered in the worker processes too, e.g. by registering them when their module is imported.
+    :param bot_ids: the ids of the home and away bot in the bot registry.
+    :param env_conf: the EnvConf used to encode the observations and actions.
+    :param shard_size: the number of samples per shard.
+    :param seed: the seed of the first game, the following games use the next seeds.
+    :return: the dataset.
+    """
+    if env_conf is None:
+        env_conf = EnvConf()
+    game_seeds = np.arange(seed, seed + num_games)
+    jobs = [(directory, bot_ids, worker_seeds, env_conf, shard_size, f"{worker:03d}")
+            for worker, worker_seeds in enumerate(np.array_split(game_seeds, num_processes))
+            if len(worker_seeds) > 0]
+    if num_processes > 1:
+        with Pool(num_processes) as pool:
+            results = pool.map(_generate_shards, jobs)
+    else:
+        results = [_generate_shards(job) for job in jobs]
+
+    env = BotBowlEnv(env_conf, home_agent='human', away_agent='human')
+    shards = [shard for worker_shards, _ in results for shard in worker_shards]
+    write_index(directory, dict(create_schema(env), num_skipped=sum(num_skipped for _, num_skipped in results)),
+                shards)
+    return ShardDataset(directory)
+
+
+class ReplayAgent(Agent):
+    """
+    Takes the recorded actions of a replay in place of a bot. The actions are shared by both teams and taken in the order
+    they were recorded.
+    """
+
+    def __init__(self, agent_json: Dict[str, Any], actions: Iterator[Dict[str, Any]],
+                 on_action: Callable[[Game, Action], None]):
+        super().__init__(agent_json['name'], human=agent_json['human'], agent_id=agent_json['agent_id'])
+        self.actions = actions
+        self.on_action = on_action
+
+    def new_game(self, game, team):
+        pass
+
+    def act(self, game):
+        action_json = next(self.actions, None)
+        if action_json is None:
+            return None
+        action = action_from_json(game, action_json)
+        self.on_action(game, action)
+        return action
+
+    def end_game(self, game):
+        pass
+
+
+def action_from_json(game: Game, action_json: Dict[str, Any]) -> Action:
+    position = action_json['position']
+    player_id = action_json['player_id']
+    return Action(ActionType[action_json['action_type']],
+                  position=Square(position['x'], position['y']) if position is not None else None,
+                  player=game.get_player(player_id) if player_id is not None else None)
+
+
+def replay_game(replay: Replay, on_action: Callable[[Game, Action], None]) -> Game:
+    """
+    Rebuilds the game that a replay was recorded from and plays its recorded actions. The agents are human or not like in
+    the recorded game, since the available actions depend on it. The game runs in fast mode without clocks.
+    :param on_action: called with the game and the action before each action is taken, except the START_GAME action
+                      that starts games between two bots.
+    :return: the game after the last recorded action.
+    """
+    if replay.seed is None:
+        raise ValueError(f"Replay {replay.replay_id} was recorded without the seed and setup needed to rebuild the game")
+    config = copy.copy(replay.config)
+    config.fast_mode = True
+    config.competition_mode = False
+    actions = iter(replay.actions[idx] for idx in sorted(replay.actions.keys()))
+    home_agent = ReplayAgent(replay.steps[0].game['home_agent'], actions, on_action)
+    away_agent = ReplayAgent(replay.steps[0].game['away_agent'], actions, on_action)
+    game = Game(game_id=replay.replay_id,
+                home_team=replay.home_team,
+                away_team=replay.away_team,
+                home_agent=home_agent,
+                away_agent=away_agent,
+                config=config,
+                arena=replay.arena,
+                ruleset=replay.ruleset,
+                seed=replay.seed)
+    if not home_agent.human and not away_agent.human:
+        next(actions)  # Game.init() takes the START_GAME action
+    game.init()
+    # Actions of human agents, the other agents take theirs inside game.step()
+    while not game.state.game_over:
+        action = home_agent.act(game)
+        if action is None:
+            break
+        game.step(action)
+    return game
+
+
+def _replay_prefix(replay_file: str) -> str:
+    return os.path.splitext(os.path.basename(replay_file))[0]
+
+
+def _convert_replay(args) -> Dict[str, Any]:
+    replay_file, directory, env_conf, shard_size = args
+    prefix = _replay_prefix(replay_file)
+    with open(replay_file, "rb") as f:
+        replay = pickle.load(f)
+    env = BotBowlEnv(env_conf, home_agent='human', away_agent='human')
+    if (replay.arena.height, replay.arena.width) != (env.height, env.width):
+        raise ValueError(f"The arena of {replay_file} doesn't match the board size of the EnvConf")
+    writer = ShardWriter(directory, create_schema(env), prefix, shard_size)
+    num_skipped = 0
+
+    def on_action(game, action):
+        nonlocal num_skipped
+        env.game = game
+        if not record_decision(env, writer, action):
+            num_skipped += 1
+
+    replay_game(replay, on_action)
+    result = {'replay': replay_file, 'shards': writer.close(), 'num_skipped': num_skipped}
+    # The replay is only marked as converted once all its shards are written
+    with open(os.path.join(directory, f"{prefix}.json"), 'w') as f:
+        json.dump(result, f)
+    return result
+
+
+def convert_replays(replay_files: List[str], directory: str, env_conf: Optional[EnvConf] = None,
+                    num_processes: int = 1, shard_size: int = 10000) -> ShardDataset:
+    """
+    Converts replays of recorded games, see Game(record=True), to a dataset of the observation and action index of
+    every decision in the games. Each game is rebuilt from the seed and setup stored in its replay and the recorded
+    actions are applied one by one. The replays are converted in a pool of processes that each write the shards of one
+    replay at a time, named after the replay file. Replays that were converted before, e.g. before the conversion was
+    interrupted, are skipped, so calling this again with the same arguments resumes the conversion.
+    :param replay_files: paths to .rep files written by Replay.dump().
+    :param env_conf: the EnvConf used to encode the observations and actions. Its board size must match the replays.
+    :param shard_size: the number of samples per shard.
+    :return: the dataset.
+    """
+    if env_conf is None:
+        env_conf = EnvConf()
+    os.makedirs(directory, exist_ok=True)
+    prefixes = [_replay_prefix(replay_file) for replay_file in replay_files]
+    if len(set(prefixes)) < len(prefixes):
+        raise ValueError("The names of the replay files must be unique")
+    jobs = [(replay_file, directory, env_conf, shard_size) for replay_file, prefix in zip(replay_files, prefixes)
+            if not os.path.exists(os.path.join(directory, f"{prefix}.json"))]
+    if num_processes > 1:
+        with Pool(num_processes) as pool:
+            for _ in pool.imap_unordered(_convert_replay, jobs):
+                pass
+    else:
+        for job in jobs:
+            _convert_replay(job)
+
+    shards = []
+    num_skipped = 0
+    for prefix in prefixes:
+        with open(os.path.join(directory, f"{prefix}.json")) as f:
+            result = json.load(f)
+        shards.extend(result['shards'])
+        num_skipped += result['num_skipped']
+    env = BotBowlEnv(env_conf, home_agent='human', away_agent='human')
+    write_index(directory, dict(create_schema(env), num_skipped=num_skipped), shards)
+    return ShardDataset(directory)
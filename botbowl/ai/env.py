@@ -13,24 +13,45 @@ from botbowl.ai.env_render import EnvRenderer
 from botbowl.ai.registry import registry as bot_registry
 from botbowl.ai.layers import *
 from botbowl.core.model import *
-from botbowl.core import ActionType, Action, WeatherType, Skill, PlayerActionType, Agent
+from botbowl.core import ActionType, Action, Skill, Agent
 from botbowl.core import Game, load_rule_set, load_config, load_team_by_filename, load_arena, load_formation
 
-from typing import Tuple, Iterable, Union, Callable, List, Optional
+from typing import Tuple, Iterable, Union, Callable, List, Optional, Dict, Any
 import numpy as np
 
 import gym
 import uuid
-from itertools import count
-from copy import deepcopy
 
 EnvObs = Tuple[np.ndarray, np.ndarray, np.ndarray]
 EnvStepReturn = Tuple[EnvObs, float, bool, dict]
 
 
-def take(n: int, iterable) -> None:
-    for _ in range(n):
-        next(iterable)
+class FactorizedActionMask:
+    """
+    The available actions split into the action type and the position, so that a policy can sample the action type
+    first and then the position among the few available ones, without the flat mask over all positional actions.
+    """
+
+    def __init__(self, action_type_mask: np.ndarray, positions: List[np.ndarray]):
+        """
+        :param action_type_mask: boolean array over env_conf.action_types, i.e. the simple action types followed by the
+                                 positional action types. A positional action type is available if it has positions.
+        :param positions: for each positional action type, the sorted square indices y * width + x of its available
+                          positions, in the orientation of the observation.
+        """
+        self.action_type_mask = action_type_mask
+        self.positions = positions
+
+    def to_flat(self, board_squares: int) -> np.ndarray:
+        """
+        :return: the flat action mask, like the one returned by BotBowlEnv.get_state().
+        """
+        num_simple_actions = len(self.action_type_mask) - len(self.positions)
+        action_mask = np.zeros(num_simple_actions + len(self.positions) * board_squares, dtype=bool)
+        action_mask[:num_simple_actions] = self.action_type_mask[:num_simple_actions]
+        for i, positions in enumerate(self.positions):
+            action_mask[num_simple_actions + i * board_squares + positions] = True
+        return action_mask
 
 
 formation_defaults = {1: ['def_spread.txt', 'def_zone.txt', 'off_line.txt', 'off_wedge.txt'],
@@ -48,15 +69,36 @@ class EnvConf:
     action_types: List[Union[ActionType, Formation]]
     layers: List[FeatureLayer]
     procedures: List[procedures.Procedure]
+    non_spatial_features: List[NonSpatialFeature]
     formations: List[Formation]
+    obs_dtype: np.dtype
+    copy_obs: bool
 
     def __init__(self, size=11,
                  extra_formations: Optional[Iterable[Formation]] = None,
                  extra_feature_layers: Optional[Iterable[FeatureLayer]] = None,
-                 pathfinding=False):
+                 extra_non_spatial_features: Optional[Iterable[NonSpatialFeature]] = None,
+                 pathfinding=False,
+                 obs_dtype=np.float32,
+                 copy_obs=True,
+                 legacy_non_spatial=True):
+        """
+        :param extra_non_spatial_features: features added to the non-spatial observation, before the available action
+                                           types.
+        :param obs_dtype: dtype of the spatial and non-spatial observations. Integer dtypes, e.g. np.uint8, store the
+                          observations quantized from [0, 1] to [0, max value of the dtype].
+        :param copy_obs: if False, the observations returned by BotBowlEnv are views of preallocated buffers that are
+                         overwritten by the next observation.
+        :param legacy_non_spatial: if True, the non-spatial observation keeps the layout of earlier versions, so that
+                                   trained models still fit: the opponent apothecary value reads the own team and the
+                                   procedures are followed by a value that is always zero. If False, the opponent
+                                   apothecary value reads the opponent team and the zero value is left out.
+        """
 
         self.config: Configuration = load_config(f"gym-{size}")
         self.config.pathfinding_enabled = pathfinding
+        self.obs_dtype = np.dtype(obs_dtype)
+        self.copy_obs = copy_obs
 
         self.simple_action_types = [
             ActionType.START_GAME,
@@ -167,6 +209,27 @@ class EnvConf:
             procedures.Reroll,
             procedures.Ejection]
 
+        # Non-spatial observation, followed by the available action types
+        self.non_spatial_features = [
+            HalfFeature(),
+            RoundFeature(),
+            WeatherFeature(),
+            OwnTurnFeature(),
+            KickingFirstHalfFeature(),
+            KickingThisDriveFeature(),
+            DugoutFeature(own=True),
+            DugoutFeature(own=False),
+            TeamStateFeature(own=True),
+            TeamStateFeature(own=False, legacy_apothecaries=legacy_non_spatial),
+            TurnFeature(),
+            PlayerActionTypeFeature(),
+            ProcedureFeature(self.procedures)
+        ]
+        if legacy_non_spatial:
+            self.non_spatial_features.append(PaddingFeature())
+        if extra_non_spatial_features is not None:
+            self.non_spatial_features.extend(extra_non_spatial_features)
+
 
 class BotBowlEnv(gym.Env):
     """
@@ -186,6 +249,17 @@ class BotBowlEnv(gym.Env):
     away_team: Team
     num_non_spatial_observables: int
     _renderer: Optional['EnvRenderer']
+    _spatial_obs: np.ndarray
+    _spatial_scratch: np.ndarray
+    _non_spatial_obs: Optional[np.ndarray]
+    _non_spatial_scratch: Optional[np.ndarray]
+    _action_mask: np.ndarray
+    _positional_mask: np.ndarray
+    _simple_action_idx: Dict[Any, int]
+    _positional_action_idx: Dict[ActionType, int]
+    _action_type_obs_idx: Dict[ActionType, List[int]]
+    _formation_obs_idx: List[int]
+    _other_team_buffers: Optional[Dict[str, Any]]
 
     def __init__(self, env_conf=None, seed: int = None, home_agent='human', away_agent='random'):
 
@@ -206,7 +280,32 @@ class BotBowlEnv(gym.Env):
         self.width = arena.width
         self.height = arena.height
         self.board_squares = self.width * self.height
-        self.num_non_spatial_observables = None
+
+        # Observation buffers
+        obs_dtype = self.env_conf.obs_dtype
+        self._spatial_obs = np.zeros((len(self.env_conf.layers), self.height, self.width), dtype=obs_dtype)
+        self._spatial_scratch = self._spatial_obs if self._is_float_obs() else \
+            np.zeros(self._spatial_obs.shape, dtype=np.float32)
+        self._allocate_non_spatial_buffers()
+        self._other_team_buffers = None
+        num_positional_actions = len(self.env_conf.positional_action_types) * self.board_squares
+        self.num_actions = len(self.env_conf.simple_action_types) + num_positional_actions
+        self._action_mask = np.zeros(self.num_actions, dtype=bool)
+        self._positional_mask = np.zeros((len(self.env_conf.positional_action_types), self.height, self.width),
+                                         dtype=bool)
+        self._simple_action_idx = {}
+        for i, action_type in enumerate(self.env_conf.simple_action_types):
+            self._simple_action_idx.setdefault(action_type, i)
+        self._positional_action_idx = {}
+        for i, action_type in enumerate(self.env_conf.positional_action_types):
+            self._positional_action_idx.setdefault(action_type, i)
+        self._action_type_obs_idx = {}
+        self._formation_obs_idx = []
+        for i, action_type in enumerate(self.env_conf.action_types):
+            if isinstance(action_type, Formation):
+                self._formation_obs_idx.append(i)
+            else:
+                self._action_type_obs_idx.setdefault(action_type, []).append(i)
 
         # Gym stuff
         self._seed = np.random.randint(0, 2 ** 31) if seed is None else seed
@@ -215,7 +314,9 @@ class BotBowlEnv(gym.Env):
         # Setup gym shapes
         spat_obs, _, _ = self.reset()
         self.action_space = gym.spaces.Discrete(len(self.env_conf.action_types))
-        self.observation_space = gym.spaces.Box(low=0, high=1, shape=spat_obs.shape)
+        obs_high = 1 if self._is_float_obs() else np.iinfo(self.env_conf.obs_dtype).max
+        self.observation_space = gym.spaces.Box(low=0, high=obs_high, shape=spat_obs.shape,
+                                                dtype=self.env_conf.obs_dtype)
 
         self._renderer = None
 
@@ -228,126 +329,261 @@ class BotBowlEnv(gym.Env):
                      non spatial observation with shape=(num_non_spatial_observations)
                      action mask with shape = (action_space, )"""
 
+        for layer, out in zip(self.env_conf.layers, self._spatial_scratch):
+            layer.get(self.game, out=out)
+        spatial_obs, non_spatial_obs, action_mask = self._get_state_from_layers(flip)
+
+        if self.env_conf.copy_obs:
+            return spatial_obs.copy(), non_spatial_obs.copy(), action_mask.copy()
+        return spatial_obs, non_spatial_obs, action_mask
+
+    def get_factorized_state(self, flip: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray, 'FactorizedActionMask']:
+        """
+        Like get_state(), but describes the available actions with a FactorizedActionMask instead of the flat action
+        mask, which isn't computed. Use flat_action_idx() to convert a sampled action type and position to the action
+        index for step(), and step with skip_observation=True so that the flat observation isn't computed as well.
+        :return: tuple with the spatial observation, the non spatial observation and the FactorizedActionMask.
+        """
+        for layer, out in zip(self.env_conf.layers, self._spatial_scratch):
+            layer.get(self.game, out=out)
+        spatial_obs, non_spatial_obs, _ = self._get_state_from_layers(flip, compute_action_mask=False)
+        action_mask = self._get_factorized_action_mask(spatial_obs)
+
+        if self.env_conf.copy_obs:
+            return spatial_obs.copy(), non_spatial_obs.copy(), action_mask
+        return spatial_obs, non_spatial_obs, action_mask
+
+    def _get_factorized_action_mask(self, spatial_obs: np.ndarray) -> 'FactorizedActionMask':
+        """
+        Computes the factorized action mask from the positional layers of the spatial observation and the available
+        action types in the non spatial observation, like the flat action mask in _get_state_from_layers().
+        """
+        num_simple_actions = len(self.env_conf.simple_action_types)
+        num_positional_types = len(self.env_conf.positional_action_types)
+        action_type_mask = np.zeros(len(self.env_conf.action_types), dtype=bool)
+        np.greater(self._action_type_obs[:num_simple_actions], 0.0, out=action_type_mask[:num_simple_actions])
+
+        # The indices are sorted by action type and then by square
+        np.greater(spatial_obs[:num_positional_types], 0, out=self._positional_mask)
+        idxs = np.flatnonzero(self._positional_mask)
+        bounds = np.searchsorted(idxs, np.arange(num_positional_types + 1) * self.board_squares)
+        square_ids = idxs % self.board_squares
+        positions = [square_ids[bounds[i]:bounds[i + 1]] for i in range(num_positional_types)]
+        np.greater(bounds[1:], bounds[:-1], out=action_type_mask[num_simple_actions:])
+        assert action_type_mask.any()
+        return FactorizedActionMask(action_type_mask, positions)
+
+    def flat_action_idx(self, action_type_idx: int, position_idx: Optional[int] = None) -> int:
+        """
+        Converts a factorized action to the index in the flat action space.
+        :param action_type_idx: index in env_conf.action_types, like in FactorizedActionMask.action_type_mask.
+        :param position_idx: square index y * width + x in the orientation of the observation. Only for positional
+                             action types.
+        """
+        num_simple_actions = len(self.env_conf.simple_action_types)
+        if action_type_idx < num_simple_actions:
+            return action_type_idx
+        if position_idx is None:
+            raise ValueError(f"The action type {self.env_conf.action_types[action_type_idx]} requires a position")
+        return num_simple_actions + (action_type_idx - num_simple_actions) * self.board_squares + position_idx
+
+    def factorize_action_idx(self, action_idx: int) -> Tuple[int, Optional[int]]:
+        """
+        Converts an index in the flat action space to a factorized action.
+        :return: tuple with the index in env_conf.action_types and the square index, which is None for simple actions.
+        """
+        num_simple_actions = len(self.env_conf.simple_action_types)
+        if action_idx < num_simple_actions:
+            return action_idx, None
+        positional_type_idx, position_idx = divmod(action_idx - num_simple_actions, self.board_squares)
+        return num_simple_actions + positional_type_idx, position_idx
+
+    def compute_action(self, action_idx: Optional[int], flip: Optional[bool] = None) -> List[Optional[Action]]:
+        """
+        Converts an index in the flat action space to the actions of the game that it stands for, e.g. to step a game
+        without the environment. A formation is expanded into the actions that place the players and END_SETUP.
+        :param flip: whether the observation is flipped. If None, it is flipped if the away team is active.
+        :return: the actions to take in order, [None] if action_idx is None.
+        """
+        return self._compute_action(action_idx, flip)
+
+    def action_to_idx(self, action: Action, flip: Optional[bool] = None) -> Optional[int]:
+        """
+        Converts an action of the game, e.g. from a scripted bot, to its index in the flat action space.
+        :param flip: whether the observation is flipped. If None, it is flipped if the away team is active.
+        :return: the action index or None if the action space can't express the action, e.g. a positional action
+                 without a position or an action type that isn't in env_conf.action_types.
+        """
+        if action.action_type in self._positional_action_idx:
+            if action.position is None and (action.player is None or action.player.position is None):
+                return None
+        elif action.action_type not in self._simple_action_idx:
+            return None
+        return self._compute_action_idx(action, flip)
+
+    def get_states(self) -> Tuple[EnvObs, EnvObs]:
+        """
+        Returns the observations of both teams while computing the feature layers only once, e.g. for self-play. The
+        layers of the team that isn't active are derived from the layers of the active team as described by
+        FeatureLayer.perspective(). The team that isn't active has no available actions, so its available action types
+        and action mask are all zero.
+        :return: tuple with the observation of the home team and the observation of the away team, each like the
+                 return value of get_state(). The observation of the away team is flipped.
+        """
+        for layer, out in zip(self.env_conf.layers, self._spatial_scratch):
+            layer.get(self.game, out=out)
+        active_obs = self._get_state_from_layers(flip=self.away_team_active())
+        other_obs = self._get_other_team_state()
+        states = (other_obs, active_obs) if self.away_team_active() else (active_obs, other_obs)
+
+        if self.env_conf.copy_obs:
+            return tuple(tuple(array.copy() for array in obs) for obs in states)
+        return states
+
+    def _get_other_team_state(self) -> EnvObs:
+        """
+        Derives the observation of the team that isn't active from the unflipped spatial observation of the active team.
+        :return: views of the observation buffers of the other team.
+        """
+        if self._other_team_buffers is None:
+            self._other_team_buffers = self._allocate_other_team_buffers()
+        buffers = self._other_team_buffers
+        game = self.game
+        team = game.state.away_team if self.home_team_active() else game.state.home_team
+
+        # Spatial state
+        spatial_obs = buffers['spatial_obs']
+        np.take(self._spatial_obs, buffers['layer_source'], axis=0, out=spatial_obs)
+        spatial_obs[buffers['empty_layers']] = 0
+        mirrored_layers = buffers['mirrored_layers']
+        spatial_obs[mirrored_layers] = self._spatial_obs[mirrored_layers][:, :, ::-1]
+        if team is game.state.away_team:
+            spatial_obs = spatial_obs[:, :, ::-1]
+
+        # Non spatial state
+        for feature, out in buffers['non_spatial_feature_obs']:
+            feature.produce_into(game, team, out)
+        if buffers['non_spatial_scratch'] is not buffers['non_spatial_obs']:
+            self._quantize(buffers['non_spatial_scratch'], buffers['non_spatial_obs'])
+
+        return spatial_obs, buffers['non_spatial_obs'], buffers['action_mask']
+
+    def _allocate_other_team_buffers(self) -> Dict[str, Any]:
+        layers = self.env_conf.layers
+        layer_types = [type(layer) for layer in layers]
+        layer_source = np.arange(len(layers), dtype=np.intp)
+        empty_layers = []
+        mirrored_layers = []
+        for i, layer in enumerate(layers):
+            if type(layer).perspective is FeatureLayer.perspective and type(layer).__module__ != FeatureLayer.__module__:
+                raise ValueError(f"The layer '{layer.name()}' must override perspective() to be used in get_states(), "
+                                 f"return Perspective.SHARED if it is the same for both teams")
+            perspective = layer.perspective()
+            if perspective is Perspective.SWAPPED:
+                if layer.paired_layer() not in layer_types:
+                    raise ValueError(f"The layer '{layer.name()}' is swapped with a layer of type "
+                                     f"{layer.paired_layer().__name__}, which is not in the layers of the EnvConf")
+                layer_source[i] = layer_types.index(layer.paired_layer())
+            elif perspective is Perspective.ACTIVE_ONLY:
+                empty_layers.append(i)
+            elif perspective is Perspective.MIRRORED:
+                mirrored_layers.append(i)
+        non_spatial_obs, non_spatial_scratch, non_spatial_feature_obs, _ = self._create_non_spatial_buffers()
+        return {'spatial_obs': np.zeros_like(self._spatial_obs),
+                'layer_source': layer_source,
+                'empty_layers': np.array(empty_layers, dtype=np.intp),
+                'mirrored_layers': np.array(mirrored_layers, dtype=np.intp),
+                'non_spatial_obs': non_spatial_obs,
+                'non_spatial_scratch': non_spatial_scratch,
+                'non_spatial_feature_obs': non_spatial_feature_obs,
+                'action_mask': np.zeros_like(self._action_mask)}
+
+    def _get_state_from_layers(self, flip: Optional[bool], compute_action_mask: bool = True) -> EnvObs:
+        """
+        Completes the observation after the feature layers have been written into the spatial scratch buffer.
+        :param compute_action_mask: if False, the action mask isn't computed and None is returned in its place.
+        :return: views of the observation buffers.
+        """
         if flip is None:
             flip = self.away_team_active()
 
         game = self.game
         active_team = game.active_team
-        active_player = game.state.active_player
-        opp_team = game.get_opp_team(active_team) if active_team is not None else None
 
         # Spatial state
-        spatial_obs = np.stack([layer.get(game) for layer in self.env_conf.layers])
-        if flip:
-            spatial_obs = np.flip(spatial_obs, axis=2)
+        spatial_scratch = self._spatial_scratch
+        if spatial_scratch is not self._spatial_obs:
+            self._quantize(spatial_scratch, self._spatial_obs)
+        spatial_obs = self._spatial_obs[:, :, ::-1] if flip else self._spatial_obs
 
         # Non spatial state
-        if self.num_non_spatial_observables is None:
-            non_spatial_obs = np.zeros(2000)
-        else:
-            non_spatial_obs = np.zeros(self.num_non_spatial_observables)
-
-        index = count()
-        non_spatial_obs[next(index)] = game.state.half - 1.0
-        non_spatial_obs[next(index)] = game.state.round / 8.0
-
-        non_spatial_obs[next(index)] = 1.0 * (game.state.weather == WeatherType.SWELTERING_HEAT)
-        non_spatial_obs[next(index)] = 1.0 * (game.state.weather == WeatherType.VERY_SUNNY)
-        non_spatial_obs[next(index)] = 1.0 * (game.state.weather == WeatherType.NICE)
-        non_spatial_obs[next(index)] = 1.0 * (game.state.weather == WeatherType.POURING_RAIN)
-        non_spatial_obs[next(index)] = 1.0 * (game.state.weather == WeatherType.BLIZZARD)
-
-        non_spatial_obs[next(index)] = 1.0 * (game.state.current_team == active_team)
-        non_spatial_obs[next(index)] = 1.0 * (game.state.kicking_first_half == active_team)
-        non_spatial_obs[next(index)] = 1.0 * (game.state.kicking_this_drive == active_team)
-        non_spatial_obs[next(index)] = len(game.get_reserves(active_team)) / 16.0
-        non_spatial_obs[next(index)] = len(game.get_knocked_out(active_team)) / 16.0
-        non_spatial_obs[next(index)] = len(game.get_casualties(active_team)) / 16.0
-        non_spatial_obs[next(index)] = len(game.get_reserves(game.get_opp_team(active_team))) / 16.0
-        non_spatial_obs[next(index)] = len(game.get_knocked_out(game.get_opp_team(active_team))) / 16.0
-        non_spatial_obs[next(index)] = len(game.get_casualties(game.get_opp_team(active_team))) / 16.0
-
-        if active_team is not None:
-            non_spatial_obs[next(index)] = active_team.state.score / 16.0
-            non_spatial_obs[next(index)] = active_team.state.turn / 8.0
-            non_spatial_obs[next(index)] = active_team.state.rerolls_start / 8.0
-            non_spatial_obs[next(index)] = active_team.state.rerolls / 8.0
-            non_spatial_obs[next(index)] = active_team.state.ass_coaches / 8.0
-            non_spatial_obs[next(index)] = active_team.state.cheerleaders / 8.0
-            non_spatial_obs[next(index)] = active_team.state.bribes / 4.0
-            non_spatial_obs[next(index)] = active_team.state.babes / 4.0
-            non_spatial_obs[next(index)] = active_team.state.apothecaries / 2
-            non_spatial_obs[next(index)] = 1.0 * (not active_team.state.reroll_used)
-            non_spatial_obs[next(index)] = active_team.state.fame / 2
-
-            non_spatial_obs[next(index)] = opp_team.state.score / 16.0
-            non_spatial_obs[next(index)] = opp_team.state.turn / 8.0
-            non_spatial_obs[next(index)] = opp_team.state.rerolls_start / 8.0
-            non_spatial_obs[next(index)] = opp_team.state.rerolls / 8.0
-            non_spatial_obs[next(index)] = opp_team.state.ass_coaches / 8.0
-            non_spatial_obs[next(index)] = opp_team.state.cheerleaders / 8.0
-            non_spatial_obs[next(index)] = opp_team.state.bribes / 4.0
-            non_spatial_obs[next(index)] = opp_team.state.babes / 4.0
-            non_spatial_obs[next(index)] = active_team.state.apothecaries / 2
-            non_spatial_obs[next(index)] = 1.0 * (not opp_team.state.reroll_used)
-            non_spatial_obs[next(index)] = opp_team.state.fame / 2
-        else:
-            take(22, index)
-
-        if game.current_turn() is not None:
-            non_spatial_obs[next(index)] = 1.0 * game.is_blitz_available()
-            non_spatial_obs[next(index)] = 1.0 * game.is_pass_available()
-            non_spatial_obs[next(index)] = 1.0 * game.is_handoff_available()
-            non_spatial_obs[next(index)] = 1.0 * game.is_foul_available()
-            non_spatial_obs[next(index)] = 1.0 * game.is_blitz()
-            non_spatial_obs[next(index)] = 1.0 * game.is_quick_snap()
-        else:
-            take(6, index)
-
-        if active_player is not None:
-            player_action_type = game.get_player_action_type()
-            non_spatial_obs[next(index)] = 1.0 * (player_action_type == PlayerActionType.MOVE)
-            non_spatial_obs[next(index)] = 1.0 * (player_action_type == PlayerActionType.BLOCK)
-            non_spatial_obs[next(index)] = 1.0 * (player_action_type == PlayerActionType.BLITZ)
-            non_spatial_obs[next(index)] = 1.0 * (player_action_type == PlayerActionType.PASS)
-            non_spatial_obs[next(index)] = 1.0 * (player_action_type == PlayerActionType.HANDOFF)
-            non_spatial_obs[next(index)] = 1.0 * (player_action_type == PlayerActionType.FOUL)
-        else:
-            take(6, index)
-
-        # Procedures in stack
-        all_proc_types = set(type(proc) for proc in game.state.stack.items)
-        for i, proc_type in zip(index, self.env_conf.procedures):
-            non_spatial_obs[i] = 1.0 * (proc_type in all_proc_types)
+        for feature, out in self._non_spatial_feature_obs:
+            feature.produce_into(game, active_team, out)
 
         # Available action types
-        aa_types = np.zeros(len(self.env_conf.action_types))
-        game_aa_types = set(action_choice.action_type for action_choice in game.get_available_actions())
-        is_setup: bool = type(self.game.get_procedure()) == procedures.Setup
-        for i, action_type in enumerate(self.env_conf.action_types):
+        aa_types = self._action_type_obs
+        aa_types.fill(0.0)
+        for action_choice in game.get_available_actions():
+            action_type = action_choice.action_type
             if action_type is ActionType.END_SETUP and not game.is_setup_legal(active_team):
                 continue  # Ignore end setup action if setup is illegal
-
-            if is_setup and isinstance(action_type, Formation):
+            for i in self._action_type_obs_idx.get(action_type, ()):
                 aa_types[i] = 1.0
-            else:
-                aa_types[i] = 1.0 * (action_type in game_aa_types)
-
-        next_index = next(index)
-        non_spatial_obs[next_index:next_index + len(aa_types)] = aa_types
-        if self.num_non_spatial_observables is None:
-            self.num_non_spatial_observables = next_index + len(aa_types)
-            non_spatial_obs = non_spatial_obs[:self.num_non_spatial_observables]
+        if type(self.game.get_procedure()) == procedures.Setup:
+            aa_types[self._formation_obs_idx] = 1.0
 
         # Action mask
-        num_simple_actions = len(self.env_conf.simple_action_types)
-        action_mask = np.concatenate((aa_types[:num_simple_actions],
-                                      spatial_obs[:len(self.env_conf.positional_action_types)].flatten()))
-        action_mask = action_mask > 0.0
-        assert True in action_mask
+        action_mask = None
+        if compute_action_mask:
+            num_simple_actions = len(self.env_conf.simple_action_types)
+            num_positional_types = len(self.env_conf.positional_action_types)
+            action_mask = self._action_mask
+            np.greater(aa_types[:num_simple_actions], 0.0, out=action_mask[:num_simple_actions])
+            np.greater(spatial_obs[:num_positional_types], 0,
+                       out=action_mask[num_simple_actions:].reshape(num_positional_types, self.height, self.width))
+            assert True in action_mask
+
+        if self._non_spatial_scratch is not self._non_spatial_obs:
+            self._quantize(self._non_spatial_scratch, self._non_spatial_obs)
+        non_spatial_obs = self._non_spatial_obs
 
         return spatial_obs, non_spatial_obs, action_mask
 
+    def _is_float_obs(self) -> bool:
+        return np.issubdtype(self.env_conf.obs_dtype, np.floating)
+
+    def _allocate_non_spatial_buffers(self) -> None:
+        self._non_spatial_obs, self._non_spatial_scratch, self._non_spatial_feature_obs, self._action_type_obs = \
+            self._create_non_spatial_buffers()
+        self.num_non_spatial_observables = len(self._non_spatial_obs)
+
+    def _create_non_spatial_buffers(self) -> Tuple[np.ndarray, np.ndarray, List[Tuple[NonSpatialFeature, np.ndarray]],
+                                                   np.ndarray]:
+        """
+        :return: the non spatial observation, the float scratch buffer it is computed in (the same array for float
+                 observations), views of the scratch buffer that each feature is written into, and the view of the
+                 available action types.
+        """
+        sizes = [feature.size() for feature in self.env_conf.non_spatial_features]
+        num_features = sum(sizes)
+        num_observables = num_features + len(self.env_conf.action_types)
+        non_spatial_obs = np.zeros(num_observables, dtype=self.env_conf.obs_dtype)
+        non_spatial_scratch = non_spatial_obs if self._is_float_obs() else np.zeros(num_observables, dtype=np.float32)
+        feature_obs = []
+        offset = 0
+        for feature, size in zip(self.env_conf.non_spatial_features, sizes):
+            feature_obs.append((feature, non_spatial_scratch[offset:offset + size]))
+            offset += size
+        return non_spatial_obs, non_spatial_scratch, feature_obs, non_spatial_scratch[num_features:]
+
+    def _quantize(self, scratch: np.ndarray, out: np.ndarray) -> None:
+        """
+        Writes observations in [0, 1] into the integer buffer out, scaled to the range of its dtype. Overwrites scratch.
+        """
+        np.multiply(scratch, np.iinfo(out.dtype).max, out=scratch)
+        np.rint(scratch, out=scratch)
+        out[:] = scratch
+
     def step(self, action_idx: Optional[int], skip_observation: bool = False) -> EnvStepReturn:
         # Convert to Action object
         action_objects = self._compute_action(action_idx)
@@ -379,8 +615,8 @@ class BotBowlEnv(gym.Env):
         seed = self.rnd.randint(0, 2 ** 31)
 
         self.game = Game(game_id=str(uuid.uuid1()),
-                         home_team=deepcopy(self.home_team),
-                         away_team=deepcopy(self.away_team),
+                         home_team=self.home_team,
+                         away_team=self.away_team,
                          home_agent=BotBowlEnv._create_agent(self.home_agent),
                          away_agent=BotBowlEnv._create_agent(self.away_agent),
                          config=self.env_conf.config,
@@ -442,15 +678,15 @@ class BotBowlEnv(gym.Env):
         if flip is None:
             flip = self.away_team_active()
 
-        if action.action_type in self.env_conf.simple_action_types:
-            return self.env_conf.simple_action_types.index(action.action_type)
-        elif action.action_type in self.env_conf.positional_action_types:
+        if action.action_type in self._simple_action_idx:
+            return self._simple_action_idx[action.action_type]
+        elif action.action_type in self._positional_action_idx:
             position = action.position if action.position is not None else action.player.position
             x, y = position.x, position.y
             if flip:
                 x = self.width - x - 1
             spatial_index = x + y * self.width
-            position_action_index = self.env_conf.positional_action_types.index(action.action_type)
+            position_action_index = self._positional_action_idx[action.action_type]
             return len(self.env_conf.simple_action_types) + self.board_squares * position_action_index + spatial_index
         else:
             raise AttributeError(f"Can't convert {action} to an action index")
@@ -471,6 +707,114 @@ class BotBowlEnv(gym.Env):
             raise AttributeError(f"Not recognized bot name: {agent_option}")
 
 
+class SyncBotBowlVecEnv:
+    """
+    Steps several environments in one process and computes their observations together. Each feature layer is written
+    into all games in one pass, see FeatureLayer.get_batch(), which is faster than calling get_state() on each
+    environment, e.g. on the small boards where a process per environment spends most of its time on communication.
+    Finished environments are reset automatically.
+    """
+    envs: List[Union[BotBowlEnv, 'BotBowlWrapper']]
+    num_envs: int
+    _spatial_obs: np.ndarray
+    _spatial_scratch: np.ndarray
+    _non_spatial_obs: np.ndarray
+    _action_mask: np.ndarray
+
+    def __init__(self, envs: List[Union[BotBowlEnv, 'BotBowlWrapper']]):
+        """
+        :param envs: environments, or wrapped environments, with the same board size and feature layers.
+        """
+        self.envs = envs
+        self.num_envs = len(envs)
+        root_envs = [self._root_env(env) for env in envs]
+        first = root_envs[0]
+        self.env_conf = first.env_conf
+        layer_names = [layer.name() for layer in self.env_conf.layers]
+        assert all([layer.name() for layer in root_env.env_conf.layers] == layer_names for root_env in root_envs), \
+            "The environments must use the same feature layers"
+
+        # The spatial buffers of the environments become views of the batch buffers
+        num_layers = len(self.env_conf.layers)
+        self._spatial_obs = np.zeros((self.num_envs, num_layers, first.height, first.width),
+                                     dtype=self.env_conf.obs_dtype)
+        self._spatial_scratch = self._spatial_obs if first._is_float_obs() else \
+            np.zeros(self._spatial_obs.shape, dtype=np.float32)
+        for i, root_env in enumerate(root_envs):
+            root_env._spatial_obs = self._spatial_obs[i]
+            root_env._spatial_scratch = root_env._spatial_obs if first._is_float_obs() else self._spatial_scratch[i]
+        self._non_spatial_obs = np.zeros((self.num_envs, first.num_non_spatial_observables),
+                                         dtype=self.env_conf.obs_dtype)
+        self._action_mask = np.zeros((self.num_envs, first.num_actions), dtype=bool)
+
+    @staticmethod
+    def _root_env(env: Union[BotBowlEnv, 'BotBowlWrapper']) -> BotBowlEnv:
+        return env if type(env) is BotBowlEnv else env.root_env
+
+    @property
+    def games(self) -> List[Game]:
+        return [self._root_env(env).game for env in self.envs]
+
+    def get_state(self) -> EnvObs:
+        """
+        :return: tuple with np arrays
+                     spatial observations with shape=(num_envs, num_layers, height, width)
+                     non spatial observations with shape=(num_envs, num_non_spatial_observations)
+                     action masks with shape=(num_envs, action_space)
+        """
+        batch = GameBatch(self.games)
+        for i, layer in enumerate(self.env_conf.layers):
+            layer.get_batch(batch, self._spatial_scratch[:, i])
+        for i, env in enumerate(self.envs):
+            root_env = self._root_env(env)
+            flip = root_env.away_team_active()
+            _, non_spatial_obs, action_mask = root_env._get_state_from_layers(flip)
+            if flip:
+                # NumPy copies overlapping views before assigning
+                self._spatial_obs[i] = self._spatial_obs[i][:, :, ::-1]
+            self._non_spatial_obs[i] = non_spatial_obs
+            self._action_mask[i] = action_mask
+        if self.env_conf.copy_obs:
+            return self._spatial_obs.copy(), self._non_spatial_obs.copy(), self._action_mask.copy()
+        return self._spatial_obs, self._non_spatial_obs, self._action_mask
+
+    def step(self, actions: Iterable[int], skip_observation: bool = False) \
+            -> Tuple[EnvObs, np.ndarray, np.ndarray, List[dict]]:
+        """
+        Takes one step in each environment and resets the ones that are done.
+        :param actions: an action index for each environment.
+        :param skip_observation: don't compute the observations, e.g. in turns that the learner doesn't act in.
+        :return: the observations as from get_state(), or None's if skipped, the rewards, the done flags and the info
+                 dicts.
+        """
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        infos = []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            _, rewards[i], dones[i], info = env.step(action, skip_observation=True)
+            if dones[i]:
+                self._reset(env)
+            infos.append(info)
+        obs = (None, None, None) if skip_observation else self.get_state()
+        return obs, rewards, dones, infos
+
+    def reset(self) -> EnvObs:
+        for env in self.envs:
+            self._reset(env)
+        return self.get_state()
+
+    @staticmethod
+    def _reset(env: Union[BotBowlEnv, 'BotBowlWrapper']) -> None:
+        if type(env) is BotBowlEnv:
+            env.reset(skip_observation=True)
+        else:
+            env.reset()
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
 class BotBowlWrapper:
     env: Union[BotBowlEnv, 'BotBowlWrapper']
     _root_env: Optional[BotBowlEnv]
@@ -10,8 +10,51 @@ from botbowl.core.procedure import *
 from botbowl.core.game import Game
 
 
+class GameBatch:
+    """
+    A batch of games whose feature layers are computed together, see FeatureLayer.get_batch(). The players on the pitch
+    of all games are gathered once, so that each player layer is written into all games with one NumPy assignment.
+    """
+
+    def __init__(self, games: List[Game]):
+        self.games = games
+        self.players = []
+        self.active_teams = []
+        game_index = []
+        ys = []
+        xs = []
+        for i, game in enumerate(games):
+            active_team = game.active_team
+            for player in game.get_players_on_pitch():
+                self.players.append(player)
+                self.active_teams.append(active_team)
+                game_index.append(i)
+                ys.append(player.position.y)
+                xs.append(player.position.x)
+        self.game_index = np.array(game_index, dtype=np.intp)
+        self.y = np.array(ys, dtype=np.intp)
+        self.x = np.array(xs, dtype=np.intp)
+
+
+class Perspective(Enum):
+    """
+    How a feature layer looks from the perspective of the team that isn't active, see FeatureLayer.perspective().
+    """
+    SHARED = 1  # The same for both teams
+    SWAPPED = 2  # The paired layer of the active team, e.g. own and opponent players
+    MIRRORED = 3  # The layer of the active team flipped horizontally, e.g. the own half
+    ACTIVE_ONLY = 4  # Only defined for the active team, e.g. the available actions, and zero for the other team
+
+
 class FeatureLayer(ABC):
 
+    def __new__(cls, *args, **kwargs):
+        # produce() and produce_into() are implemented by means of each other, so one of them must be overridden
+        if cls.produce is FeatureLayer.produce and cls.produce_into is FeatureLayer.produce_into:
+            raise TypeError(f"Can't instantiate {cls.__name__} without an implementation of produce() or "
+                            f"produce_into()")
+        return super().__new__(cls)
+
     def __init__(self):
         self.cache = {}
 
@@ -19,17 +62,68 @@ class FeatureLayer(ABC):
     def name(self):
         pass
 
-    def get(self, game: Game):
+    def perspective(self):
+        """
+        Override this in layers that depend on the active team, so that BotBowlEnv.get_states() can derive the layer
+        of the other team from the layers of the active team. The default, Perspective.SHARED, gives the other team
+        the layer of the active team unchanged, which is wrong for layers relative to the active team, e.g. layers of
+        the own players. Since the layers can't be recomputed for the other team, get_states() only uses the default
+        for the layers in this module and raises a ValueError for other layers that don't override this.
+        :return: a Perspective.
+        """
+        return Perspective.SHARED
+
+    def paired_layer(self):
+        """
+        :return: the type of the layer that holds this layer from the perspective of the other team if perspective()
+                 returns Perspective.SWAPPED.
+        """
+        return None
+
+    def is_binary(self):
         """
-        :return: a 2D 1-hot feature layer, possibly cached.
+        Override this in layers that only contain 0 and 1, so that they can be stored as bits.
+        """
+        return False
+
+    def value_step(self):
+        """
+        Override this in layers whose values are small multiples of a step, e.g. player stats times 0.1, so that they can
+        be stored as one byte per square, see ObsCodec.
+        :return: the step, or None if the values are arbitrary floats.
+        """
+        return None
+
+    def get(self, game: Game, out: Optional[np.ndarray] = None):
+        """
+        :param out: optional array with shape=(height, width) that the layer is written into.
+        :return: a 2D 1-hot feature layer, possibly cached. If out is given, out is returned.
         """
         key = self.key(game)
         if key is not None and key in self.cache:
-            return self.cache[key]
-        layer = self.produce(game)
-        if key is not None:
-            self.cache[key] = layer
-        return layer
+            layer = self.cache[key]
+        elif key is None and out is not None:
+            self.produce_into(game, out)
+            return out
+        else:
+            layer = self.produce(game)
+            if key is not None:
+                self.cache[key] = layer
+        if out is None:
+            return layer
+        out[:] = layer
+        return out
+
+    def get_batch(self, batch: GameBatch, out: np.ndarray) -> np.ndarray:
+        """
+        Writes the layer of each game in the batch into out.
+        :param batch:
+        :param out: array with shape=(num games, height, width).
+        :return: out
+        """
+        for game, game_out in zip(batch.games, out):
+            self.get(game, out=game_out)
+        return out
 
     def key(self, game):
         """
@@ -38,13 +132,24 @@ class FeatureLayer(ABC):
         """
         return None
 
-    @abstractmethod
     def produce(self, game):
         """
+        Subclasses must override either this method or produce_into().
         :param game:
         :return: a newly generated 2D 1-hot feature layer.
         """
-        raise NotImplementedError("Must be overridden by subclass")
+        out = np.zeros((game.arena.height, game.arena.width))
+        self.produce_into(game, out)
+        return out
+
+    def produce_into(self, game, out):
+        """
+        Writes the layer into a preallocated array, e.g. a slice of the environment's observation buffer. Override
+        this to avoid allocating a new array in every step.
+        :param game:
+        :param out: array with shape=(height, width). Its previous content must be overwritten.
+        """
+        out[:] = self.produce(game)
 
 
 class PlayerFeatureLayer(FeatureLayer, ABC):
@@ -53,21 +158,37 @@ class PlayerFeatureLayer(FeatureLayer, ABC):
     def produce_player_state(self, player, active_team):
         pass
 
-    def produce(self, game):
-        return self.get(game)
+    def produce_player_states(self, batch: GameBatch) -> np.ndarray:
+        """
+        Override this if the values of all players in a batch can be computed faster than one by one.
+        :return: the value of each player in batch.players.
+        """
+        return np.fromiter(map(self.produce_player_state, batch.players, batch.active_teams), dtype=float,
+                           count=len(batch.players))
 
-    def get(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.active_team
         for player in game.get_players_on_pitch():
             out[player.position.y][player.position.x] = self.produce_player_state(player, active_team)
+
+    def get_batch(self, batch, out):
+        out.fill(0.0)
+        out[batch.game_index, batch.y, batch.x] = self.produce_player_states(batch)
         return out
 
+
 class OccupiedLayer(PlayerFeatureLayer):
 
     def produce_player_state(self, player, active_team):
         return 1.0
 
+    def produce_player_states(self, batch):
+        return 1.0
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return "occupied"
 
@@ -77,6 +198,15 @@ class OwnPlayerLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 1.0 * (player.team is active_team)
 
+    def perspective(self):
+        return Perspective.SWAPPED
+
+    def paired_layer(self):
+        return OppPlayerLayer
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return "own players"
 
@@ -86,48 +216,114 @@ class OppPlayerLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 1.0 * (player.team is not active_team)
 
+    def perspective(self):
+        return Perspective.SWAPPED
+
+    def paired_layer(self):
+        return OwnPlayerLayer
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return "opp players"
 
 
+def _add_tackle_zones_batch(batch, teams, out):
+    """
+    Adds 0.125 to each square inside the pitch next to a player of the given team with a tackle zone, for all games.
+    :param teams: the team of each game in the batch, or None.
+    """
+    game_index = []
+    ys = []
+    xs = []
+    for i, team in enumerate(teams):
+        if team is None:
+            continue
+        for player in team.players:
+            if player.position is not None and player.has_tackle_zone():
+                game_index.append(i)
+                ys.append(player.position.y)
+                xs.append(player.position.x)
+    game_index = np.array(game_index, dtype=np.intp)
+    ys = np.array(ys, dtype=np.intp)
+    xs = np.array(xs, dtype=np.intp)
+    height, width = out.shape[1:]
+    for dx, dy in [(1, 1), (1, 0), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)]:
+        x = xs + dx
+        y = ys + dy
+        in_bounds = (x >= 1) & (x < width - 1) & (y >= 1) & (y < height - 1)
+        np.add.at(out, (game_index[in_bounds], y[in_bounds], x[in_bounds]), 0.125)
+
+
 class OwnTackleZoneLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.active_team
         if active_team is None:
-            return out
+            return
         for player in active_team.players:
             if player.position is not None:
                 if player.has_tackle_zone():
                     for square in game.get_adjacent_squares(player.position):
                         out[square.y][square.x] += 0.125
+
+    def get_batch(self, batch, out):
+        out.fill(0.0)
+        _add_tackle_zones_batch(batch, [game.active_team for game in batch.games], out)
         return out
 
     def key(self, game):
         return None
 
+    def perspective(self):
+        return Perspective.SWAPPED
+
+    def paired_layer(self):
+        return OppTackleZoneLayer
+
+    def value_step(self):
+        return 0.125
+
     def name(self):
         return "own tackle zones"
 
 
 class OppTackleZoneLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         if active_team is None:
-            return out
+            return
         for player in game.get_opp_team(active_team).players:
             if player.position is not None:
                 if player.has_tackle_zone():
                     for square in game.get_adjacent_squares(player.position):
                         out[square.y][square.x] += 0.125
+
+    def get_batch(self, batch, out):
+        out.fill(0.0)
+        teams = []
+        for game in batch.games:
+            active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
+            teams.append(game.get_opp_team(active_team) if active_team is not None else None)
+        _add_tackle_zones_batch(batch, teams, out)
         return out
 
     def key(self, game):
         return None
 
+    def perspective(self):
+        return Perspective.SWAPPED
+
+    def paired_layer(self):
+        return OwnTackleZoneLayer
+
+    def value_step(self):
+        return 0.125
+
     def name(self):
         return "opp tackle zones"
 
@@ -137,6 +333,9 @@ class UsedLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 1.0 * player.state.used
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "used players"
 
@@ -146,6 +345,9 @@ class UpLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 1.0 * player.state.up
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "standing players"
 
@@ -155,32 +357,37 @@ class StunnedLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 1.0 * player.state.stunned
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "stunned players"
 
 
 class ActivePlayerLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
 
         if game.state.active_player is None or game.state.active_player.position is None:
-            return out
+            return
 
         out[game.state.active_player.position.y][game.state.active_player.position.x] = 1.0
-        return out
 
     def key(self, game):
         return None
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "active players"
 
 
 class TargetPlayerLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         target = None
         for i in reversed(range(game.state.stack.size())):
             proc = game.state.stack.items[i]
@@ -198,11 +405,13 @@ class TargetPlayerLayer(FeatureLayer):
                 break
         if target is not None and target.position is not None:
             out[target.position.y][target.position.x] = 1.0
-        return out
 
     def key(self, game):
         return None
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "target player"
 
@@ -213,24 +422,26 @@ class AvailablePositionLayer(FeatureLayer):
         super().__init__()
         self.action_type = action_type
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         for action_choice in game.state.available_actions:
             if action_choice.action_type != self.action_type:
                 continue
-            for position in action_choice.positions:
-                if position is not None:
-                    out[position.y][position.x] = 1.0
-            if len(action_choice.positions) == 0:
-                for player in action_choice.players:
-                    if player.position is not None:
-                        out[player.position.y][player.position.x] = 1.0
+            if len(action_choice.positions) > 0:
+                out.flat[game.get_square_ids(action_choice.positions)] = 1.0
+            else:
+                out.flat[game.get_square_ids(player.position for player in action_choice.players)] = 1.0
             break
-        return out
 
     def key(self, game):
         return None
 
+    def perspective(self):
+        return Perspective.ACTIVE_ONLY
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return f"{self.action_type.name.replace('_', ' ').lower()} positions"
 
@@ -240,11 +451,11 @@ class RollProbabilityLayer(FeatureLayer):
     # The probability of sum of two D6 rolls to be equal to or greater than roll_target. e.g. 9+ = 0.2777..
     accumulated_prob_2d_roll = (np.array([36, 36, 36, 35, 33, 30, 26, 21, 15, 10, 6, 3, 1])/36)
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         if active_team is None:
-            return out
+            return
         for action_choice in game.state.available_actions:
             for i in range(len(action_choice.positions)):
                 if action_choice.positions[i] is not None:
@@ -260,22 +471,24 @@ class RollProbabilityLayer(FeatureLayer):
                             for roll in action_choice.rolls[i]:
                                 chance = chance * ((1+(6-roll)) / 6)
                         out[action_choice.positions[i].y][action_choice.positions[i].x] = chance
-        return out
 
     def key(self, game):
         return None
 
+    def perspective(self):
+        return Perspective.ACTIVE_ONLY
+
     def name(self):
         return "roll probabilities"
 
 
 class BlockDiceLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         if active_team is None:
-            return out
+            return
         for action_choice in game.state.available_actions:
             for i in range(len(action_choice.positions)):
                 if action_choice.positions[i] is not None:
@@ -287,11 +500,15 @@ class BlockDiceLayer(FeatureLayer):
                             roll = (action_choice.paths[i].block_dice + 3) / 6.0
                     out[action_choice.positions[i].y][action_choice.positions[i].x] = roll
 
-        return out
-
     def key(self, game):
         return None
 
+    def perspective(self):
+        return Perspective.ACTIVE_ONLY
+
+    def value_step(self):
+        return 1 / 6.0
+
     def name(self):
         return "block dice"
 
@@ -300,6 +517,9 @@ class MALayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 0.1 * player.get_ma()
 
+    def value_step(self):
+        return 0.1
+
     def name(self):
         return "movement allowence"
 
@@ -308,6 +528,9 @@ class STLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 0.1 * player.get_st()
 
+    def value_step(self):
+        return 0.1
+
     def name(self):
         return "strength"
 
@@ -316,6 +539,9 @@ class AGLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 0.1 * player.get_ag()
 
+    def value_step(self):
+        return 0.1
+
     def name(self):
         return "agility"
 
@@ -324,6 +550,9 @@ class AVLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 0.1 * player.get_av()
 
+    def value_step(self):
+        return 0.1
+
     def name(self):
         return "armor value"
 
@@ -337,97 +566,125 @@ class SkillLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 1.0 * player.has_skill(self.skill)
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return self.skill.name.replace("_", " ").lower()
 
 
 class BallLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         for ball in game.state.pitch.balls:
             if ball.position is not None:
                 out[ball.position.y][ball.position.x] = 1.0
-        return out
 
     def key(self, game):
         return None
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "balls"
 
 
 class OwnHalfLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         home = active_team == game.state.home_team
         tiles = TwoPlayerArena.home_tiles if home else TwoPlayerArena.away_tiles
         for y in range(len(game.arena.board)):
             for x in range(len(game.arena.board[0])):
                 out[y][x] = 1.0 if game.arena.board[y][x] in tiles else 0.0
-        return out
     
     def key(self, game):
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         home = active_team == game.state.home_team
         return str(home)
 
+    def perspective(self):
+        return Perspective.MIRRORED
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return "own half"
 
 
 class OwnTouchdownLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         home = active_team == game.state.home_team
         tile = Tile.HOME_TOUCHDOWN if home else Tile.AWAY_TOUCHDOWN
         for y in range(len(game.arena.board)):
             for x in range(len(game.arena.board[0])):
                 out[y][x] = 1.0 if game.arena.board[y][x] == tile else 0.0
-        return out
 
     def key(self, game):
         return game.active_team == game.state.home_team
-        
+
+    def perspective(self):
+        return Perspective.SWAPPED
+
+    def paired_layer(self):
+        return OppTouchdownLayer
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return "own touchdown"
 
 
 class OppTouchdownLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         active_team = game.state.available_actions[0].team if len(game.state.available_actions) > 0 else None
         home = active_team == game.state.home_team
         tile = Tile.HOME_TOUCHDOWN if not home else Tile.AWAY_TOUCHDOWN
         for y in range(len(game.arena.board)):
             for x in range(len(game.arena.board[0])):
                 out[y][x] = 1.0 if game.arena.board[y][x] == tile else 0.0
-        return out
 
     def key(self, game):
         return game.active_team == game.state.home_team
-        
+
+    def perspective(self):
+        return Perspective.SWAPPED
+
+    def paired_layer(self):
+        return OwnTouchdownLayer
+
+    def is_binary(self):
+        return True
+
     def name(self):
         return "opp touchdown"
 
 
 class CrowdLayer(FeatureLayer):
 
-    def produce(self, game):
-        out = np.zeros((game.arena.height, game.arena.width))
+    def produce_into(self, game, out):
+        out.fill(0.0)
         for y in range(len(game.arena.board)):
             for x in range(len(game.arena.board[0])):
                 out[y][x] = 1.0 if game.arena.board[y][x] == Tile.CROWD else 0.0
-        return out
 
     def key(self, game):
         return 0
 
+    def is_binary(self):
+        return True
+
     def name(self):
         return "opp crowd"
 
@@ -436,6 +693,9 @@ class MovementLeftLayer(PlayerFeatureLayer):
     def produce_player_state(self, player, active_team):
         return 0.1 * player.num_moves_left(include_gfi=False)
 
+    def value_step(self):
+        return 0.1
+
     def name(self):
         return "movement left"
 
@@ -445,5 +705,243 @@ class GFIsLeftLayer(PlayerFeatureLayer):
         num_max_gfis = 3 if player.has_skill(Skill.SPRINT) else 2
         return 0.1 * min(num_max_gfis, player.num_moves_left(include_gfi=True))
 
+    def value_step(self):
+        return 0.1
+
     def name(self):
         return "gfi left"
+
+
+class NonSpatialFeature(ABC):
+    """
+    One or more values of the non-spatial observation. The features of an environment are written into consecutive
+    slices of a preallocated vector, see EnvConf.non_spatial_features.
+    """
+
+    @abstractmethod
+    def name(self):
+        pass
+
+    def size(self):
+        """
+        :return: the number of values that the feature produces.
+        """
+        return 1
+
+    @abstractmethod
+    def produce_into(self, game, team, out):
+        """
+        :param game:
+        :param team: the team whose perspective the observation is from, usually the active team. Can be None.
+        :param out: array with shape=(size,). Its previous content must be overwritten.
+        """
+        pass
+
+
+class HalfFeature(NonSpatialFeature):
+
+    def produce_into(self, game, team, out):
+        out[0] = game.state.half - 1.0
+
+    def name(self):
+        return "half"
+
+
+class RoundFeature(NonSpatialFeature):
+
+    def produce_into(self, game, team, out):
+        out[0] = game.state.round / 8.0
+
+    def name(self):
+        return "round"
+
+
+class WeatherFeature(NonSpatialFeature):
+    weather_types = [WeatherType.SWELTERING_HEAT, WeatherType.VERY_SUNNY, WeatherType.NICE, WeatherType.POURING_RAIN,
+                     WeatherType.BLIZZARD]
+
+    def size(self):
+        return len(WeatherFeature.weather_types)
+
+    def produce_into(self, game, team, out):
+        out.fill(0.0)
+        if game.state.weather in WeatherFeature.weather_types:
+            out[WeatherFeature.weather_types.index(game.state.weather)] = 1.0
+
+    def name(self):
+        return "weather"
+
+
+class OwnTurnFeature(NonSpatialFeature):
+
+    def produce_into(self, game, team, out):
+        out[0] = 1.0 * (game.state.current_team == team)
+
+    def name(self):
+        return "is own turn"
+
+
+class KickingFirstHalfFeature(NonSpatialFeature):
+
+    def produce_into(self, game, team, out):
+        out[0] = 1.0 * (game.state.kicking_first_half == team)
+
+    def name(self):
+        return "is kicking first half"
+
+
+class KickingThisDriveFeature(NonSpatialFeature):
+
+    def produce_into(self, game, team, out):
+        out[0] = 1.0 * (game.state.kicking_this_drive == team)
+
+    def name(self):
+        return "is kicking this drive"
+
+
+class DugoutFeature(NonSpatialFeature):
+    """
+    The number of reserves, knocked out players and casualties of the own or the opponent team.
+    """
+
+    def __init__(self, own):
+        self.own = own
+
+    def size(self):
+        return 3
+
+    def produce_into(self, game, team, out):
+        if team is None:
+            out.fill(0.0)
+            return
+        dugout = game.get_dugout(team if self.own else game.get_opp_team(team))
+        out[0] = len(dugout.reserves) / 16.0
+        out[1] = len(dugout.kod) / 16.0
+        out[2] = len(dugout.casualties) / 16.0
+
+    def name(self):
+        return "own dugout" if self.own else "opp dugout"
+
+
+class TeamStateFeature(NonSpatialFeature):
+    """
+    The score, turn, rerolls and inducements of the own or the opponent team.
+    """
+
+    def __init__(self, own, legacy_apothecaries=False):
+        """
+        :param legacy_apothecaries: if True, the apothecaries of the opponent team are read from the own team, like in
+                                    the observations of earlier versions. See EnvConf's legacy_non_spatial.
+        """
+        self.own = own
+        self.legacy_apothecaries = legacy_apothecaries
+
+    def size(self):
+        return 11
+
+    def produce_into(self, game, team, out):
+        if team is None:
+            out.fill(0.0)
+            return
+        state = (team if self.own else game.get_opp_team(team)).state
+        out[0] = state.score / 16.0
+        out[1] = state.turn / 8.0
+        out[2] = state.rerolls_start / 8.0
+        out[3] = state.rerolls / 8.0
+        out[4] = state.ass_coaches / 8.0
+        out[5] = state.cheerleaders / 8.0
+        out[6] = state.bribes / 4.0
+        out[7] = state.babes / 4.0
+        out[8] = (team.state if self.legacy_apothecaries else state).apothecaries / 2
+        out[9] = 1.0 * (not state.reroll_used)
+        out[10] = state.fame / 2
+
+    def name(self):
+        return "own team state" if self.own else "opp team state"
+
+
+class TurnFeature(NonSpatialFeature):
+    """
+    The available and used special actions of the current turn.
+    """
+
+    def size(self):
+        return 6
+
+    def produce_into(self, game, team, out):
+        turn = game.current_turn()
+        if turn is None:
+            out.fill(0.0)
+            return
+        out[0] = 1.0 * turn.blitz_available
+        out[1] = 1.0 * turn.pass_available
+        out[2] = 1.0 * turn.handoff_available
+        out[3] = 1.0 * turn.foul_available
+        out[4] = 1.0 * turn.blitz
+        out[5] = 1.0 * turn.quick_snap
+
+    def name(self):
+        return "turn"
+
+
+class PlayerActionTypeFeature(NonSpatialFeature):
+    player_action_types = [PlayerActionType.MOVE, PlayerActionType.BLOCK, PlayerActionType.BLITZ,
+                           PlayerActionType.PASS, PlayerActionType.HANDOFF, PlayerActionType.FOUL]
+
+    def size(self):
+        return len(PlayerActionTypeFeature.player_action_types)
+
+    def produce_into(self, game, team, out):
+        out.fill(0.0)
+        if game.state.active_player is None:
+            return
+        player_action_type = game.get_player_action_type()
+        if player_action_type in PlayerActionTypeFeature.player_action_types:
+            out[PlayerActionTypeFeature.player_action_types.index(player_action_type)] = 1.0
+
+    def name(self):
+        return "player action type"
+
+
+class PaddingFeature(NonSpatialFeature):
+    """
+    Values that are always zero, e.g. to keep the layout of the observation of earlier versions.
+    """
+
+    def __init__(self, size=1):
+        self._size = size
+
+    def size(self):
+        return self._size
+
+    def produce_into(self, game, team, out):
+        out.fill(0.0)
+
+    def name(self):
+        return "padding"
+
+
+class ProcedureFeature(NonSpatialFeature):
+    """
+    Whether each of the given procedure types is on the stack.
+    """
+
+    def __init__(self, procedures):
+        self.procedures = procedures
+        self._index = {}
+        for i, proc_type in enumerate(procedures):
+            self._index.setdefault(proc_type, i)
+
+    def size(self):
+        return len(self.procedures)
+
+    def produce_into(self, game, team, out):
+        out.fill(0.0)
+        index = self._index
+        for proc in game.state.stack.items:
+            i = index.get(type(proc))
+            if i is not None:
+                out[i] = 1.0
+
+    def name(self):
+        return "procedures"
@@ -0,0 +1,226 @@
+"""
+This module contains a search harness for policy/value-guided tree search, e.g. AlphaZero-style, on top of the
+observations and action space of BotBowlEnv. Several simulations run concurrently using virtual loss, and the
+observations of their leaves are evaluated by the model in one batch.
+"""
+from copy import deepcopy
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from botbowl.core import Game, Agent, Team
+from botbowl.ai.env import BotBowlEnv, EnvConf
+
+# Takes batches of spatial observations, non-spatial observations and action masks and returns the values, from the
+# perspective of the active team, with shape=(batch_size,) and the action probabilities with
+# shape=(batch_size, num_actions).
+BatchModel = Callable[[np.ndarray, np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+class SearchNode:
+    """
+    A node in the search tree. The statistics of the edges to the children are stored in arrays over the legal actions
+    of the node, with values from the perspective of the node's team, i.e. the team that chooses the action.
+    """
+
+    def __init__(self, team: Optional[Team], terminal_value: Optional[float] = None):
+        self.team = team
+        self.terminal_value = terminal_value
+        self.pending = False
+        self.action_idxs = None
+        self.priors = None
+        self.child_visits = None
+        self.child_value_sums = None
+        self.children = None
+
+    def is_expanded(self) -> bool:
+        return self.action_idxs is not None
+
+    def expand(self, action_mask: np.ndarray, action_probs: np.ndarray) -> None:
+        self.action_idxs = np.flatnonzero(action_mask)
+        priors = action_probs[self.action_idxs].astype(np.float64)
+        total = priors.sum()
+        self.priors = priors / total if total > 0 else np.full(len(priors), 1.0 / len(priors))
+        self.child_visits = np.zeros(len(self.action_idxs))
+        self.child_value_sums = np.zeros(len(self.action_idxs))
+        self.children = [None] * len(self.action_idxs)
+
+    def num_visits(self) -> int:
+        return int(self.child_visits.sum()) if self.is_expanded() else 0
+
+    def most_visited_action_idx(self) -> int:
+        return int(self.action_idxs[np.argmax(self.child_visits)])
+
+
+class BatchedSearch:
+    """
+    PUCT search that evaluates leaves in batches. Each search copies the game, enables the forward model and moves
+    between the root and the leaves with game.step() and game.revert(). The dice are fixed for the whole search with
+    game.set_random_streams(), so that the same actions always lead to the same node.
+    """
+
+    def __init__(self, env_conf: EnvConf, model: BatchModel, batch_size: int = 16, c_puct: float = 1.5,
+                 virtual_loss: float = 1.0, seed: Optional[int] = None):
+        """
+        :param model: evaluates a batch of observations, see BatchModel.
+        :param batch_size: the maximum number of leaves evaluated in one call to the model.
+        :param c_puct: the weight of the prior in the selection of actions.
+        :param virtual_loss: the number of lost visits added to the path of each pending leaf, which makes the concurrent
+                             simulations spread out over the tree.
+        """
+        self.env = BotBowlEnv(env_conf, home_agent='human', away_agent='human')
+        self.model = model
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.rnd = np.random.RandomState(seed)
+        spatial_obs, non_spatial_obs, action_mask = self.env.get_state()
+        self._spatial_batch = np.zeros((batch_size,) + spatial_obs.shape, dtype=spatial_obs.dtype)
+        self._non_spatial_batch = np.zeros((batch_size,) + non_spatial_obs.shape, dtype=non_spatial_obs.dtype)
+        self._mask_batch = np.zeros((batch_size,) + action_mask.shape, dtype=bool)
+        self.num_model_calls = 0
+
+    def search(self, game: Game, num_simulations: int) -> SearchNode:
+        """
+        Searches from the current state of the game, which isn't changed.
+        :return: the root of the search tree.
+        """
+        game = self._copy_game(game)
+        self.env.game = game
+        game.set_random_streams(self.rnd.randint(0, 2 ** 31))
+        root_step = game.get_step()
+
+        root = SearchNode(game.active_team)
+        self._write_obs(0)
+        values, action_probs = self._evaluate(1)
+        root.expand(self._mask_batch[0], action_probs[0])
+
+        num_simulations_done = 0
+        while num_simulations_done < num_simulations:
+            leaves = []
+            while len(leaves) < min(self.batch_size, num_simulations - num_simulations_done):
+                path, leaf = self._select(root, game)
+                if leaf.terminal_value is not None:
+                    self._backup(path, leaf.terminal_value, game.state.home_team)
+                    num_simulations_done += 1
+                elif leaf.pending:
+                    # Another simulation already waits for this leaf, so evaluate the batch
+                    game.revert(root_step)
+                    break
+                else:
+                    self._write_obs(len(leaves))
+                    self._add_virtual_loss(path, self.virtual_loss)
+                    leaf.pending = True
+                    leaves.append((path, leaf))
+                game.revert(root_step)
+            if len(leaves) == 0:
+                continue
+            values, action_probs = self._evaluate(len(leaves))
+            for i, (path, leaf) in enumerate(leaves):
+                leaf.pending = False
+                leaf.expand(self._mask_batch[i], action_probs[i])
+                self._add_virtual_loss(path, -self.virtual_loss)
+                self._backup(path, float(values[i]), leaf.team)
+            num_simulations_done += len(leaves)
+
+        game.revert(root_step)
+        return root
+
+    @staticmethod
+    def _copy_game(game: Game) -> Game:
+        # The agents are replaced by humans, so the copy waits for actions instead of asking the bots
+        memo = {id(agent): Agent(agent.name, human=True, agent_id=agent.agent_id)
+                for agent in [game.home_agent, game.away_agent]}
+        if game.replay is not None:
+            memo[id(game.replay)] = None
+        game = deepcopy(game, memo)
+        game.enable_forward_model()
+        return game
+
+    def _select(self, root: SearchNode, game: Game) -> Tuple[List[Tuple[SearchNode, int]], SearchNode]:
+        """
+        Follows the PUCT scores from the root to a node that isn't expanded, creating it if it is new, and leaves the
+        game in the state of that node.
+        :return: the path as (node, child index) pairs and the node.
+        """
+        path = []
+        node = root
+        while True:
+            visits = node.child_visits
+            q = np.divide(node.child_value_sums, visits, out=np.zeros(len(visits)), where=visits > 0)
+            scores = q + self.c_puct * node.priors * np.sqrt(visits.sum() + 1) / (1 + visits)
+            i = int(np.argmax(scores))
+            path.append((node, i))
+            for action in self.env.compute_action(node.action_idxs[i]):
+                if game.state.game_over:
+                    break
+                game.step(action)
+            child = node.children[i]
+            if child is None:
+                child = self._create_node(game)
+                node.children[i] = child
+            if not child.is_expanded():
+                return path, child
+            node = child
+
+    @staticmethod
+    def _create_node(game: Game) -> SearchNode:
+        if not game.state.game_over:
+            return SearchNode(game.active_team)
+        winner = game.get_winner()
+        home_value = 0.0 if winner is None else (1.0 if winner == game.home_agent else -1.0)
+        return SearchNode(None, terminal_value=home_value)
+
+    def _write_obs(self, i: int) -> None:
+        spatial_obs, non_spatial_obs, action_mask = self.env.get_state()
+        self._spatial_batch[i] = spatial_obs
+        self._non_spatial_batch[i] = non_spatial_obs
+        self._mask_batch[i] = action_mask
+
+    def _evaluate(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        self.num_model_calls += 1
+        values, action_probs = self.model(self._spatial_batch[:n], self._non_spatial_batch[:n], self._mask_batch[:n])
+        return np.asarray(values).reshape(n), np.asarray(action_probs)
+
+    @staticmethod
+    def _add_virtual_loss(path: List[Tuple[SearchNode, int]], virtual_loss: float) -> None:
+        for node, i in path:
+            node.child_visits[i] += virtual_loss
+            node.child_value_sums[i] -= virtual_loss
+
+    @staticmethod
+    def _backup(path: List[Tuple[SearchNode, int]], value: float, team: Team) -> None:
+        """
+        :param value: the value of the leaf from the perspective of team.
+        """
+        for node, i in path:
+            node.child_visits[i] += 1
+            node.child_value_sums[i] += value if node.team == team else -value
+
+
+class BatchedSearchBot(Agent):
+    """
+    Takes the most visited action of a BatchedSearch.
+    """
+
+    def __init__(self, name, env_conf: EnvConf, model: BatchModel, num_simulations: int = 200, batch_size: int = 16,
+                 seed: Optional[int] = None):
+        super().__init__(name)
+        self.search = BatchedSearch(env_conf, model, batch_size=batch_size, seed=seed)
+        self.num_simulations = num_simulations
+        self.action_queue = []
+
+    def new_game(self, game, team):
+        self.action_queue = []
+
+    def act(self, game):
+        if len(self.action_queue) > 0:
+            return self.action_queue.pop(0)
+        root = self.search.search(game, self.num_simulations)
+        env = self.search.env
+        env.game = game
+        self.action_queue = env.compute_action(root.most_visited_action_idx())
+        return self.action_queue.pop(0)
+
+    def end_game(self, game):
+        pass
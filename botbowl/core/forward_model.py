@@ -8,7 +8,7 @@ Classes and method for recursively tracing changes to objects.
 from abc import ABC, abstractmethod
 from copy import copy
 from enum import Enum
-from typing import Any, List
+from typing import Any, List, Optional
 
 
 class Step(ABC):
@@ -22,8 +22,12 @@ class Step(ABC):
 
 
 class Reversible:
+    # Empty so that subclasses can declare __slots__, which must then include '_trajectory' and '_ignored_keys'.
+    # Subclasses without __slots__ keep an instance __dict__ as usual.
+    __slots__ = ()
     _trajectory: 'Trajectory'
     _ignored_keys: set
+    _slot_names_by_class = {}
 
     def __init__(self, ignored_keys=None):
         if ignored_keys is None:
@@ -39,6 +43,15 @@ class Reversible:
             self.log_this(AssignmentStep(self, key, from_value, to_value))
         super().__setattr__(key, to_value)
 
+    def __setstate__(self, state):
+        # Restores copies and pickles without logging. The state is a (dict, slots) pair if the class has __slots__.
+        dict_state, slot_state = state if isinstance(state, tuple) else (state, None)
+        if dict_state:
+            self.__dict__.update(dict_state)
+        if slot_state:
+            for key, value in slot_state.items():
+                object.__setattr__(self, key, value)
+
     def log_this(self, entry: Any):
         self._trajectory.log_state_change(entry)
 
@@ -51,14 +64,39 @@ class Reversible:
 
         super().__setattr__("_trajectory", trajectory)
 
-        for attr_name in dir(self):
-            attr = getattr(self, attr_name)
-            if attr_name[0] == "_" or callable(attr) or attr_name in self._ignored_keys:
+        # Only instance attributes are tracked. Class attributes are shared by all instances and are not part of the
+        # state, so there is no need to reflect over dir(self)
+        attr_names = self._get_slot_names()
+        instance_dict = getattr(self, '__dict__', None)
+        if instance_dict:
+            attr_names = attr_names + tuple(instance_dict)
+        for attr_name in attr_names:
+            if attr_name[0] == "_" or attr_name in self._ignored_keys:
+                continue
+            attr = getattr(self, attr_name, None)
+            if attr is None or callable(attr):
                 continue
 
             new_value = add_reversibility(attr, trajectory)
-
-            super().__setattr__(attr_name, new_value)
+            if new_value is not attr:
+                super().__setattr__(attr_name, new_value)
+
+    @classmethod
+    def _get_slot_names(cls):
+        """
+        :return: the names of the public slots declared by the class and its bases, computed once per class.
+        """
+        slot_names = Reversible._slot_names_by_class.get(cls)
+        if slot_names is None:
+            slot_names = []
+            for klass in cls.__mro__:
+                slots = klass.__dict__.get('__slots__', ())
+                for name in (slots,) if isinstance(slots, str) else slots:
+                    if name[0] != "_" and name not in slot_names:
+                        slot_names.append(name)
+            slot_names = tuple(slot_names)
+            Reversible._slot_names_by_class[cls] = slot_names
+        return slot_names
 
     def trajectory_initialized(self):
         return self._trajectory is not None
@@ -67,20 +105,54 @@ class Reversible:
 class Trajectory:
     action_log: List[Step]
     enabled: bool
+    checkpoints: List[int]
 
     def __init__(self):
         self.action_log = []
         self.enabled = False
+        self.checkpoints = []
+        self._assignment_index = {}
 
     def __len__(self):
         return len(self.action_log)
 
     def log_state_change(self, log_entry: Any):
         if self.enabled:
+            if self.checkpoints and type(log_entry) is AssignmentStep:
+                # Compaction: only the first from-value of an attribute since the last checkpoint is needed to revert
+                key = (id(log_entry.owner), log_entry.key)
+                index = self._assignment_index.get(key)
+                if index is not None:
+                    self.action_log[index].to_val = log_entry.to_val
+                    return
+                self._assignment_index[key] = len(self.action_log)
             self.action_log.append(log_entry)
 
+    def set_checkpoint(self) -> int:
+        """
+        Registers the current step as a revert target and compacts the steps logged after it: repeated assignments to
+        the same attribute are merged into one step, so reverting a long rollout costs O(distinct attributes changed)
+        rather than O(assignments). Afterwards, only checkpoints and steps up to the first checkpoint are valid revert
+        targets.
+        :return: the step of the checkpoint.
+        """
+        step = len(self.action_log)
+        if not self.checkpoints or self.checkpoints[-1] != step:
+            self.checkpoints.append(step)
+            self._assignment_index = {}
+        return step
+
+    def is_valid_step(self, step: int) -> bool:
+        """
+        :return: True if the trajectory can be reverted to the step, i.e. no steps after it have been compacted away.
+        """
+        if not 0 <= step <= len(self.action_log):
+            return False
+        return not self.checkpoints or step <= self.checkpoints[0] or step in self.checkpoints or \
+            step == len(self.action_log)
+
     def revert(self, to_step: int) -> List[Step]:
-        assert 0 <= to_step <= len(self.action_log)
+        assert self.is_valid_step(to_step)
 
         reverted_steps = self.action_log[to_step:]
         self.action_log = self.action_log[:to_step]
@@ -88,6 +160,11 @@ class Trajectory:
         for log_entry in reversed(reverted_steps):
             log_entry.undo()
 
+        if reverted_steps:
+            while self.checkpoints and self.checkpoints[-1] > to_step:
+                self.checkpoints.pop()
+            self._assignment_index = {}
+
         return reverted_steps
 
     def step_forward(self, steps: List[Step]):
@@ -96,6 +173,24 @@ class Trajectory:
         self.action_log.extend(steps)
 
 
+class StateHandle:
+    """
+    A handle to a state on a branching trajectory, e.g. held by a node in a search tree. It stores the steps that lead
+    from the state of its parent handle to its own, so the game can jump between handles by undoing and redoing only
+    the steps on the path between them. Create and load handles with Game.save_state() and Game.load_state().
+    """
+    __slots__ = ('parent', 'steps', 'step', 'depth')
+
+    def __init__(self, parent: Optional['StateHandle'], steps: List[Step], step: int):
+        self.parent = parent
+        self.steps = steps
+        self.step = step
+        self.depth = 0 if parent is None else parent.depth + 1
+
+    def __repr__(self):
+        return f"StateHandle(step={self.step}, depth={self.depth})"
+
+
 class CallableStep(Step):
     def __init__(self, owner, forward_func, forward_args, backward_func, backward_args):
         self.owner = owner
@@ -330,6 +425,7 @@ def is_immutable(obj):
 
 
 replacement_type = [(list, ReversibleList), (dict, ReversibleDict), (set, ReversibleSet)]
+_replacement_type_by_type = dict(replacement_type)
 immutable_types = {int, float, str, tuple, bool, range, type(None)}
 
 
@@ -348,9 +444,8 @@ def add_reversibility(value, trajectory):
             value.set_trajectory(trajectory)
         return value
 
-    new_types = [t[1] for t in replacement_type if type(value) == t[0]]
-    if len(new_types) == 1:
-        new_type = new_types.pop()
+    new_type = _replacement_type_by_type.get(type(value))
+    if new_type is not None:
         new_value = new_type(value)
         new_value.set_trajectory(trajectory)
         return new_value
@@ -367,7 +462,8 @@ class Immutable:
 
 
 def immutable_after_init(cls):
-    """ Used as decorator to disallow attribute assignments after init"""
+    """ Used as decorator to disallow attribute assignments after init. A class with __slots__ must declare
+    '_initialized' as its last slot, so that copies and unpickled objects are only frozen once fully restored."""
 
     old_init = cls.__init__
 
@@ -376,14 +472,15 @@ def immutable_after_init(cls):
 
 
     def _setattr(self, key, value):
-        if self.__setattr__ is None:
+        if getattr(self, '_initialized', False):
             raise AttributeError()
         object.__setattr__(self, key, value)
 
 
     def init(self, *args, **kwargs):
+        object.__setattr__(self, '_initialized', False)
         old_init(self, *args, **kwargs)
-        self.__setattr__ = None
+        object.__setattr__(self, '_initialized', True)
 
     cls.__init__ = init
     cls.__setattr__ = _setattr
@@ -9,9 +9,8 @@ import itertools
 
 from botbowl.core.load import *
 from botbowl.core.procedure import *
-from botbowl.core.forward_model import Trajectory, MovementStep, Step
-from copy import deepcopy
-from typing import Optional, Tuple, List, Union, Any
+from botbowl.core.forward_model import Trajectory, MovementStep, AssignmentStep, CallableStep, Step, StateHandle
+from typing import Optional, Tuple, List, Union, Any, Dict, Set, Iterable
 
 
 class InvalidActionError(Exception):
@@ -28,6 +27,7 @@ class Game:
     ruleset: RuleSet
     state: GameState
     rnd: np.random.RandomState
+    dice: DiceSource
     ff_map: Any #??
     start_time: Optional[float]
     end_time: Optional[float]
@@ -47,6 +47,9 @@ class Game:
         assert config is not None or arena is not None
         assert config is not None or ruleset is not None
         assert home_team.team_id != away_team.team_id
+        if record and seed is None:
+            # Recorded games are rebuilt from the seed and the actions
+            seed = np.random.randint(0, 2 ** 31)
         self.replay = Replay(replay_id=game_id) if record else None
         self.game_id = game_id
         self.home_agent = home_agent
@@ -54,8 +57,9 @@ class Game:
         self.arena = load_arena(config.arena) if arena is None else arena
         self.config = config
         self.ruleset = load_rule_set(config.ruleset) if ruleset is None else ruleset
-        self.state = state if state is not None else GameState(self, deepcopy(home_team), deepcopy(away_team))
+        self.state = state if state is not None else GameState(self, home_team.fresh_copy(), away_team.fresh_copy())
         self.rnd = np.random.RandomState(seed)
+        self.dice = DiceSource(seed)
         self.ff_map = None
         self.start_time = None
         self.end_time = None
@@ -63,7 +67,15 @@ class Game:
         self.last_action_time = None
         self.action = None
         self.trajectory = Trajectory()
+        self._state_handle = None
+        self.chance_nodes_enabled = False
+        self._outcome_subscriptions = {}
         self.square_shortcut = self.state.pitch.squares
+        self._outside_squares = {}
+        self._action_index_source = None
+        self._action_index = {}
+        if self.replay is not None:
+            self.replay.record_setup(self, home_team, away_team, seed)
 
     def to_json(self, ignore_reports: bool = False):
         return {
@@ -83,6 +95,7 @@ class Game:
             'time_limits': self.config.time_limits.to_json(),
             'active_other_player_id': self.get_other_active_player_id(),
             'rounds': self.config.rounds,
+            'step': self.get_step() if self.trajectory.enabled else None
         }
 
     def enable_forward_model(self) -> None:
@@ -94,6 +107,7 @@ class Game:
 
         self.trajectory.enabled = True
         self.state.set_trajectory(self.trajectory)
+        self.dice.set_trajectory(self.trajectory)
 
     def get_step(self) -> int:
         """
@@ -102,9 +116,21 @@ class Game:
         """
         return len(self.trajectory)
 
+    def set_checkpoint(self) -> int:
+        """
+        Returns the step counter like get_step() and turns on trajectory compaction from this step. Repeated changes
+        to the same attribute after the checkpoint are merged, which makes long rollouts cheaper to store and revert.
+        Afterwards, the game can only be reverted to a checkpoint or to a step before the first checkpoint, and
+        diff_since() returns the full state for other steps. save_state() and load_state() can't be used while the
+        game has checkpoints, i.e. until it is reverted to before the first one.
+        """
+        assert self.trajectory.enabled
+        return self.trajectory.set_checkpoint()
+
     def revert(self, to_step: int) -> List[Step]:
         """
-        :param to_step: reverts the gamestate to this step, this step should come from self.get_step()
+        :param to_step: reverts the gamestate to this step, this step should come from self.get_step() or
+        self.set_checkpoint()
         :returns: list of the undone steps that can be used to redo the steps with function self.foward()
         """
         assert self.trajectory.enabled
@@ -117,6 +143,164 @@ class Game:
         assert self.trajectory.enabled
         self.trajectory.step_forward(steps)
 
+    def save_state(self) -> StateHandle:
+        """
+        Returns a handle to the current state that can be loaded with load_state(), e.g. to move between the nodes of
+        a search tree without stepping the game from the root again. The handle is a child of the handle that was
+        last saved or loaded and holds the steps taken since then. Can't be combined with set_checkpoint(), since
+        compaction merges the steps that the handles hold.
+        """
+        assert self.trajectory.enabled
+        self._check_no_checkpoints()
+        step = self.get_step()
+        current = self._state_handle
+        if current is None or not self._is_on_trajectory(current):
+            current = StateHandle(None, [], step)
+        elif current.step != step:
+            current = StateHandle(current, self.trajectory.action_log[current.step:], step)
+        self._state_handle = current
+        return current
+
+    def load_state(self, handle: StateHandle) -> None:
+        """
+        Moves the game to the state of a handle from save_state() by reverting to the closest common ancestor of the
+        current handle and the given one, and then redoing the steps down to the given handle. Steps taken since the
+        last save_state() or load_state() are discarded. As with revert(), the state of game.rnd is not restored.
+        :param handle: a handle from save_state() on this game.
+        :raises RuntimeError: if the game has checkpoints from set_checkpoint().
+        """
+        assert self.trajectory.enabled
+        self._check_no_checkpoints()
+        current = self._state_handle
+        assert current is not None and self._is_on_trajectory(current)
+        path = []
+        while handle.depth > current.depth:
+            path.append(handle)
+            handle = handle.parent
+        while current.depth > handle.depth:
+            current = current.parent
+        while current is not handle:
+            path.append(handle)
+            handle = handle.parent
+            current = current.parent
+        assert current is not None, "The handle belongs to a different tree of states"
+        self.trajectory.revert(current.step)
+        for ancestor in reversed(path):
+            self.trajectory.step_forward(ancestor.steps)
+        self._state_handle = path[0] if path else current
+
+    def _check_no_checkpoints(self) -> None:
+        if self.trajectory.checkpoints:
+            raise RuntimeError("save_state() and load_state() can't be used on a compacted trajectory, revert to before "
+                               "the first checkpoint from set_checkpoint() first")
+
+    def _is_on_trajectory(self, handle: StateHandle) -> bool:
+        """
+        :return: True if the trajectory still passes through the state of the handle, i.e. it wasn't reverted past it.
+        """
+        if handle.step > len(self.trajectory):
+            return False
+        return len(handle.steps) == 0 or self.trajectory.action_log[handle.step - 1] is handle.steps[-1]
+
+    def diff_since(self, step: int) -> dict:
+        """
+        Returns a compact patch that turns the output of to_json() at the given forward model step into the current
+        one. The patch contains the players that changed, the new reports and, if they changed, the available actions.
+        The small parts of the state, such as the balls, the dugouts, the team states and the procedure stack, are
+        always included. Use apply_game_diff() or the web client's GameDiffService to apply it. Requires the forward
+        model to be enabled and the game to not have been reverted to before step since. If the steps since step were
+        compacted after a set_checkpoint(), the patch contains the full to_json() in 'full_game' instead.
+        :param step: a step counter from get_step(), e.g. the 'step' of the previous patch.
+        :return: the patch as a json-serializable dict.
+        """
+        assert self.trajectory.enabled
+        if not self.trajectory.is_valid_step(step):
+            return {'step': len(self.trajectory), 'from_step': step, 'full_game': self.to_json()}
+
+        # Map the objects and containers that make up each player to the player
+        player_by_obj_id = {}
+        for player in self.state.player_by_id.values():
+            player_by_obj_id[id(player)] = player
+            player_by_obj_id[id(player.state)] = player
+            for obj in (player, player.state):
+                for key in type(obj).__slots__:
+                    value = getattr(obj, key, None)
+                    if isinstance(value, (list, set)):
+                        player_by_obj_id[id(value)] = player
+
+        reports = self.state.reports
+        changed_players = {}
+        num_new_reports = 0
+        reports_reset = False
+        available_actions_changed = False
+        for entry in self.trajectory.action_log[step:]:
+            owner = entry.piece if type(entry) is MovementStep else entry.owner
+            if owner is reports:
+                if entry.forward_func is list.append:
+                    num_new_reports += 1
+                else:
+                    reports_reset = True
+            elif owner is self.state and type(entry) is AssignmentStep:
+                if entry.key == 'reports':
+                    reports_reset = True
+                elif entry.key == 'available_actions':
+                    available_actions_changed = True
+            else:
+                player = player_by_obj_id.get(id(owner))
+                if player is not None:
+                    changed_players[player.player_id] = player
+
+        if reports_reset:
+            new_reports = reports
+        else:
+            new_reports = reports[len(reports) - num_new_reports:]
+        state = self.state
+
+        def team_id(team):
+            return team.team_id if team is not None else None
+
+        return {
+            'step': len(self.trajectory),
+            'from_step': step,
+            'game': {
+                'start_time': self.start_time,
+                'end_time': self.end_time,
+                'stack': self.get_procedure_names(),
+                'squares_moved': self._squares_moved(),
+                'can_home_team_use_reroll': self.can_use_reroll(state.home_team),
+                'can_away_team_use_reroll': self.can_use_reroll(state.away_team),
+                'actor_id': self.actor.agent_id if self.actor is not None else None,
+                'active_other_player_id': self.get_other_active_player_id()
+            },
+            'state': {
+                'half': state.half,
+                'kicking_first_half': team_id(state.kicking_first_half),
+                'receiving_first_half': team_id(state.receiving_first_half),
+                'kicking_this_drive': team_id(state.kicking_this_drive),
+                'receiving_this_drive': team_id(state.receiving_this_drive),
+                'home_dugout': state.dugouts[state.home_team.team_id].to_json(),
+                'away_dugout': state.dugouts[state.away_team.team_id].to_json(),
+                'game_over': state.game_over,
+                'weather': state.weather.name,
+                'gentle_gust': state.gentle_gust,
+                'current_team_id': team_id(state.current_team),
+                'round': state.round,
+                'spectators': state.spectators,
+                'active_player_id': state.active_player.player_id if state.active_player is not None else None,
+                'clocks': [clock.to_json() for clock in state.clocks],
+                'player_action_type': state.player_action_type.name if state.player_action_type is not None else None
+            },
+            'balls': [ball.to_json() for ball in state.pitch.balls],
+            'bomb': state.pitch.bomb.to_json() if state.pitch.bomb else None,
+            'home_team_state': state.home_team.state.to_json(),
+            'away_team_state': state.away_team.state.to_json(),
+            'players': [player.to_json() for player in changed_players.values()],
+            'reports': [report.to_json() for report in new_reports],
+            'reports_reset': reports_reset,
+            'available_actions': [action.to_json() for action in state.available_actions]
+            if available_actions_changed else None
+        }
+
     @property
     def active_team(self) -> Optional[Team]:
         if len(self.state.available_actions) > 0:
@@ -145,9 +329,6 @@ class Game:
         # Start game if no humans
         if not self.away_agent.human and not self.home_agent.human:
             start_action = Action(ActionType.START_GAME)
-            # Record state
-            if self.replay is not None:
-                self.replay.record_action(start_action)
             self.step(start_action)
 
     def step(self, action=None) -> None:
@@ -171,6 +352,10 @@ class Game:
             # Perform game step
             done = self._one_step(self.action)
 
+            # Record the actions of agents, which together with the seed are enough to rebuild the game
+            if self.replay is not None and self.action is not None:
+                self.replay.record_action(self.action)
+
             # Game over
             if self.state.game_over:
                 self._end_game()
@@ -207,6 +392,10 @@ class Game:
                 if not self.config.fast_mode:
                     break
 
+                # Stop before dice are rolled so the outcome can be chosen with resolve_chance()
+                if self.chance_nodes_enabled and self.get_chance_outcomes() is not None:
+                    break
+
                 # Else continue procedure with no action
                 self.action = None
 
@@ -220,6 +409,26 @@ class Game:
         if not self.state.game_over and len(self.state.available_actions) == 0:
             self.step(None)
 
+    def get_chance_outcomes(self) -> Optional[List[ChanceOutcome]]:
+        """
+        If the game is at a chance node, i.e. the next step rolls dice instead of waiting for an action, returns the
+        distinct outcomes of the roll with their probabilities. Set chance_nodes_enabled to make step() stop at chance
+        nodes. Only the procedures that implement Procedure.chance_outcomes() are chance nodes, other rolls are sampled
+        as usual.
+        :return: a list of ChanceOutcome with probabilities summing to one, or None if the game isn't at a chance node.
+        """
+        if len(self.state.available_actions) > 0 or self.state.stack.is_empty() or self.state.game_over:
+            return None
+        return self.get_procedure().chance_outcomes()
+
+    def resolve_chance(self, outcome: ChanceOutcome) -> None:
+        """
+        Continues the game from a chance node with the dice fixed to the given outcome.
+        :param outcome: one of the outcomes returned by get_chance_outcomes().
+        """
+        outcome.fix()
+        self.step(None)
+
     def _check_clocks(self) -> None:
         """
         Checks if clocks are done.
@@ -274,6 +483,21 @@ class Game:
             self.replay.record_step(self)
             self.replay.dump(self)
 
+    def _get_action_index(self) -> Dict[ActionType, Tuple[ActionChoice, Set[Square], Set[str]]]:
+        """
+        :return: a dict from action type to the first action choice of that type in self.state.available_actions,
+        together with the sets of its positions and player ids. The dict is rebuilt when the available actions change.
+        """
+        if self._action_index_source is not self.state.available_actions:
+            index = {}
+            for action_choice in self.state.available_actions:
+                if action_choice.action_type not in index:
+                    index[action_choice.action_type] = (action_choice, set(action_choice.positions),
+                                                        {player.player_id for player in action_choice.players})
+            self._action_index = index
+            self._action_index_source = self.state.available_actions
+        return self._action_index
+
     def _is_action_allowed(self, action: Action) -> bool:
         """
         Checks whether the specified action is allowed by comparing to actions in self.state.available_actions.
@@ -282,40 +506,41 @@ class Game:
         """
         if action is None:
             return True
-        for action_choice in self.state.available_actions:
-            if action.action_type == action_choice.action_type:
-                # Type checking
-                if type(action.action_type) is not ActionType:
-                    print("Illegal action type: ", type(action.action_type))
-                    return False
-                if action.player is not None and not isinstance(action.player, Player):
-                    print("Illegal player type: ", type(action.action_type), action, self.state.stack.peek())
-                    return False
-                if action.position is not None and not isinstance(action.position, Square):
-                    print("Illegal position type:", type(action.position), action.action_type.name)
-                    return False
-                # Check if player argument is used instead of position argument
-                if len(action_choice.players) == 0 and action.player is not None and action.position is None:
-                    action.position = action.player.position
-                    # Check if player argument is used instead of position argument
-                elif len(action_choice.positions) == 0 and action.position is not None and action.player is None:
-                    action.player = self.get_player_at(action.position)
-                # Check player argument
-                if len(action_choice.players) > 1 and action.player not in action_choice.players:
-                    if action.player is None:
-                        print("Illegal player: None")
-                    else:
-                        print("Illegal player:", action.player.to_json(), action.action_type.name)
-                    return False
-                # Check position argument
-                if len(action_choice.positions) > 0 and action.position not in action_choice.positions:
-                    if action.position is None:
-                        print("Illegal position: None")
-                    else:
-                        print("Illegal position:", action.position.to_json(), action.action_type.name)
-                    return False
-                return True
-        return False
+        entry = self._get_action_index().get(action.action_type)
+        if entry is None:
+            return False
+        action_choice, positions, player_ids = entry
+        # Type checking
+        if type(action.action_type) is not ActionType:
+            print("Illegal action type: ", type(action.action_type))
+            return False
+        if action.player is not None and not isinstance(action.player, Player):
+            print("Illegal player type: ", type(action.action_type), action, self.state.stack.peek())
+            return False
+        if action.position is not None and not isinstance(action.position, Square):
+            print("Illegal position type:", type(action.position), action.action_type.name)
+            return False
+        # Check if player argument is used instead of position argument
+        if len(action_choice.players) == 0 and action.player is not None and action.position is None:
+            action.position = action.player.position
+            # Check if player argument is used instead of position argument
+        elif len(action_choice.positions) == 0 and action.position is not None and action.player is None:
+            action.player = self.get_player_at(action.position)
+        # Check player argument
+        if len(action_choice.players) > 1 and (action.player is None or action.player.player_id not in player_ids):
+            if action.player is None:
+                print("Illegal player: None")
+            else:
+                print("Illegal player:", action.player.to_json(), action.action_type.name)
+            return False
+        # Check position argument
+        if len(action_choice.positions) > 0 and action.position not in positions:
+            if action.position is None:
+                print("Illegal position: None")
+            else:
+                print("Illegal position:", action.position.to_json(), action.action_type.name)
+            return False
+        return True
 
     def _safe_act(self) -> Optional[Action]:
         """
@@ -616,6 +841,29 @@ class Game:
         '''
         self.seed = seed
         self.rnd = np.random.RandomState(self.seed)
+        self.dice = DiceSource(self.seed)
+        if self.trajectory.enabled:
+            self.dice.set_trajectory(self.trajectory)
+
+    def set_random_streams(self, seed: int) -> None:
+        """
+        Replaces game.dice and game.rnd with fresh streams from the given seed, without changing game.seed. Search
+        algorithms can use this to evaluate sibling actions under the same dice and random choices (common random
+        numbers), which makes their comparison far less noisy. When the forward model is enabled, the replacement is
+        logged, so reverting to a step before it also restores the previous streams.
+        :param seed: the seed of the new streams.
+        """
+        dice = DiceSource(seed)
+        rnd = np.random.RandomState(seed)
+        if self.trajectory.enabled:
+            dice.set_trajectory(self.trajectory)
+            self.trajectory.log_state_change(CallableStep(self, Game._set_random_streams, (dice, rnd),
+                                                          Game._set_random_streams, (self.dice, self.rnd)))
+        self._set_random_streams(dice, rnd)
+
+    def _set_random_streams(self, dice: DiceSource, rnd: np.random.RandomState) -> None:
+        self.dice = dice
+        self.rnd = rnd
 
     def set_available_actions(self) -> None:
         """
@@ -626,9 +874,46 @@ class Game:
 
     def report(self, outcome) -> None:
         """
-        Adds the outcome to the game's reports.
+        Adds the outcome to the game's reports and counts it in the counters subscribed to its type.
         """
         self.state.reports.append(outcome)
+        subscriptions = self._outcome_subscriptions.get(outcome.outcome_type)
+        if subscriptions:
+            self._count_outcome(outcome, subscriptions)
+
+    def subscribe_outcomes(self, outcome_types: Iterable[OutcomeType]) -> OutcomeCounter:
+        """
+        Returns a counter of the outcomes of the given types that are reported from now on, e.g. for reward shaping
+        without scanning game.state.reports. The counts are updated by report() and reverted by the forward model.
+        :param outcome_types: the outcome types to count.
+        :return: an OutcomeCounter with a column for each outcome type.
+        """
+        counter = OutcomeCounter(list(outcome_types))
+        for column, outcome_type in enumerate(counter.outcome_types):
+            self._outcome_subscriptions.setdefault(outcome_type, []).append((counter, column))
+        return counter
+
+    def unsubscribe_outcomes(self, counter: OutcomeCounter) -> None:
+        """
+        Stops updating a counter from subscribe_outcomes().
+        """
+        for outcome_type in counter.outcome_types:
+            subscriptions = self._outcome_subscriptions[outcome_type]
+            subscriptions[:] = [subscription for subscription in subscriptions if subscription[0] is not counter]
+
+    def _count_outcome(self, outcome: Outcome, subscriptions: List[Tuple[OutcomeCounter, int]]) -> None:
+        team = outcome.player.team if outcome.player is not None else outcome.team
+        if team is self.state.home_team:
+            row = 0
+        elif team is self.state.away_team:
+            row = 1
+        else:
+            return
+        for counter, column in subscriptions:
+            counter.add(row, column)
+            if self.trajectory.enabled:
+                self.trajectory.log_state_change(CallableStep(counter, OutcomeCounter.add, (row, column),
+                                                              OutcomeCounter.remove, (row, column)))
 
     def is_started(self) -> bool:
         return self.start_time is not None
@@ -1026,6 +1311,24 @@ class Game:
         self.put(player, position)
         player.state.up = True
 
+    def setup_players(self, team: Team, placements: List[Tuple[Player, Square]]) -> None:
+        """
+        Moves all players of the team from the pitch to the reserves and then puts the given players on the pitch. This
+        is equivalent to, but faster than, placing the players one by one with PLACE_PLAYER actions.
+        :param team:
+        :param placements: list of (player, position) tuples with players of the team.
+        """
+        for player in team.players:
+            if player.position is not None:
+                self.pitch_to_reserves(player)
+                self.report(Outcome(OutcomeType.PLAYER_PLACED, position=None, player=player))
+        reserves = self.get_reserves(team)
+        for player, position in placements:
+            reserves.remove(player)
+            self.put(player, position)
+            player.state.up = True
+            self.report(Outcome(OutcomeType.PLAYER_PLACED, position=position, player=player))
+
     def pitch_to_kod(self, player: Player) -> None:
         """
         Moves player from the pitch to the KO section in the dugout.
@@ -1164,6 +1467,12 @@ class Game:
         assert piece_b.position is not None
         pos_a = piece_a.position
         pos_b = piece_b.position
+        if type(piece_a) is Player and type(piece_b) is Player:
+            board = self.state.pitch.board
+            self.trajectory.log_state_change(MovementStep(board, piece_a, pos_a, put=False))
+            self.trajectory.log_state_change(MovementStep(board, piece_b, pos_b, put=False))
+            self.trajectory.log_state_change(MovementStep(board, piece_a, pos_b, put=True))
+            self.trajectory.log_state_change(MovementStep(board, piece_b, pos_a, put=True))
         piece_a.position = pos_b
         piece_b.position = pos_a
         if type(piece_b) is Player:
@@ -1643,43 +1952,96 @@ class Game:
         defender = self.get_player_at(to_position)
         if defender.has_skill(Skill.SIDE_STEP) and not attacker.has_skill(Skill.GRAB):
             return self.get_adjacent_squares(to_position, out=True, occupied=False)
-        squares_to = self.get_adjacent_squares(to_position, out=True)
-        squares_empty = []
-        squares_out = []
-        squares = []
-        for square in squares_to:
-            include = False
-            if from_position.x == to_position.x or from_position.y == to_position.y:
-                if from_position.distance(square, manhattan=False) >= 2:
-                    include = True
-            else:
-                if from_position.distance(square, manhattan=True) >= 3:
-                    include = True
-            if include:
-                if square.out_of_bounds:
-                    squares_out.append(square)
-                elif self.get_player_at(square) is None:
-                    squares_empty.append(square)
-                squares.append(square)
+        squares = self._get_push_candidates(from_position, to_position)
+        board = self.state.pitch.board
+        squares_empty = [square for square in squares
+                         if not square.out_of_bounds and board[square.y][square.x] is None]
         if len(squares_empty) > 0:
             return squares_empty
+        squares_out = [square for square in squares if square.out_of_bounds]
         if len(squares_out) > 0:
             return squares_out
         assert len(squares) > 0
-        return squares
+        return list(squares)
+
+    def is_crowd_push(self, attacker: Player, defender: Player) -> bool:
+        """
+        A fast check that doesn't build the list of push squares.
+        :param attacker: The player blocking from its current position.
+        :param defender: The player being blocked.
+        :return: True if the defender can only be pushed into the crowd, ignoring Stand Firm.
+        """
+        if defender.has_skill(Skill.SIDE_STEP) and not attacker.has_skill(Skill.GRAB) and \
+                len(self.get_adjacent_squares(defender.position, occupied=False)) > 0:
+            return False
+        board = self.state.pitch.board
+        crowd = False
+        for square in self._get_push_candidates(attacker.position, defender.position):
+            if square.out_of_bounds:
+                crowd = True
+            elif board[square.y][square.x] is None:
+                return False
+        return crowd
+
+    def _get_push_candidates(self, from_position: Square, to_position: Square) -> List[Square]:
+        """
+        :param from_position: The position of the attacker.
+        :param to_position: The position of the defender.
+        :return: the three squares behind the defender, as seen from the attacker, regardless of occupancy.
+        """
+        table = _push_square_tables.get((self.arena.width, self.arena.height))
+        if table is None:
+            table = _compute_push_square_table(self.arena.width, self.arena.height)
+            _push_square_tables[(self.arena.width, self.arena.height)] = table
+        dx = to_position.x - from_position.x
+        dy = to_position.y - from_position.y
+        return self.get_squares_by_ids(table[to_position.y][to_position.x][(dy + 1) * 3 + dx + 1])
 
     def get_square(self, x, y) -> Square:
         """
-        Returns an existing square object for the given position to avoid a new instantiation. If the square object
-        is out of bounds it may be instantiated.
+        Returns an existing square object for the given position to avoid a new instantiation. Squares outside the
+        board are interned as well, so equal positions always map to the same object.
         :param x:
         :param y:
         :return: A square with the position (x,y)
         """
-        try:
+        if 0 <= x < self.arena.width and 0 <= y < self.arena.height:
             return self.square_shortcut[y][x]
-        except IndexError:
-            return Square(x, y, _out_of_bounds=x <= 0 or x >= self.arena.width-1 or y <= 0 or y >= self.arena.height-1)
+        square = self._outside_squares.get((x, y))
+        if square is None:
+            square = Square(x, y, _out_of_bounds=True)
+            self._outside_squares[(x, y)] = square
+        return square
+
+    def get_square_id(self, square: Square) -> int:
+        """
+        :return: the dense integer id of a square on the board, y * width + x, i.e. its index in a flattened layer.
+        """
+        return square.y * self.arena.width + square.x
+
+    def get_square_by_id(self, square_id: int) -> Square:
+        """
+        :return: the interned square with the given dense id.
+        """
+        return self.state.pitch.get_square_by_id(square_id)
+
+    def get_square_ids(self, squares: Iterable[Optional[Square]]) -> np.ndarray:
+        """
+        Converts squares to dense ids that can be used for fancy indexing into a flattened (height, width) array,
+        e.g. layer.flat[game.get_square_ids(squares)] = 1. None entries are skipped.
+        :param squares:
+        :return: an integer array of square ids.
+        """
+        width = self.arena.width
+        return np.fromiter((square.y * width + square.x for square in squares if square is not None), dtype=np.intp)
+
+    def get_squares_by_ids(self, square_ids: Iterable[int]) -> List[Square]:
+        """
+        :return: the interned squares with the given dense ids.
+        """
+        squares = self.state.pitch.squares
+        width = self.arena.width
+        return [squares[square_id // width][square_id % width] for square_id in square_ids]
 
     def get_adjacent_squares(self, position: Square, diagonal=True, out=False, occupied=True, distance=1) \
             -> List[Square]:
@@ -1861,8 +2223,7 @@ class Game:
         :return: a tuple containing the knock-down probabilities of the attacker and defender.
         """
         dice = self.num_block_dice(attacker, defender)
-        push_squares = self.get_push_squares(attacker.position, defender.position)
-        crowd_push = self.arena.board[push_squares[0].y][push_squares[0].x] == Tile.CROWD and not defender.has_skill(Skill.STAND_FIRM)
+        crowd_push = self.is_crowd_push(attacker, defender) and not defender.has_skill(Skill.STAND_FIRM)
         p_self = 1.0 / 6.0 if attacker.has_skill(Skill.BLOCK) else 2.0 / 6.0
         p_opp = 2.0 / 6.0 if attacker.has_skill(Skill.BLOCK) else 2.0 / 6.0
         if crowd_push:
@@ -2139,17 +2500,29 @@ class Game:
                                  PassDistance.LONG_BOMB,
                                  PassDistance.HAIL_MARY] if Skill.HAIL_MARY_PASS in passer.get_skills() \
                 else [PassDistance.QUICK_PASS, PassDistance.SHORT_PASS, PassDistance.LONG_PASS, PassDistance.LONG_BOMB]
-        for y in range(len(self.state.pitch.board)):
-            for x in range(len(self.state.pitch.board[y])):
-                to_position = self.get_square(x, y)
-                if to_position.out_of_bounds or position == to_position:
-                    continue
-                distance = self.get_pass_distance(position, to_position)
-                if distance in distances_allowed:
-                    squares.append(to_position)
-                    distances.append(distance)
+        table, in_bounds = self._get_pass_distance_table()
+        height, width = in_bounds.shape
+        distance_values = table[np.abs(np.arange(height) - position.y)[:, None],
+                                np.abs(np.arange(width) - position.x)[None, :]]
+        mask = np.isin(distance_values, [distance.value for distance in distances_allowed]) & in_bounds
+        mask[position.y, position.x] = False
+        square_ids = np.flatnonzero(mask)
+        squares = self.get_squares_by_ids(square_ids.tolist())
+        distances = [_pass_distance_by_value[value] for value in distance_values.flat[square_ids].tolist()]
         return squares, distances
 
+    def _get_pass_distance_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: the PassDistance values indexed by [abs(dy)][abs(dx)] and a mask of the squares inside the pitch, both
+        with the shape (height, width) of the arena.
+        """
+        key = (self.arena.width, self.arena.height)
+        tables = _pass_distance_tables.get(key)
+        if tables is None:
+            tables = _compute_pass_distance_table(self.arena.width, self.arena.height)
+            _pass_distance_tables[key] = tables
+        return tables
+
     def get_pass_distance(self, from_position: Square, to_position: Square) -> PassDistance:
         """
         :param from_position:
@@ -2196,54 +2569,29 @@ class Game:
         :param team: team that can attempt interception
         """
 
-        # 1) Find line x from a to b
-        x = get_line((position_from.x, position_from.y), (position_to.x, position_to.y))
-
-        # 3) Find squares s where x intersects
-        s = []
-        for i in x:
-            s.append(self.get_square(i[0], i[1]))
-
-        # 3) Include manhattan neighbors s into n
-        # 4) Remove squares where distance to a is larger than dist(a,b)
-        max_distance = position_from.distance(position_to)
-        n = set()
-        for square in s:
-            for neighbor in self.get_adjacent_squares(square) + [square]:
-
-                if neighbor in n:
-                    continue
-
-                # 4) Remove squares where distance to a is larger than dist(a,b)
-                if neighbor.distance(position_from) > max_distance:
-                    continue
-                if neighbor.distance(position_to) > max_distance:
-                    continue
-                if neighbor.x > max(position_from.x, position_to.x) or neighbor.x < min(position_from.x, position_to.x):
-                    continue
-                if neighbor.y > max(position_from.y, position_to.y) or neighbor.y < min(position_from.y, position_to.y):
-                    continue
-
-                # 5) Remove squares without standing opponents with hands
-                player_at = self.get_player_at(neighbor)
-                if player_at is None:
-                    continue
-                if player_at.team != team:
-                    continue
-                if not player_at.can_catch():
-                    continue
-                if player_at.has_skill(Skill.NO_HANDS):
-                    continue
-                n.add(neighbor)
-
-        if position_from in n:
-            n.remove(position_from)
-        if position_to in n:
-            n.remove(position_to)
+        # 1-4) The squares only depend on the offset between a and b and are computed once per offset
+        dx = position_to.x - position_from.x
+        dy = position_to.y - position_from.y
+        corridor = _interception_corridors.get((dx, dy))
+        if corridor is None:
+            corridor = _compute_interception_corridor(dx, dy)
+            _interception_corridors[(dx, dy)] = corridor
 
+        # 5) Remove squares without standing opponents with hands
+        # 6) Determine players on squares
+        board = self.state.pitch.board
         players = []
-        for square in n:
-            players.append(self.get_player_at(square))
+        for x, y in corridor:
+            player_at = board[position_from.y + y][position_from.x + x]
+            if player_at is None:
+                continue
+            if player_at.team != team:
+                continue
+            if not player_at.can_catch():
+                continue
+            if player_at.has_skill(Skill.NO_HANDS):
+                continue
+            players.append(player_at)
 
         return players
 
@@ -2623,4 +2971,81 @@ _directions = [(1, 1),
               (0, -1),
               (-1, 1),
               (-1, 0),
-              (-1, -1)]
\ No newline at end of file
+              (-1, -1)]
+
+# Ids of the push squares, see Game.get_square_id(), indexed by arena size, then [y][x][direction] of the defender with
+# direction = (dy + 1) * 3 + dx + 1. The tables are shared by all games, so they hold ids rather than squares.
+_push_square_tables = {}
+
+
+def _compute_push_square_table(width, height):
+    """
+    :return: a table with the ids of the squares a player on (x, y) can be pushed to from each direction, in the order
+    of _directions.
+    """
+    table = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            cell = [() for _ in range(9)]
+            if 0 < x < width - 1 and 0 < y < height - 1:
+                to_position = Square(x, y)
+                for dx, dy in _directions:
+                    from_position = Square(x - dx, y - dy)
+                    square_ids = []
+                    for xx, yy in _directions:
+                        square = Square(x + xx, y + yy)
+                        if dx == 0 or dy == 0:
+                            include = from_position.distance(square, manhattan=False) >= 2
+                        else:
+                            include = from_position.distance(square, manhattan=True) >= 3
+                        if include:
+                            square_ids.append(square.y * width + square.x)
+                    cell[(dy + 1) * 3 + dx + 1] = tuple(square_ids)
+            row.append(cell)
+        table.append(row)
+    return table
+
+
+# PassDistance values indexed by [abs(dy)][abs(dx)] and in-bounds masks, indexed by arena size
+_pass_distance_tables = {}
+_pass_distance_by_value = {distance.value: distance for distance in PassDistance}
+
+
+def _compute_pass_distance_table(width, height):
+    """
+    :return: the PassDistance values for each offset between two squares and a mask of the squares inside the pitch.
+    """
+    table = np.full((height, width), PassDistance.HAIL_MARY.value, dtype=np.int8)
+    rows = min(height, len(Rules.pass_matrix))
+    columns = min(width, len(Rules.pass_matrix[0]))
+    table[:rows, :columns] = np.array(Rules.pass_matrix)[:rows, :columns]
+    in_bounds = np.zeros((height, width), dtype=bool)
+    in_bounds[1:height - 1, 1:width - 1] = True
+    return table, in_bounds
+
+
+# Offsets of the squares from which a pass can be intercepted, relative to the passer and indexed by the offset (dx, dy)
+# of the target. The squares lie between the passer and the target, so they are inside the pitch when both are.
+_interception_corridors = {}
+
+
+def _compute_interception_corridor(dx, dy):
+    """
+    :return: the offsets (x, y) of the squares on or next to the line from (0, 0) to (dx, dy) that are no further from
+    either end than the ends are from each other and lie within their bounding box, excluding the ends.
+    """
+    max_distance = max(abs(dx), abs(dy))
+    corridor = set()
+    for line_x, line_y in get_line((0, 0), (dx, dy)):
+        for xx, yy in _directions + [(0, 0)]:
+            x = line_x + xx
+            y = line_y + yy
+            if max(abs(x), abs(y)) > max_distance or max(abs(x - dx), abs(y - dy)) > max_distance:
+                continue
+            if x > max(0, dx) or x < min(0, dx) or y > max(0, dy) or y < min(0, dy):
+                continue
+            corridor.add((x, y))
+    corridor.discard((0, 0))
+    corridor.discard((dx, dy))
+    return sorted(corridor, key=lambda offset: (offset[1], offset[0]))
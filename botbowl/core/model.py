@@ -12,8 +12,9 @@ from botbowl.core.forward_model import Immutable, Reversible, CallableStep, trea
 
 from abc import ABC, abstractmethod
 from copy import copy, deepcopy
-from typing import List, Optional, Set, Dict
+from typing import List, Optional, Set, Dict, Union
 
+import bisect
 import numpy as np
 import uuid
 import time
@@ -37,12 +38,22 @@ class Replay:
         self.actions = {}
         self.reports = []
         self.idx = 0
+        # What is needed to rebuild the game from its actions, see record_setup()
+        self.seed = None
+        self.config = None
+        self.arena = None
+        self.ruleset = None
+        self.home_team = None
+        self.away_team = None
         if load:
             filename = get_data_path('replays') + "/" + replay_id + ".rep"
             replay = pickle.load(open(filename, "rb"))
             self.steps = replay.steps
             self.actions = replay.actions
             self.reports = replay.reports
+            # Replays recorded before the setup was stored can't be rebuilt
+            for attr in ['seed', 'config', 'arena', 'ruleset', 'home_team', 'away_team']:
+                setattr(self, attr, getattr(replay, attr, None))
             self.idx = 0
             # Construct step reports
             for idx, step in self.steps.items():
@@ -51,6 +62,18 @@ class Replay:
                 else:
                     step.game['state']['reports'] = [report.to_json() for report in self.reports[:step.num_reports]]
 
+    def record_setup(self, game, home_team, away_team, seed):
+        """
+        Stores the seed, configuration and teams that the game was created with. Together with the recorded actions
+        they are enough to rebuild every state of the game.
+        """
+        self.seed = seed
+        self.config = game.config
+        self.arena = game.arena
+        self.ruleset = game.ruleset
+        self.home_team = home_team.fresh_copy()
+        self.away_team = away_team.fresh_copy()
+
     def record_step(self, game):
         state = game.to_json(ignore_reports=True)
         self.steps[self.idx] = ReplayStep(state, len(game.state.reports))
@@ -74,27 +97,26 @@ class Replay:
         print(f"Replay saved to {filename}")
 
     def next(self):
-        if len(self.steps) == 0 or self.idx + 1 >= len(self.steps):
+        # Steps and actions share the index, so the step keys have gaps where actions were recorded
+        keys = sorted(self.steps)
+        i = bisect.bisect_right(keys, self.idx)
+        if i >= len(keys):
             return None
-        self.idx += 1
-        while self.idx not in self.steps:
-            # print(self.actions[self.idx])
-            self.idx += 1
+        self.idx = keys[i]
         return self.steps[self.idx]
 
     def prev(self):
-        if len(self.steps) == 0 or self.idx - 1 < 0:
+        keys = sorted(self.steps)
+        i = bisect.bisect_left(keys, self.idx) - 1
+        if i < 0:
             return None
-        self.idx -= 1
-        while self.idx not in self.steps:
-            # print(self.actions[self.idx])
-            self.idx -= 1
+        self.idx = keys[i]
         return self.steps[self.idx]
 
     def first(self):
         if len(self.steps) == 0:
             return None
-        self.idx = 0
+        self.idx = min(self.steps.keys())
         return self.steps[self.idx]
 
     def last(self):
@@ -177,6 +199,10 @@ class Configuration:
 
 
 class PlayerState(Reversible):
+    __slots__ = ('_trajectory', '_ignored_keys', 'up', 'in_air', 'used', 'spp_earned', 'moves', 'stunned', 'bone_headed',
+                 'hypnotized', 'really_stupid', 'heated', 'knocked_out', 'ejected', 'injuries_gained', 'wild_animal',
+                 'taken_root', 'blood_lust', 'picked_up', 'used_skills', 'squares_moved', 'has_blocked',
+                 'failed_nega_trait_this_turn')
     up: bool
     in_air: bool
     used: bool
@@ -558,6 +584,18 @@ class Pitch(Reversible):
         self.height = len(self.board)
         self.width = len(self.board[0])
 
+    def get_square_id(self, square: 'Square') -> int:
+        """
+        :return: the dense integer id of the square, i.e. its index in a flattened (height, width) array.
+        """
+        return square.y * self.width + square.x
+
+    def get_square_by_id(self, square_id: int) -> 'Square':
+        """
+        :return: the interned square with the given dense id.
+        """
+        return self.squares[square_id // self.width][square_id % self.width]
+
     def to_json(self):
         board = []
         for y in range(len(self.board)):
@@ -625,6 +663,7 @@ class ActionChoice:
 
 @treat_as_immutable
 class Action:
+    __slots__ = ('action_type', 'position', 'player')
     action_type: ActionType
     position: Optional['Square']
     player: Optional['Player']
@@ -698,6 +737,8 @@ class Die(ABC):
 
 @treat_as_immutable
 class DiceRoll:
+    __slots__ = ('dice', 'sum', 'd68', 'target', 'modifiers', 'roll_type', 'target_higher', 'target_lower',
+                 'highest_succeed', 'lowest_fail', 'result')
     dice: List[Die]
     modifiers: int
     target: Optional[int]
@@ -793,6 +834,37 @@ class DiceRoll:
         return True
 
 
+class DiceSource(Reversible):
+    """
+    A seeded source of dice results that draws random numbers in large blocks and hands them out one by one, which is
+    much faster than calling RandomState.randint() for every die. The position in the stream is tracked by the forward
+    model, so reverting a game also rewinds its dice.
+    """
+    BLOCK_SIZE = 4096
+    # Divisible by the number of sides of all dice, so the results are uniform
+    _RANGE = 24
+
+    def __init__(self, seed=None):
+        super().__init__()
+        self._generator = np.random.default_rng(seed)
+        self._values = []
+        self.index = 0
+
+    def randint(self, low, high):
+        """
+        A drop-in replacement for RandomState.randint(low, high) for the ranges of the dice.
+        :return: a random integer in [low, high).
+        """
+        sides = high - low
+        if DiceSource._RANGE % sides != 0:
+            raise ValueError(f"DiceSource can't draw uniformly from {sides} values")
+        while self.index >= len(self._values):
+            self._values.extend(self._generator.integers(0, DiceSource._RANGE, DiceSource.BLOCK_SIZE).tolist())
+        value = self._values[self.index]
+        self.index += 1
+        return low + value % sides
+
+
 class D3(Die):
     FixedRolls = []
 
@@ -931,6 +1003,37 @@ class BBDie(Die, Immutable):
         }
 
 
+class ChanceOutcome:
+    """
+    One of the distinct outcomes of the dice roll that a procedure is about to make, see Game.get_chance_outcomes().
+    The rolls are one representative set of die results that leads to the outcome, and fix() forces them through the
+    FixedRolls mechanism so that the next step takes this branch.
+    """
+    __slots__ = ('outcome_type', 'probability', 'rolls')
+
+    def __init__(self, outcome_type: OutcomeType, probability: float, rolls: List[Union[int, BBDieResult]]):
+        self.outcome_type = outcome_type
+        self.probability = probability
+        self.rolls = rolls
+
+    def fix(self):
+        for value in self.rolls:
+            if type(value) is BBDieResult:
+                BBDie.fix(value)
+            else:
+                D6.fix(value)
+
+    def __repr__(self):
+        return f"ChanceOutcome({self.outcome_type}, probability={self.probability:.3f}, rolls={self.rolls})"
+
+    def to_json(self):
+        return {
+            'outcome_type': self.outcome_type.name,
+            'probability': self.probability,
+            'rolls': [value.name if type(value) is BBDieResult else value for value in self.rolls]
+        }
+
+
 class Dugout(Reversible):
 
     def __init__(self, team):
@@ -970,6 +1073,7 @@ class Role:
 
 
 class Piece:
+    __slots__ = ('position',)
     position: 'Square'
 
     def __init__(self, position=None):
@@ -1040,6 +1144,9 @@ class Bomb(Catchable, Reversible):
 
 
 class Player(Piece, Reversible):
+    # '__dict__' keeps the attributes that bots attach to players working, the model's own attributes are all slots
+    __slots__ = ('_trajectory', '_ignored_keys', 'player_id', 'role', 'name', 'nr', 'team', 'extra_skills', 'extra_ma',
+                 'extra_st', 'extra_ag', 'extra_av', 'injuries', 'mng', 'spp', 'state', '__dict__')
     player_id: str
     role: Role
     nr: int
@@ -1071,6 +1178,15 @@ class Player(Piece, Reversible):
         self.spp = spp
         self.state = PlayerState()
 
+    def fresh_copy(self, team):
+        """
+        :param team: the team the copied player belongs to.
+        :return: a copy of the player with a new PlayerState and no position. The role is shared with this player.
+        """
+        return Player(self.player_id, self.role, self.name, self.nr, team, extra_skills=list(self.extra_skills),
+                      extra_ma=self.extra_ma, extra_st=self.extra_st, extra_ag=self.extra_ag, extra_av=self.extra_av,
+                      mng=self.mng, spp=self.spp, injuries=list(self.injuries))
+
     def to_json(self):
         return {
             'player_id': self.player_id,
@@ -1188,6 +1304,7 @@ class Player(Piece, Reversible):
 
 @immutable_after_init
 class Square:
+    __slots__ = ('x', 'y', '_out_of_bounds', '_initialized')
     x: int
     y: int
     _out_of_bounds: Optional[bool]
@@ -1214,7 +1331,8 @@ class Square:
         return self.x == other.x and self.y == other.y
 
     def __hash__(self):
-        return self.x * 7 + self.y * 13
+        # Unique for all coordinates in (-2**15, 2**15), so squares never collide in sets and dicts
+        return (self.y << 16) + self.x
 
     def distance(self, other, manhattan=False, flight=False):
         if manhattan:
@@ -1258,6 +1376,18 @@ class Team(Reversible):
         self.cheerleaders = cheerleaders
         self.state = TeamState(self)
 
+    def fresh_copy(self):
+        """
+        A cheaper alternative to deepcopy for instantiating a team in a new game. Roles are shared with this team while
+        the players and the team state are allocated anew, i.e. the copy has no in-game state.
+        :return: a copy of the team, with the same team and player ids, ready to be used in a new game.
+        """
+        team = Team(self.team_id, self.name, self.race, treasury=self.treasury, apothecaries=self.apothecaries,
+                    rerolls=self.rerolls, ass_coaches=self.ass_coaches, cheerleaders=self.cheerleaders,
+                    fan_factor=self.fan_factor)
+        team.players = [player.fresh_copy(team) for player in self.players]
+        return team
+
     def to_json(self):
         players = []
         players_by_id = {}
@@ -1287,6 +1417,7 @@ class Team(Reversible):
 
 @immutable_after_init
 class Outcome:
+    __slots__ = ('outcome_type', 'position', 'player', 'opp_player', 'rolls', 'team', 'n', 'skill', '_initialized')
     outcome_type: OutcomeType
     position: Optional[Square]
     player: Optional[Player]
@@ -1327,6 +1458,31 @@ class Outcome:
         }
 
 
+class OutcomeCounter:
+    """
+    Running per-team counts of reported outcomes of some types, see Game.subscribe_outcomes(). counts[0] holds the
+    counts for the home team and counts[1] for the away team, with one column per outcome type. An outcome belongs to
+    the team of its player, or else to its team, and outcomes of neither team are not counted.
+    """
+    __slots__ = ('outcome_types', 'counts')
+
+    def __init__(self, outcome_types: List[OutcomeType]):
+        self.outcome_types = outcome_types
+        self.counts = np.zeros((2, len(outcome_types)), dtype=np.int64)
+
+    def add(self, row: int, column: int):
+        self.counts[row, column] += 1
+
+    def remove(self, row: int, column: int):
+        self.counts[row, column] -= 1
+
+    def get_count(self, outcome_type: OutcomeType, home: bool) -> int:
+        """
+        :return: the number of outcomes of the given type for the home or away team.
+        """
+        return int(self.counts[0 if home else 1, self.outcome_types.index(outcome_type)])
+
+
 class Inducement:
 
     def __init__(self, name, cost, max_num, reduced=0):
@@ -1363,52 +1519,97 @@ class RuleSet:
 
 class Formation(Immutable):
 
+    # Player types in the order they are assigned to the slots of the formation
+    player_types = ['S', 's', 'p', 'b', 'c', 'm', 'a', 'v', 'd', '0', 'x']
+
     def __init__(self, name, formation):
         self.name = name
         self.formation = formation
+        self._slots = {}
+
+    def _get_slots(self, game, home):
+        """
+        Compiles the formation into an ordered list of slots for the arena of the game. The compiled slots are cached
+        per arena size and side.
+        :param game:
+        :param home: whether the formation is used by the home team.
+        :return: a list of (player type index, x, y) tuples, scrimmage slots first.
+        """
+        key = (game.arena.width, game.arena.height, home)
+        slots = self._slots.get(key)
+        if slots is not None:
+            return slots
+        width = len(self.formation[0])
+        scrimmage = []
+        field = []
+        for i, t in enumerate(Formation.player_types):
+            for y in range(len(self.formation)):
+                for x in reversed(range(width)):
+                    if self.formation[y][x] != t:
+                        continue
+                    xx = x + 1 if not home else game.arena.width - x - 2
+                    is_scrimmage = game.is_scrimmage(game.get_square(xx, y + 1))
+                    if x == width - 1 and is_scrimmage:
+                        scrimmage.append((i, xx, y + 1))
+                    elif not is_scrimmage:
+                        field.append((i, xx, y + 1))
+        slots = scrimmage + field
+        self._slots[key] = slots
+        return slots
 
-    def _get_player(self, players, t):
-        if t == 'S':
-            idx = np.argmax([player.get_st() + (0.5 if player.has_skill(Skill.BLOCK) else 0) - (
-                0.5 if player.has_skill(Skill.SURE_HANDS) else 0) for player in players])
-            return players[idx]
-        if t == 'm':
-            idx = np.argmax([player.get_ma() for player in players])
-            return players[idx]
-        if t == 'a':
-            idx = np.argmax([player.get_ag() for player in players])
-            return players[idx]
-        if t == 'v':
-            idx = np.argmax([player.get_av() for player in players])
-            return players[idx]
-        if t == 's':
-            idx = np.argmax([1 if player.has_skill(Skill.SURE_HANDS) else 0 for player in players])
-            return players[idx]
-        if t == 'p':
-            idx = np.argmax([1 if player.has_skill(Skill.PASS) else 0 for player in players])
-            return players[idx]
-        if t == 'c':
-            idx = np.argmax([1 if player.has_skill(Skill.CATCH) else 0 for player in players])
-            return players[idx]
-        if t == 'b':
-            idx = np.argmax([1 if player.has_skill(Skill.BLOCK) else 0 for player in players])
-            return players[idx]
-        if t == 'd':
-            idx = np.argmax([1 if player.has_skill(Skill.DODGE) else 0 for player in players])
-            return players[idx]
-        if t == '0':
-            idx = np.argmin([len(player.get_skills()) for player in players])
-            return players[idx]
-        if t == 'x':
-            idx = np.argmax([1 if player.has_skill(Skill.BLOCK) else (
-                0 if player.has_skill(Skill.PASS) or player.has_skill(Skill.CATCH) else 0.5) for player in players])
-            return players[idx]
-        return players[0]
+    @staticmethod
+    def _score_players(players):
+        """
+        :param players:
+        :return: a (players x player types) array with the suitability of each player for each player type in the
+        formation. Slots are filled with the first player with the highest score.
+        """
+        st = np.array([player.get_st() for player in players], dtype=float)
+        ma = np.array([player.get_ma() for player in players], dtype=float)
+        ag = np.array([player.get_ag() for player in players], dtype=float)
+        av = np.array([player.get_av() for player in players], dtype=float)
+        n_skills = np.array([len(player.get_skills()) for player in players], dtype=float)
+        skills = {skill: np.array([player.has_skill(skill) for player in players], dtype=float)
+                  for skill in [Skill.BLOCK, Skill.SURE_HANDS, Skill.PASS, Skill.CATCH, Skill.DODGE]}
+        block = skills[Skill.BLOCK]
+        pass_or_catch = np.maximum(skills[Skill.PASS], skills[Skill.CATCH])
+        return np.stack([
+            st + 0.5 * block - 0.5 * skills[Skill.SURE_HANDS],   # S
+            skills[Skill.SURE_HANDS],                           # s
+            skills[Skill.PASS],                                 # p
+            block,                                              # b
+            skills[Skill.CATCH],                                # c
+            ma,                                                 # m
+            ag,                                                 # a
+            av,                                                 # v
+            skills[Skill.DODGE],                                # d
+            -n_skills,                                          # 0
+            np.where(block > 0, 1, 0.5 * (1 - pass_or_catch))   # x
+        ], axis=1)
+
+    def placements(self, game, team, players):
+        """
+        Assigns players to the slots of the formation.
+        :param game:
+        :param team: the team using the formation.
+        :param players: the players to place, in order of preference when several players are equally suited.
+        :return: a list of (player, square) tuples.
+        """
+        slots = self._get_slots(game, team == game.state.home_team)
+        if len(players) == 0 or len(slots) == 0:
+            return []
+        scores = Formation._score_players(players)
+        available = np.ones(len(players), dtype=bool)
+        placements = []
+        for i, x, y in slots[:len(players)]:
+            idx = int(np.argmax(np.where(available, scores[:, i], -np.inf)))
+            available[idx] = False
+            placements.append((players[idx], game.get_square(x, y)))
+        return placements
 
     def actions(self, game, team):
         reorganize = game.get_procedure().reorganize
 
-        home = team == game.state.home_team
         actions = []
         # Move all player on the pitch back to the reserves
         player_on_pitch = []
@@ -1423,44 +1624,8 @@ class Formation(Immutable):
         if not reorganize:
             players += game.get_reserves(team)
 
-        positions_used = set()
-
-        # setup on scrimmage
-        for t in ['S', 's', 'p', 'b', 'c', 'm', 'a', 'v', 'd', '0', 'x']:
-            for y in range(len(self.formation)):
-                if len(players) == 0:
-                    return actions
-                x = len(self.formation[0]) - 1
-                tp = self.formation[y][x]
-                if tp == '-' or tp != t:
-                    continue
-                yy = y + 1
-                xx = x + 1 if not home else game.arena.width - x - 2
-                position = game.get_square(xx, yy)
-                if not game.is_scrimmage(position) or position in positions_used:
-                    continue
-                player = self._get_player(players, t)
-                players.remove(player)
-                actions.append(Action(ActionType.PLACE_PLAYER, position=position, player=player))
-                positions_used.add(position)
-
-        for t in ['S', 's', 'p', 'b', 'c', 'm', 'a', 'v', 'd', '0', 'x']:
-            for y in range(len(self.formation)):
-                for x in reversed(range(len(self.formation[0]))):
-                    if len(players) == 0:
-                        return actions
-                    tp = self.formation[y][x]
-                    if tp == '-' or tp != t:
-                        continue
-                    yy = y + 1
-                    xx = x + 1 if not home else game.arena.width - x - 2
-                    position = game.get_square(xx, yy)
-                    if game.is_scrimmage(position) or position in positions_used:
-                        continue
-                    player = self._get_player(players, t)
-                    players.remove(player)
-                    actions.append(Action(ActionType.PLACE_PLAYER, position=position, player=player))
-                    positions_used.add(position)
+        for player, position in self.placements(game, team, players):
+            actions.append(Action(ActionType.PLACE_PLAYER, position=position, player=player))
         return actions
 
     def compare(self, other, path):
@@ -77,6 +77,8 @@ class Path:
 
 
 class Node:
+    __slots__ = ('parent', 'position', 'moves_left', 'gfis_left', 'euclidean_distance', 'prob', 'foul_roll',
+                 'handoff_roll', 'rolls', 'block_dice', 'rr_states', 'can_foul', 'can_block', 'can_handoff')
 
     TRR = 0
     DODGE = 1
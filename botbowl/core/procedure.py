@@ -15,9 +15,62 @@ from botbowl.core.model import *
 from botbowl.core.table import *
 
 import time
+import itertools
+from math import factorial
 from abc import abstractmethod, ABCMeta
 
 
+# Die results with their probabilities, used to enumerate chance outcomes
+_D6_ROLLS = [([value], 1 / 6) for value in range(1, 7)]
+_2D6_ROLLS = [([a, b], (1 if a == b else 2) / 36) for a in range(1, 7) for b in range(a, 7)]
+_BB_DIE_PROBS = {BBDieResult.ATTACKER_DOWN: 1 / 6, BBDieResult.BOTH_DOWN: 1 / 6, BBDieResult.PUSH: 2 / 6,
+                 BBDieResult.DEFENDER_STUMBLES: 1 / 6, BBDieResult.DEFENDER_DOWN: 1 / 6}
+
+
+def _block_dice_rolls(num_dice):
+    """
+    :return: each distinct combination of num_dice block dice as a (results, probability) pair.
+    """
+    rolls = []
+    for results in itertools.combinations_with_replacement(_BB_DIE_PROBS.keys(), num_dice):
+        probability = factorial(num_dice)
+        for result in set(results):
+            count = results.count(result)
+            probability = probability / factorial(count) * _BB_DIE_PROBS[result] ** count
+        rolls.append((list(results), probability))
+    return rolls
+
+
+def _is_d6_success(value, target, modifiers):
+    """
+    :return: same as DiceRoll.is_d6_success() for a single D6 with the default settings.
+    """
+    if value == 1:
+        return False
+    if value == 6:
+        return True
+    return value + modifiers >= target
+
+
+def _chance_outcomes(rolls, classify):
+    """
+    Groups die results that lead to the same outcome.
+    :param rolls: a list of (results, probability) pairs.
+    :param classify: a function from results to an OutcomeType, or to a tuple starting with one if more than the
+    outcome type distinguishes the branches.
+    :return: a list of ChanceOutcome with the first results of each group as representative.
+    """
+    outcomes = {}
+    for results, probability in rolls:
+        key = classify(results)
+        if key in outcomes:
+            outcomes[key].probability += probability
+        else:
+            outcome_type = key[0] if type(key) is tuple else key
+            outcomes[key] = ChanceOutcome(outcome_type, probability, results)
+    return list(outcomes.values())
+
+
 class Procedure(Reversible):
 
     def __init__(self, game, context=None, ignored_keys=None):
@@ -56,6 +109,14 @@ class Procedure(Reversible):
         """
         return []
 
+    def chance_outcomes(self):
+        """
+        Override this in procedures that roll dice to support chance nodes, see Game.get_chance_outcomes().
+        :return: if the next call to step() rolls dice, a list of the distinct outcomes of the roll as ChanceOutcome,
+        otherwise None.
+        """
+        return None
+
     def compare(self, other, path=""):
         return compare_object(self, other, path, ignored_keys={"game"}, ignored_types={Procedure})
 
@@ -72,7 +133,7 @@ class Regeneration(Procedure):
 
     def step(self, action):
         if self.player.has_skill(Skill.REGENERATION):
-            regen_roll = DiceRoll([D6(self.game.rnd)], target=4, roll_type=RollType.REGENERATION_ROLL)
+            regen_roll = DiceRoll([D6(self.game.dice)], target=4, roll_type=RollType.REGENERATION_ROLL)
             if regen_roll.is_d6_success():
                 self.game.report(Outcome(OutcomeType.SUCCESSFUL_REGENERATION, player=self.player, rolls=[regen_roll]))
                 # self.game.pitch_to_reserves(self.player)
@@ -130,7 +191,7 @@ class Apothecary(Procedure):
 
             if action.action_type == ActionType.USE_APOTHECARY:
 
-                self.roll_second = DiceRoll([D6(self.game.rnd), D8(self.game.rnd)], roll_type=RollType.CASUALTY_ROLL)
+                self.roll_second = DiceRoll([D6(self.game.dice), D8(self.game.dice)], roll_type=RollType.CASUALTY_ROLL)
                 result = self.roll_second.get_sum()
                 n = min(61, max(38, result))
                 self.casualty_second = CasualtyType(n)
@@ -191,14 +252,14 @@ class Armor(Procedure):
         self.inflictor = inflictor
         self.ejected = False
 
-    def step(self, action):
-
-        # Roll
-        roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.ARMOR_ROLL)
-        roll.modifiers = self.modifiers
-        roll.target = self.player.get_av() + 1
-        result = roll.get_sum() + self.modifiers
-        self.armor_rolled = True
+    def resolve(self, dice_sum, same):
+        """
+        :param dice_sum: the sum of the two dice.
+        :param same: whether the two dice show the same value.
+        :return: a tuple (armor_broken, mighty_blow_used, dirty_player_used, ejected).
+        """
+        target = self.player.get_av() + 1
+        result = dice_sum + self.modifiers
 
         armor_broken = False
         mighty_blow_used = False
@@ -206,15 +267,14 @@ class Armor(Procedure):
 
         if not self.foul:
             # Armor broken - Claws
-            if roll.sum >= 8 and self.inflictor is not None and self.inflictor.has_skill(Skill.CLAWS):
+            if dice_sum >= 8 and self.inflictor is not None and self.inflictor.has_skill(Skill.CLAWS):
                 armor_broken = True
 
             # Armor broken
-            if result >= roll.target:
+            if result >= target:
                 armor_broken = True
-            elif result == roll.target -1 and self.inflictor is not None and self.inflictor.has_skill(Skill.MIGHTY_BLOW):
+            elif result == target -1 and self.inflictor is not None and self.inflictor.has_skill(Skill.MIGHTY_BLOW):
                 # only use mighty_blow if it makes the armour break
-                roll.modifiers += 1
                 armor_broken = True
                 mighty_blow_used = True
         else:
@@ -222,19 +282,37 @@ class Armor(Procedure):
             # Armor broken - Dirty player
             if self.inflictor is not None and self.inflictor.has_skill(Skill.DIRTY_PLAYER) \
                     and result + 1 > self.player.get_av():
-                roll.modifiers += 1
                 armor_broken = True
                 dirty_player_used = True
 
             # Armor broken
-            if result >= roll.target:
+            if result >= target:
                 armor_broken = True
 
-        # EJECTION?
-        if self.foul and roll.same():
-            # Sneaky git
-            if not self.inflictor.has_skill(Skill.SNEAKY_GIT) or armor_broken:
-                self.ejected = True
+        # EJECTION? Not with sneaky git unless the armor was broken
+        ejected = self.foul and same and (not self.inflictor.has_skill(Skill.SNEAKY_GIT) or armor_broken)
+
+        return armor_broken, mighty_blow_used, dirty_player_used, ejected
+
+    def chance_outcomes(self):
+        def classify(results):
+            armor_broken, mighty_blow_used, dirty_player_used, ejected = self.resolve(sum(results),
+                                                                                     results[0] == results[1])
+            outcome_type = OutcomeType.ARMOR_BROKEN if armor_broken else OutcomeType.ARMOR_NOT_BROKEN
+            return outcome_type, mighty_blow_used, dirty_player_used, ejected
+        return _chance_outcomes(_2D6_ROLLS, classify)
+
+    def step(self, action):
+
+        # Roll
+        roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.ARMOR_ROLL)
+        roll.target = self.player.get_av() + 1
+        self.armor_rolled = True
+
+        armor_broken, mighty_blow_used, dirty_player_used, ejected = self.resolve(roll.get_sum(), roll.same())
+        roll.modifiers = self.modifiers + (1 if mighty_blow_used or dirty_player_used else 0)
+        if ejected:
+            self.ejected = True
 
         # Break armor - roll injury
         if armor_broken:
@@ -275,7 +353,7 @@ class Stab(Procedure):
             return False
 
         # Stab!
-        self.roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], lowest_fail=False, highest_succeed=False)
+        self.roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)], lowest_fail=False, highest_succeed=False)
         self.roll.target = self.defender.get_av()
         if self.attacker.has_skill(Skill.STAKES) and self.defender.team.race in \
                 ['Khemri', 'Necromantic', 'Undead', 'Vampire']:
@@ -299,7 +377,7 @@ class FoulAppearance(Procedure):
 
     def step(self, action):
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd)])
+            self.roll = DiceRoll([D6(self.game.dice)])
             self.roll.target = 2
             self.game.report(
                 Outcome(OutcomeType.SKILL_USED, skill=Skill.FOUL_APPEARANCE, player=self.attacker, rolls=[self.roll]))
@@ -352,6 +430,23 @@ class Block(Procedure):
     def end(self):
         self.attacker.state.has_blocked = True
 
+    def chance_outcomes(self):
+        # Only when the next step goes straight to the block roll
+        if self.roll is not None or self.gfi or self.waiting_foul_appearance or self.waiting_dump_off or \
+                self.waiting_juggernaut or self.waiting_wrestle_attacker or self.waiting_wrestle_defender:
+            return None
+        if self.frenzy_block and not self.frenzy_checked:
+            if self.defender.position is None or not self.defender.state.up or \
+                    self.defender not in self.game.get_adjacent_opponents(self.attacker):
+                return None
+        if self.defender.get_st() > self.attacker.get_st() and self.attacker.has_skill(Skill.DAUNTLESS) \
+                and self.dauntless_roll is None:
+            return None
+        dice = self.game.num_block_dice(self.attacker, self.defender, blitz=self.blitz,
+                                        dauntless_success=self.dauntless_success)
+        return [ChanceOutcome(OutcomeType.BLOCK_ROLL, probability, results)
+                for results, probability in _block_dice_rolls(abs(dice))]
+
     def step(self, action):
 
         # GfI
@@ -427,7 +522,7 @@ class Block(Procedure):
             # Assists
             if self.defender.get_st() > self.attacker.get_st() and self.attacker.has_skill(Skill.DAUNTLESS) \
                     and self.dauntless_roll is None:
-                self.dauntless_roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.STRENGTH_ROLL)
+                self.dauntless_roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.STRENGTH_ROLL)
                 self.dauntless_success = self.dauntless_roll.get_sum() + self.attacker.get_st() > self.defender.get_st()
                 self.game.report(Outcome(OutcomeType.DAUNTLESS_USED, team=self.attacker.team, player=self.attacker,
                                          rolls=[self.dauntless_roll], n=True))
@@ -445,7 +540,7 @@ class Block(Procedure):
             self.roll = DiceRoll([], roll_type=RollType.BLOCK_ROLL)
 
             for i in range(abs(dice)):
-                self.roll.dice.append(BBDie(self.game.rnd))
+                self.roll.dice.append(BBDie(self.game.dice))
 
             self.game.report(Outcome(OutcomeType.BLOCK_ROLL, player=self.attacker, opp_player=self.defender,
                                      rolls=[self.roll]))
@@ -614,7 +709,7 @@ class Bounce(Procedure):
             self.piece.is_carried = False
 
         # Roll
-        roll_scatter = DiceRoll([D8(self.game.rnd)], roll_type=RollType.BOUNCE_ROLL)
+        roll_scatter = DiceRoll([D8(self.game.dice)], roll_type=RollType.BOUNCE_ROLL)
         result = roll_scatter.get_sum()
 
         # Bounce
@@ -702,7 +797,7 @@ class Casualty(Procedure):
             self.regeneration = None
 
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd), D8(self.game.rnd)], d68=True, roll_type=RollType.CASUALTY_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice), D8(self.game.dice)], d68=True, roll_type=RollType.CASUALTY_ROLL)
             cas_rolls = None
             if self.blood_lust: 
                 result = 38
@@ -762,6 +857,19 @@ class Catch(Procedure):
         if self.diving:
             self.game.report(Outcome(OutcomeType.SKILL_USED, player=self.player, skill=Skill.DIVING_CATCH))
 
+    def target_and_modifiers(self):
+        return Rules.agility_table[self.player.get_ag()], \
+               self.game.get_catch_modifiers(self.player, accurate=self.accurate, handoff=self.handoff)
+
+    def chance_outcomes(self):
+        if self.roll is not None or (type(self.piece) is Bomb and self.bomb_choice is None) or \
+                not self.player.can_catch():
+            return None
+        target, modifiers = self.target_and_modifiers()
+        success = OutcomeType.SUCCESSFUL_CATCH if type(self.piece) is Ball else OutcomeType.SUCCESSFUL_CATCH_BOMB
+        return _chance_outcomes(_D6_ROLLS, lambda results: success if _is_d6_success(results[0], target, modifiers)
+                                else OutcomeType.FAILED_CATCH)
+
     def step(self, action):
 
         # You can decide not to catch a bomb
@@ -788,9 +896,8 @@ class Catch(Procedure):
                 return True
 
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
-            self.roll.modifiers = self.game.get_catch_modifiers(self.player, accurate=self.accurate, handoff=self.handoff)
-            self.roll.target = Rules.agility_table[self.player.get_ag()]
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
+            self.roll.target, self.roll.modifiers = self.target_and_modifiers()
             if self.roll.is_d6_success():
                 if type(self.piece) is Ball:
                     self.game.report(Outcome(OutcomeType.SUCCESSFUL_CATCH, player=self.player, rolls=[self.roll]))
@@ -848,7 +955,7 @@ class Intercept(Procedure):
         # If waiting for interception re-roll due to Safe Throw skill
         if self.waiting_safe_throw:
             # Make agility roll for passer
-            self.safe_throw_roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
+            self.safe_throw_roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
             self.safe_throw_roll.target = Rules.agility_table[self.passer.get_ag()]
             self.game.report(
                 Outcome(OutcomeType.SKILL_USED, player=self.passer, skill=Skill.SAFE_THROW, rolls=[self.safe_throw_roll]))
@@ -886,7 +993,7 @@ class Intercept(Procedure):
                 return True
 
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
             self.roll.modifiers = self.game.get_catch_modifiers(self.interceptor, interception=True)
             self.roll.target = Rules.agility_table[self.interceptor.get_ag()]
             if self.roll.is_d6_success():
@@ -1013,7 +1120,7 @@ class Ejection(Procedure):
             if action.action_type == ActionType.USE_BRIBE:
                 self.player.team.state.bribes -= 1
                 self.game.report(Outcome(OutcomeType.BRIBE_USED, team=self.player.team, player=self.player))
-                die = D6(self.game.rnd)
+                die = D6(self.game.dice)
                 roll = DiceRoll([die], roll_type=RollType.BRIBE_ROLL)
                 roll.target = 2
                 if roll.is_d6_success():
@@ -1151,14 +1258,13 @@ class Injury(Procedure):
         self.in_crowd = in_crowd
         self.blood_lust = blood_lust
 
-    def step(self, action):
-
-        # TODO: Necromancer
-
-        # Roll
-        roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.INJURY_ROLL)
-        self.injury_rolled = True
-
+    def resolve(self, dice_sum, same):
+        """
+        :param dice_sum: the sum of the two dice.
+        :param same: whether the two dice show the same value.
+        :return: a tuple (outcome_type, modifiers, ejected) where outcome_type is OutcomeType.CASUALTY,
+        OutcomeType.KNOCKED_OUT or OutcomeType.STUNNED.
+        """
         # Skill modifiers
         thick_skull = -1 if self.player.has_skill(Skill.THICK_SKULL) else 0
         stunty = 1 if self.player.has_skill(Skill.STUNTY) else 0
@@ -1172,28 +1278,51 @@ class Injury(Procedure):
                 self.foul else 0
 
         # EJECTION
-        if self.foul and roll.same() and not self.inflictor.has_skill(Skill.SNEAKY_GIT):
+        ejected = self.foul and same and not self.inflictor.has_skill(Skill.SNEAKY_GIT)
+
+        # CASUALTY
+        if dice_sum + stunty + mighty_blow + dirty_player + niggling >= 10:
+            return OutcomeType.CASUALTY, stunty + mighty_blow + dirty_player, ejected
+
+        # KOD - players with ball & chain are also KO'd instead of stunned
+        modifiers = thick_skull + stunty + mighty_blow + dirty_player + niggling
+        if dice_sum + modifiers >= 8 or self.player.has_skill(Skill.BALL_AND_CHAIN):
+            return OutcomeType.KNOCKED_OUT, modifiers, ejected
+
+        # STUNNED
+        return OutcomeType.STUNNED, modifiers, ejected
+
+    def chance_outcomes(self):
+        def classify(results):
+            outcome_type, _, ejected = self.resolve(sum(results), results[0] == results[1])
+            return outcome_type, ejected
+        return _chance_outcomes(_2D6_ROLLS, classify)
+
+    def step(self, action):
+
+        # TODO: Necromancer
+
+        # Roll
+        roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.INJURY_ROLL)
+        self.injury_rolled = True
+
+        outcome_type, roll.modifiers, ejected = self.resolve(roll.get_sum(), roll.same())
+        if ejected:
             self.ejected = True
 
         # CASUALTY
-        roll.modifiers = stunty + mighty_blow + dirty_player + niggling
-        if roll.get_result() >= 10:
-            roll.modifiers = stunty + mighty_blow + dirty_player
+        if outcome_type == OutcomeType.CASUALTY:
             self.game.report(Outcome(OutcomeType.CASUALTY, player=self.player, opp_player=self.inflictor, rolls=[roll]))
             Casualty(self.game, self.player, inflictor=self.inflictor, decay=self.player.has_skill(Skill.DECAY),
                      blood_lust=self.blood_lust)
             return True
 
         # KOD
-        roll.modifiers = thick_skull + stunty + mighty_blow + dirty_player + niggling
-        if roll.get_result() >= 8:
+        if outcome_type == OutcomeType.KNOCKED_OUT:
             KnockOut(self.game, self.player, roll=roll, inflictor=self.inflictor)
             return True
 
         # STUNNED
-        roll.modifiers = thick_skull + stunty + mighty_blow + dirty_player + niggling
-        if self.player.has_skill(Skill.BALL_AND_CHAIN):
-            KnockOut(self.game, self.player, roll=roll, inflictor=self.inflictor)
         else:
             self.game.report(Outcome(OutcomeType.STUNNED, player=self.player, opp_player=self.inflictor,
                                      rolls=[roll]))
@@ -1322,7 +1451,7 @@ class Fans(Procedure):
         rolls = []
         spectators = []
         for team in self.game.state.teams:
-            roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.FANS_ROLL)
+            roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.FANS_ROLL)
             rolls.append(roll)
             fans = (roll.get_sum() + team.fan_factor) * 1000
             spectators.append(fans)
@@ -1399,7 +1528,7 @@ class Riot(Procedure):
         elif receiving_turn == 0:
             self.effect = 1
         else:
-            roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.RIOT_ROLL)
+            roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.RIOT_ROLL)
             if roll.get_sum() <= 3:
                 self.effect = 1
             else:
@@ -1464,7 +1593,7 @@ class CheeringFans(Procedure):
         rolls = []
         cheers = []
         for team in self.game.state.teams:
-            roll = DiceRoll([D3(self.game.rnd)], roll_type=RollType.CHEERING_FANS_ROLL)
+            roll = DiceRoll([D3(self.game.dice)], roll_type=RollType.CHEERING_FANS_ROLL)
             rolls.append(roll)
             roll.modifiers = team.state.fame + team.cheerleaders
             cheers.append(roll.get_result())
@@ -1493,7 +1622,7 @@ class BrilliantCoaching(Procedure):
         rolls = []
         brilliant_coaches = []
         for team in self.game.state.teams:
-            roll = DiceRoll([D3(self.game.rnd)], roll_type=RollType.BRILLIANT_COACHING_ROLL)
+            roll = DiceRoll([D3(self.game.dice)], roll_type=RollType.BRILLIANT_COACHING_ROLL)
             rolls.append(roll)
             roll.modifiers = team.state.fame + team.ass_coaches
             brilliant_coaches.append(roll.get_result())
@@ -1522,7 +1651,7 @@ class ThrowARock(Procedure):
 
         rolls = []
         for team in self.game.state.teams:
-            roll = DiceRoll([D3(self.game.rnd)], roll_type=RollType.THROW_A_ROCK_ROLL)
+            roll = DiceRoll([D3(self.game.dice)], roll_type=RollType.THROW_A_ROCK_ROLL)
             roll.modifiers = team.state.fame
             rolls.append(roll.get_result())
             self.game.report(Outcome(OutcomeType.THROW_A_ROCK_ROLL, team=team, rolls=[roll]))
@@ -1550,7 +1679,7 @@ class PitchInvasionRoll(Procedure):
         self.player = player
 
     def step(self, action):
-        roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.PITCH_INVASION_ROLL)
+        roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.PITCH_INVASION_ROLL)
         roll.modifiers = self.game.get_opp_team(self.team).state.fame
         if roll.get_result() >= 6 and roll.get_sum() != 1:
             if self.player.has_skill(Skill.BALL_AND_CHAIN):
@@ -1578,7 +1707,7 @@ class KickoffTable(Procedure):
 
     def step(self, action):
 
-        roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.KICKOFF_ROLL)
+        roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.KICKOFF_ROLL)
         roll.result = roll.get_sum()
 
         if roll.result == 2:  # Get the ref!
@@ -1711,7 +1840,7 @@ class Leap(Procedure):
         if self.roll is None:
 
             # Agility roll
-            self.roll = DiceRoll([D6(self.game.rnd)])
+            self.roll = DiceRoll([D6(self.game.dice)])
             self.roll.target = Rules.agility_table[self.player.get_ag()]
             self.roll.modifiers = self.game.get_leap_modifiers(self.player)
 
@@ -1773,7 +1902,7 @@ class Shadowing(Procedure):
             return True
 
         if self.roll is None and action.action_type == ActionType.USE_SKILL:
-            self.roll = DiceRoll(dice=[D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.SHADOWING_ROLL, highest_succeed=False)
+            self.roll = DiceRoll(dice=[D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.SHADOWING_ROLL, highest_succeed=False)
             self.roll.target = 7
             self.roll.modifiers = self.player.get_ma() - self.shadower.get_ma()
             self.roll.target_higher = False
@@ -1829,7 +1958,7 @@ class Tentacles(Procedure):
     def step(self, action):
 
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)])
+            self.roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)])
             self.roll.target = 5
             self.roll.modifiers = self.player.get_st() - self.tentacler.get_st()
             if self.roll.is_d6_success():
@@ -1926,15 +2055,24 @@ class GFI(Procedure):
         self.reroll = None
         self.roll = None
 
+    def target_and_modifiers(self):
+        return 2, 1 if self.game.state.weather == WeatherType.BLIZZARD else 0
+
+    def chance_outcomes(self):
+        if self.roll is not None:
+            return None
+        target, modifiers = self.target_and_modifiers()
+        return _chance_outcomes(_D6_ROLLS, lambda results: OutcomeType.SUCCESSFUL_GFI if _is_d6_success(
+            results[0], target, modifiers) else OutcomeType.FAILED_GFI)
+
     def step(self, action):
 
         # If player hasn't rolled
         if self.roll is None:
 
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.GFI_ROLL)
-            self.roll.target = 2
-            self.roll.modifiers = 1 if self.game.state.weather == WeatherType.BLIZZARD else 0
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.GFI_ROLL)
+            self.roll.target, self.roll.modifiers = self.target_and_modifiers()
 
             if self.roll.is_d6_success():
 
@@ -1992,6 +2130,27 @@ class Dodge(Procedure):
         if self.diving_tacklers:
             self.game.add_secondary_clock(self.diving_tacklers[0].team)
 
+    def target_and_modifiers(self):
+        return Rules.agility_table[self.player.get_ag()], \
+               self.game.get_dodge_modifiers(self.player, self.position,
+                                             include_diving_tackle=(self.diving_tackler is not None))
+
+    def chance_outcomes(self):
+        if self.roll is not None or self.diving_tacklers or self.waiting_break_tackle:
+            return None
+        target, modifiers = self.target_and_modifiers()
+        break_tackle_target = None
+        if self.player.can_use_skill(Skill.BREAK_TACKLE) and self.player.get_st() > self.player.get_ag():
+            break_tackle_target = Rules.agility_table[self.player.get_st()]
+
+        def classify(results):
+            if _is_d6_success(results[0], target, modifiers):
+                return OutcomeType.SUCCESSFUL_DODGE
+            # A failed dodge that can be turned into a success with break tackle is a separate branch
+            return OutcomeType.FAILED_DODGE, break_tackle_target is not None and \
+                results[0] + modifiers >= break_tackle_target
+        return _chance_outcomes(_D6_ROLLS, classify)
+
     def step(self, action):
 
         # Diving tackle
@@ -2032,11 +2191,8 @@ class Dodge(Procedure):
             # TODO: Auto-use other skills
 
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
-            self.roll.modifiers = self.game.get_dodge_modifiers(self.player, self.position, include_diving_tackle=(self.diving_tackler is not None))
-
-            agility_target = Rules.agility_table[self.player.get_ag()]
-            self.roll.target = agility_target
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
+            self.roll.target, self.roll.modifiers = self.target_and_modifiers()
             if self.player.can_use_skill(Skill.BREAK_TACKLE) and self.player.get_st() > self.player.get_ag():
                 self.break_tackle_target = Rules.agility_table[self.player.get_st()]
 
@@ -2143,7 +2299,7 @@ class Explode(Procedure):
         position = self.bomb.position
         self.game.remove(self.bomb)
         for player in self.game.get_adjacent_players(position):
-            die = D6(self.game.rnd)
+            die = D6(self.game.dice)
             roll = DiceRoll(die, RollType.BOMB_ROLL, target=4)
             if roll.is_d6_success():
                 self.game.report(Outcome(OutcomeType.BOMB_HIT, position=self.bomb.position, player=self.player, rolls=[roll]))
@@ -2164,7 +2320,7 @@ class Land(Procedure):
 
     def step(self, action):
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd)], RollType.LAND_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], RollType.LAND_ROLL)
             self.roll.target = Rules.agility_table[self.player.get_ag()]
             self.roll.modifiers = self.game.get_landing_modifiers(self.player)
             if self.roll.is_d6_success():
@@ -2243,7 +2399,7 @@ class PassAttempt(Procedure):
                     return False
 
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
             self.roll.target = Rules.agility_table[self.passer.get_ag()]
             self.roll.modifiers = self.game.get_pass_modifiers(self.passer, self.pass_distance, ttm=self.ttm)
             result = self.roll.get_sum()
@@ -2341,14 +2497,23 @@ class Pickup(Procedure):
         self.roll = None
         self.reroll = None
 
+    def target_and_modifiers(self):
+        return Rules.agility_table[self.player.get_ag()], self.game.get_pickup_modifiers(self.player, self.ball.position)
+
+    def chance_outcomes(self):
+        if self.roll is not None:
+            return None
+        target, modifiers = self.target_and_modifiers()
+        return _chance_outcomes(_D6_ROLLS, lambda results: OutcomeType.SUCCESSFUL_PICKUP if _is_d6_success(
+            results[0], target, modifiers) else OutcomeType.FAILED_PICKUP)
+
     def step(self, action):
 
         # Otherwise roll if player hasn't rolled
         if self.roll is None:
 
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
-            self.roll.target = Rules.agility_table[self.player.get_ag()]
-            self.roll.modifiers = self.game.get_pickup_modifiers(self.player, self.ball.position)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
+            self.roll.target, self.roll.modifiers = self.target_and_modifiers()
 
             # Roll
             if self.roll.is_d6_success():
@@ -2392,7 +2557,7 @@ class StandUp(Procedure):
     def step(self, action):
         if self.roll_required and self.roll is None:
             modifier = self.game.get_stand_up_modifier(self.player)
-            self.roll = DiceRoll([D6(self.game.rnd)], target=4, modifiers=modifier, roll_type=RollType.STAND_UP_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], target=4, modifiers=modifier, roll_type=RollType.STAND_UP_ROLL)
             if self.roll.is_d6_success():
                 self.player.state.up = True
                 self.game.report(Outcome(OutcomeType.STAND_UP, rolls=[self.roll], player=self.player))
@@ -2477,7 +2642,7 @@ class JumpUpToBlock(Procedure):
     def step(self, action):
 
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
             self.roll.target = Rules.agility_table[self.player.get_ag()]
             self.roll.modifiers = 2
             if self.roll.is_d6_success():
@@ -2511,7 +2676,7 @@ class EscapeBeingEaten(Procedure):
     def step(self, action):
 
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd)])
+            self.roll = DiceRoll([D6(self.game.dice)])
             self.roll.target = 2
             if self.roll.is_d6_success():
                 self.game.report(Outcome(OutcomeType.SUCCESSFUL_ESCAPE_BEING_EATEN, player=self.hungry_player,
@@ -2550,7 +2715,7 @@ class AlwaysHungry(Procedure):
     def step(self, action):
 
         if self.roll is None:
-            self.roll = DiceRoll([D6(self.game.rnd)])
+            self.roll = DiceRoll([D6(self.game.dice)])
             self.roll.target = 2
             if self.roll.is_d6_success():
                 self.game.report(Outcome(OutcomeType.SUCCESSFUL_ALWAYS_HUNGRY, player=self.hungry_player,
@@ -3155,7 +3320,7 @@ class PreKickoff(Procedure):
         # Check KOed
         for player in self.game.get_knocked_out(self.team):
             if player not in self.checked:
-                roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.KO_READY_ROLL)
+                roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.KO_READY_ROLL)
                 if roll.get_sum() >= 4:
                     self.game.kod_to_reserves(player)
                     self.checked.append(player)
@@ -3378,7 +3543,7 @@ class Scatter(Procedure):
             return True
 
         n = 3 if self.is_pass else 1
-        rolls = [DiceRoll([D8(self.game.rnd)], roll_type=RollType.SCATTER_ROLL) for _ in range(n)]
+        rolls = [DiceRoll([D8(self.game.dice)], roll_type=RollType.SCATTER_ROLL) for _ in range(n)]
 
         for s in range(n):
 
@@ -3386,9 +3551,9 @@ class Scatter(Procedure):
             roll_scatter = rolls[s]
             if self.kick and not self.gentle_gust:
                 if self.game.config.kick_scatter_dice == 'd6':
-                    distance_dice = D6(self.game.rnd)
+                    distance_dice = D6(self.game.dice)
                 elif self.game.config.kick_scatter_dice == 'd3':
-                    distance_dice = D6(self.game.rnd)
+                    distance_dice = D6(self.game.dice)
                 else:
                     raise Exception("Unknown kick_roll_distance")
                 roll_distance = DiceRoll([distance_dice], roll_type=RollType.DISTANCE_ROLL)
@@ -3515,7 +3680,7 @@ class ClearBoard(Procedure):
                     self.game.pitch_to_reserves(player)
                     # Check if heat exhausted
                     if self.game.state.weather == WeatherType.SWELTERING_HEAT:
-                        roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.SWELTERING_HEAT_ROLL)
+                        roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.SWELTERING_HEAT_ROLL)
                         if roll.get_sum() == 1:
                             player.state.heated = True
                             self.game.report(Outcome(OutcomeType.PLAYER_HEATED, player=player, rolls=[roll]))
@@ -3553,9 +3718,13 @@ class Setup(Procedure):
             formation = [formation for formation in self.formations if formation.name == "Spread"][0]
 
         if formation is not None:
-            actions = formation.actions(self.game, self.team)
-            for a in actions:
-                self.step(a)
+            if self.reorganize:
+                # Reorganizing swaps players already on the pitch so apply the placements one at a time
+                for a in formation.actions(self.game, self.team):
+                    self.step(a)
+            else:
+                players = self.game.get_players_on_pitch(self.team) + self.game.get_reserves(self.team)
+                self.game.setup_players(self.team, formation.placements(self.game, self.team, players))
             return False
 
         if action.action_type == ActionType.END_SETUP:
@@ -3637,8 +3806,8 @@ class ThrowIn(Procedure):
         self.ball.carried = False
 
         # Roll
-        roll_direction = DiceRoll([D3(self.game.rnd)], roll_type=RollType.SCATTER_ROLL)
-        roll_distance = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.DISTANCE_ROLL)
+        roll_direction = DiceRoll([D3(self.game.dice)], roll_type=RollType.SCATTER_ROLL)
+        roll_distance = DiceRoll([D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.DISTANCE_ROLL)
 
         # Scatter
         x = 0
@@ -3932,7 +4101,7 @@ class WeatherTable(Procedure):
         self.kickoff = kickoff
 
     def step(self, action):
-        roll = DiceRoll([D6(self.game.rnd), D6(self.game.rnd)], roll_type=RollType.WEATHER_ROLL)
+        roll = DiceRoll([D6(self.game.dice), D6(self.game.dice)], roll_type=RollType.WEATHER_ROLL)
         if roll.get_sum() == 2:
             self.game.state.weather = WeatherType.SWELTERING_HEAT
             self.game.report(Outcome(OutcomeType.WEATHER_SWELTERING_HEAT, rolls=[roll]))
@@ -3991,7 +4160,7 @@ class Negatrait(Procedure, metaclass=ABCMeta):
         # If player hasn't rolled
         if not self.rolled:
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=self.roll_type)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=self.roll_type)
             self.roll.target = self.get_target()
             self.rolled = True
 
@@ -4343,7 +4512,7 @@ class Pro(Procedure):
     def step(self, action):
         if self.roll is None:
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.PRO)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.PRO)
             self.roll.target = 4
 
             if self.roll.is_d6_success():
@@ -4379,7 +4548,7 @@ class Loner(Procedure):
     def step(self, action):
         if self.roll is None:
             # Roll
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.LONER_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.LONER_ROLL)
             self.roll.target = 4
 
             if self.roll.is_d6_success():
@@ -4461,7 +4630,7 @@ class HypnoticGaze(Procedure):
     def step(self, action): 
         if self.roll is None: 
             #agility roll with tz modifiers except target_player
-            self.roll = DiceRoll([D6(self.game.rnd)], roll_type=RollType.AGILITY_ROLL)
+            self.roll = DiceRoll([D6(self.game.dice)], roll_type=RollType.AGILITY_ROLL)
             self.roll.modifiers = self.game.get_hypno_modifier(self.player)
             self.roll.target = Rules.agility_table[self.player.get_ag()]
             
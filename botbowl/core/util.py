@@ -158,3 +158,41 @@ def compare_object(self, other, path="", ignored_keys=None, ignored_types=None):
         other_attr = getattr(other, attr_name)
         diff.extend(compare_iterable(self_attr, other_attr, path=f"{path}.{attr_name}"))
     return diff
+
+
+def apply_game_diff(game_json, diff):
+    """
+    Applies a patch from Game.diff_since() to the output of Game.to_json() at the step the patch was made from.
+    :param game_json: the game in json, which is updated in place.
+    :param diff: the patch.
+    :return: game_json
+    """
+    if 'full_game' in diff:
+        game_json.clear()
+        game_json.update(diff['full_game'])
+        return game_json
+    state = game_json['state']
+    game_json.update(diff['game'])
+    state.update(diff['state'])
+    state['pitch']['balls'] = diff['balls']
+    state['pitch']['bomb'] = diff['bomb']
+    state['home_team']['state'] = diff['home_team_state']
+    state['away_team']['state'] = diff['away_team_state']
+    board = state['pitch']['board']
+    for player in diff['players']:
+        team = state['home_team'] if player['team_id'] == state['home_team']['team_id'] else state['away_team']
+        old_position = team['players_by_id'][player['player_id']]['position']
+        if old_position is not None and board[old_position['y']][old_position['x']] == player['player_id']:
+            board[old_position['y']][old_position['x']] = None
+        team['players_by_id'][player['player_id']] = player
+    for player in diff['players']:
+        if player['position'] is not None and not player['state']['in_air']:
+            board[player['position']['y']][player['position']['x']] = player['player_id']
+    if diff['reports_reset']:
+        state['reports'] = diff['reports']
+    else:
+        state['reports'].extend(diff['reports'])
+    if diff['available_actions'] is not None:
+        state['available_actions'] = diff['available_actions']
+    game_json['step'] = diff['step']
+    return game_json
@@ -75,6 +75,11 @@ def get_game(game_id):
     return game
 
 
+def get_game_diff(game_id, step):
+    game = get_game(game_id)
+    return game.diff_since(step)
+
+
 def get_replay(replay_id):
     if replay_id in replay_cache:
         replay = replay_cache[replay_id]
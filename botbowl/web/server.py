@@ -118,6 +118,11 @@ def step(game_id):
 def get_game(game_id):
     return json.dumps(api.get_game(game_id).to_json())
 
+
+@app.route('/games/<game_id>/diff/<step>', methods=['GET'])
+def get_game_diff(game_id, step):
+    return json.dumps(api.get_game_diff(game_id, int(step)))
+
 @app.route('/replays/<replay_id>', methods=['GET'])
 def get_replay(replay_id):
     replay = api.get_replay(replay_id)
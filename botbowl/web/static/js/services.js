@@ -31,11 +31,61 @@ appServices.factory('GameService', function($http) {
 
         load: function(name) {
             return $http.get(options.api.base_url + '/game/load/' + name);
+        },
+
+        diff: function(id, step) {
+            return $http.get(options.api.base_url + '/games/' + id + '/diff/' + step);
         }
 
     };
 });
 
+appServices.factory('GameDiffService', function() {
+    return {
+        // Applies a patch from Game.diff_since() to the game json at the step the patch was made from
+        apply: function(game, diff) {
+            if (diff.full_game != null){
+                // The steps since the previous patch were compacted, so the patch holds the whole game
+                for (let key of Object.keys(game)){
+                    delete game[key];
+                }
+                return Object.assign(game, diff.full_game);
+            }
+            let state = game.state;
+            Object.assign(game, diff.game);
+            Object.assign(state, diff.state);
+            state.pitch.balls = diff.balls;
+            state.pitch.bomb = diff.bomb;
+            state.home_team.state = diff.home_team_state;
+            state.away_team.state = diff.away_team_state;
+            let board = state.pitch.board;
+            for (let player of diff.players){
+                let team = player.team_id === state.home_team.team_id ? state.home_team : state.away_team;
+                let oldPosition = team.players_by_id[player.player_id].position;
+                if (oldPosition != null && board[oldPosition.y][oldPosition.x] === player.player_id){
+                    board[oldPosition.y][oldPosition.x] = null;
+                }
+                team.players_by_id[player.player_id] = player;
+            }
+            for (let player of diff.players){
+                if (player.position != null && !player.state.in_air){
+                    board[player.position.y][player.position.x] = player.player_id;
+                }
+            }
+            if (diff.reports_reset){
+                state.reports = diff.reports;
+            } else {
+                state.reports = state.reports.concat(diff.reports);
+            }
+            if (diff.available_actions != null){
+                state.available_actions = diff.available_actions;
+            }
+            game.step = diff.step;
+            return game;
+        }
+    };
+});
+
 appServices.factory('ReplayService', function($http) {
     return {
         get: function(id) {
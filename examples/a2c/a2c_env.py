@@ -1,5 +1,7 @@
 from pprint import pprint
 
+import numpy as np
+
 from botbowl import OutcomeType, Game
 import botbowl.core.procedure as procedure
 from examples.scripted_bot_example import MyScriptedBot
@@ -28,31 +30,30 @@ class A2C_Reward:
         OutcomeType.CASUALTY: 0.5
     }
     ball_progression_reward = 0.005
+    outcome_types = list(dict.fromkeys([*rewards_own, *rewards_opp]))
 
     def __init__(self):
-        self.last_report_idx = 0
+        self.weights_own = np.array([A2C_Reward.rewards_own.get(t, 0) for t in A2C_Reward.outcome_types])
+        self.weights_opp = np.array([A2C_Reward.rewards_opp.get(t, 0) for t in A2C_Reward.outcome_types])
+        self.game = None
+        self.outcome_counter = None
+        self.last_counts = None
         self.last_ball_x = None
         self.last_ball_team = None
 
     def __call__(self, game: Game):
-        if len(game.state.reports) < self.last_report_idx:
-            self.last_report_idx = 0
+        if game is not self.game:
+            # New game, e.g. after env.reset()
+            self.game = game
+            self.outcome_counter = game.subscribe_outcomes(A2C_Reward.outcome_types)
+            self.last_counts = self.outcome_counter.counts.copy()
 
-        r = 0.0
         own_team = game.active_team
-        opp_team = game.get_opp_team(own_team)
-
-        for outcome in game.state.reports[self.last_report_idx:]:
-            team = None
-            if outcome.player is not None:
-                team = outcome.player.team
-            elif outcome.team is not None:
-                team = outcome.team
-            if team == own_team and outcome.outcome_type in A2C_Reward.rewards_own:
-                r += A2C_Reward.rewards_own[outcome.outcome_type]
-            if team == opp_team and outcome.outcome_type in A2C_Reward.rewards_opp:
-                r += A2C_Reward.rewards_opp[outcome.outcome_type]
-        self.last_report_idx = len(game.state.reports)
+        counts = self.outcome_counter.counts
+        new_counts = counts - self.last_counts
+        self.last_counts = counts.copy()
+        own_row = 0 if own_team is game.state.home_team else 1
+        r = float(new_counts[own_row] @ self.weights_own + new_counts[1 - own_row] @ self.weights_opp)
 
         ball_carrier = game.get_ball_carrier()
         if ball_carrier is not None:
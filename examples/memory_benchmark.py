@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Measures the memory held by a game in its first turn and by a 1,000-node search tree, where each node is a
+pathfinding node with its own square and the action leading to it.
+"""
+import tracemalloc
+import botbowl
+from botbowl.core import Action, ActionType, Square
+from botbowl.core.pathfinding.python_pathfinding import Node
+from botbowl.ai.bots.random_bot import RandomBot
+
+
+def allocated_bytes(create):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = create()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return obj, after - before
+
+
+def make_game(seed):
+    config = botbowl.load_config("gym-11")
+    config.fast_mode = True
+    ruleset = botbowl.load_rule_set(config.ruleset)
+    arena = botbowl.load_arena(config.arena)
+    home = botbowl.load_team_by_filename("human", ruleset)
+    away = botbowl.load_team_by_filename("human", ruleset)
+    game = botbowl.Game(seed, home, away, botbowl.Agent("home", human=True), botbowl.Agent("away", human=True),
+                        config, arena=arena, ruleset=ruleset, seed=seed)
+    game.init()
+    bot = RandomBot("bot", seed=seed)
+    while type(game.get_procedure()) is not botbowl.Turn:
+        game.step(bot.act(game))
+    return game
+
+
+def make_tree(num_nodes):
+    root = Node(None, Square(1, 1), 6, 2, 0, rr_states={(True, True, True, True): 1})
+    nodes = [(root, Action(ActionType.START_MOVE))]
+    for i in range(1, num_nodes):
+        parent = nodes[(i - 1) // 8][0]
+        position = Square(i % 26 + 1, i % 15 + 1)
+        nodes.append((Node(parent, position, 5, 2, 1.0), Action(ActionType.MOVE, position=position)))
+    return nodes
+
+
+if __name__ == "__main__":
+    num_games = 10
+    _, game_bytes = allocated_bytes(lambda: [make_game(seed) for seed in range(num_games)])
+    print(f"Game: {game_bytes / num_games / 1024:.1f} KiB per game")
+    _, tree_bytes = allocated_bytes(lambda: make_tree(1000))
+    print(f"Search tree: {tree_bytes / 1024:.1f} KiB per 1,000 nodes")
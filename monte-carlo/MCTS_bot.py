@@ -20,6 +20,9 @@ class Node:
         self.action = action
         self.evaluations = []
 
+        # handle to the game state after the action, set when the node is first expanded
+        self.state = None
+
         self.C = C
 
         self.n_wins = 0
@@ -85,6 +88,9 @@ class SearchBot(botbowl.Agent):
 
         # last action taken by the bot
         self.last_action = None
+
+        # seed of the dice and random choices in the rollouts, shared by all nodes of a search
+        self.rollout_seed = None
         
         # used for debugging errors
         self.debug = False
@@ -115,7 +121,8 @@ class SearchBot(botbowl.Agent):
     def rollout(self, game: botbowl.Game, node: Node):
         """Rollout operation of the Monte Carlo Tree Search.
         During rollout, we execute random actions from the available actions until we reach a terminal state.
-        Once at that state, we evaluate the use the terminated state to determine winner of the game.\n
+        Once at that state, we evaluate the use the terminated state to determine winner of the game.
+        All rollouts of a search use the same dice and random choices, so sibling nodes are compared under the same luck.\n
         If the winner is equals to None, this means the game ended in a DRAW, we return a score of -1. If the winner equals to the team of the bot, the bot has won and we return a score of 10. If the winner of the game is neither None nor the bot's team, this means that the bot lost and we return a score of -5.
 
         Args:
@@ -126,10 +133,11 @@ class SearchBot(botbowl.Agent):
             int: The score reached at the terminal state.
         """
         step_before_rollout = game.get_step()
+        game.set_random_streams(self.rollout_seed)
         if self.debug:
             print(f'condition 1: {not game.state.game_over and len(node.children) == 0}')
         while not game.state.game_over and len(node.children) == 0:
-            action = np.random.choice(node.extract_children(game).children).action
+            action = game.rnd.choice(node.extract_children(game).children).action
             if action.action_type != botbowl.ActionType.PLACE_PLAYER:
                 # this action might appear as availble if a player was downed, 
                 # but we do not want to take it as it would break the game
@@ -149,20 +157,26 @@ class SearchBot(botbowl.Agent):
             # LOST  -- the bot lost
             score = self.LOSS
 
-        # rollback the game state before we did the rollout
-        game.revert(step_before_rollout) # not sure if necessary
+        # rollback the game state and random streams before we did the rollout
+        game.revert(step_before_rollout)
 
         return score
     
 
     def expand(self, game: botbowl.Game, node: Node):
         """Expand the provided node by adding it to the list of traversed nodes, then extract the children of that node.
+        The first time a node is expanded its action is stepped and the resulting state is saved on the node. Later
+        expansions load the saved state, which only redoes the steps between the current node and this one.
 
         Args:
             game (botbowl.Game): The current game state.
             node (Node): The node that we traversed and extract the children of.
         """
-        game.step(node.action)
+        if node.state is None:
+            game.step(node.action)
+            node.state = game.save_state()
+        else:
+            game.load_state(node.state)
         self.path.append(node)
         node.extract_children(game=game)
         
@@ -196,7 +210,7 @@ class SearchBot(botbowl.Agent):
         game_copy.enable_forward_model()
         game_copy.home_agent.human = True
         game_copy.away_agent.human = True
-        root_step = game_copy.get_step()
+        root_state = game_copy.save_state()
 
         # define root node
         root_node = Node()
@@ -238,6 +252,7 @@ class SearchBot(botbowl.Agent):
                 return pick_up_action
 
         root_node.extract_children(game=game_copy)
+        self.rollout_seed = np.random.randint(2 ** 31)
 
         # (unused) timer start for time budget calculations
         start = time.time()
@@ -260,7 +275,7 @@ class SearchBot(botbowl.Agent):
                 # if time.time() - start >= self.time_budget:
                 #     break
             
-            game_copy.revert(root_step)
+            game_copy.load_state(root_state)
 
         # select the best action from the root node's children using argmax, set it as the last action
         self.last_action = root_node.children[np.argmax([n.n_wins for n in root_node.children])].action
@@ -0,0 +1,63 @@
+import numpy as np
+
+from botbowl.ai.codec import ObsCodec
+from botbowl.ai.env import BotBowlEnv, EnvConf
+
+
+def collect_observations(env, num_steps):
+    rnd = np.random.RandomState(0)
+    observations = []
+    env.reset()
+    for _ in range(num_steps):
+        spatial_obs, non_spatial_obs, mask = env.get_state()
+        observations.append((spatial_obs.copy(), non_spatial_obs.copy(), mask.copy()))
+        _, _, done, _ = env.step(rnd.choice(np.flatnonzero(mask)))
+        if done:
+            env.reset()
+    return [np.stack(arrays) for arrays in zip(*observations)]
+
+
+def test_codec_is_lossless_for_float_obs():
+    env = BotBowlEnv(EnvConf(size=11), seed=0)
+    codec = ObsCodec(env)
+    spatial_obs, non_spatial_obs, masks = collect_observations(env, 100)
+
+    codes = codec.encode_batch(spatial_obs, non_spatial_obs, masks)
+    assert codes.dtype == np.uint8
+    assert codes.shape == (100, codec.code_size)
+    assert codec.code_size * 8 < spatial_obs[0].nbytes
+
+    decoded_spatial, decoded_non_spatial, decoded_masks = codec.decode_batch(codes)
+    assert decoded_spatial.dtype == np.float32
+    assert np.array_equal(decoded_spatial, spatial_obs)
+    assert np.array_equal(decoded_non_spatial, non_spatial_obs)
+    assert np.array_equal(decoded_masks, masks)
+
+    spatial, non_spatial, mask = codec.decode(codec.encode((spatial_obs[7], non_spatial_obs[7], masks[7])))
+    assert np.array_equal(spatial, spatial_obs[7])
+    assert np.array_equal(non_spatial, non_spatial_obs[7])
+    assert np.array_equal(mask, masks[7])
+
+
+def test_codec_decodes_quantized_obs():
+    env = BotBowlEnv(EnvConf(size=11, obs_dtype=np.uint8), seed=0)
+    codec = ObsCodec(env)
+    spatial_obs, non_spatial_obs, masks = collect_observations(env, 50)
+
+    decoded_spatial, decoded_non_spatial, decoded_masks = codec.decode_batch(
+        codec.encode_batch(spatial_obs, non_spatial_obs, masks))
+    assert decoded_spatial.dtype == np.float32
+    assert np.allclose(decoded_spatial, spatial_obs / 255, atol=0.5 / 255)
+    assert np.allclose(decoded_non_spatial, non_spatial_obs / 255)
+    assert np.array_equal(decoded_masks, masks)
+
+
+def test_codec_classifies_layers():
+    env = BotBowlEnv(EnvConf(size=11), seed=0)
+    codec = ObsCodec(env)
+    names = [layer.name() for layer in env.env_conf.layers]
+    binary = {names[i] for i in codec.binary_layers}
+    small_int = {names[i] for i in codec.small_int_layers}
+    assert {'occupied', 'own players', 'balls', 'standing players'} <= binary
+    assert {'own tackle zones', 'movement allowence', 'strength', 'agility', 'armor value'} <= small_int
+    assert len(codec.binary_layers) + len(codec.small_int_layers) + len(codec.float_layers) == len(names)
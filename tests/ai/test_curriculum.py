@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from botbowl.core import Agent, Action, ActionType
+import botbowl.core.procedure as procedures
+from botbowl.ai.env import BotBowlEnv, EnvConf, RewardWrapper, ScriptedActionWrapper
+from botbowl.ai.curriculum import StartStatePool, StartStateWrapper, collect_start_states
+
+
+def test_collect_and_restore_start_states():
+    states = []
+
+    def weight_func(game):
+        states.append(game.state.to_json())
+        return float(game.state.round)
+
+    pool = collect_start_states(['random', 'random'], 1, EnvConf(size=3), collect_away=True, weight_func=weight_func)
+    assert len(pool) == len(states) > 0
+    assert np.array_equal(pool.weights, [state['round'] for state in states])
+
+    for idx in [0, len(pool) - 1]:
+        home_agent, away_agent = Agent("home", human=True), Agent("away", human=True)
+        game = pool.restore(idx, home_agent, away_agent)
+        assert game.home_agent is home_agent and game.away_agent is away_agent
+        assert type(game.get_procedure()) is procedures.Turn
+        state = game.state.to_json()
+        for clock, expected_clock in zip(state.pop('clocks'), states[idx].pop('clocks')):
+            assert abs(clock['running_time'] - expected_clock['running_time']) < 0.05
+        assert state == states[idx]
+        assert not game.trajectory.enabled
+        game.enable_forward_model()
+
+
+def test_start_state_wrapper(tmpdir):
+    pool = collect_start_states(['random', 'random'], 1, EnvConf(size=3), weight_func=lambda game: game.state.round)
+    pool.save(str(tmpdir.join('pool.pkl')))
+    pool = StartStatePool.load(str(tmpdir.join('pool.pkl')))
+    weights = np.zeros(len(pool))
+    weights[-1] = 1.0
+    pool.set_weights(weights)
+
+    env = StartStateWrapper(BotBowlEnv(EnvConf(size=3), seed=0), pool)
+    rnd = np.random.RandomState(0)
+    for _ in range(3):
+        _, _, mask = env.reset()
+        assert env.start_state_idx == len(pool) - 1
+        assert env.root_env.home_team_active()
+        done = False
+        while not done:
+            (_, _, mask), _, done, _ = env.step(rnd.choice(np.flatnonzero(mask)))
+
+    env.start_state_prob = 0.0
+    env.reset()
+    assert env.start_state_idx is None
+    assert env.game.state.round == 0
+
+
+def test_start_state_wrapper_composes_with_outer_wrappers():
+    pool = collect_start_states(['random', 'random'], 1, EnvConf(size=3))
+    with pytest.raises(TypeError):
+        StartStateWrapper(RewardWrapper(BotBowlEnv(EnvConf(size=3)), home_reward_func=lambda game: 0.0), pool)
+
+    scripted_calls = []
+
+    def scripted_func(game):
+        scripted_calls.append(game.get_step())
+        return None
+
+    env = ScriptedActionWrapper(StartStateWrapper(BotBowlEnv(EnvConf(size=3), seed=0), pool), scripted_func)
+    env.reset()
+    assert env.get_wrapper_with_type(StartStateWrapper).start_state_idx is not None
+    assert len(scripted_calls) == 1
+
+
+class EndingBot(Agent):
+    """
+    Ends the game when it is asked for an action.
+    """
+
+    def __init__(self):
+        super().__init__("Ending bot")
+
+    def new_game(self, game, team):
+        pass
+
+    def act(self, game):
+        game.state.game_over = True
+        return Action(ActionType.END_TURN)
+
+    def end_game(self, game):
+        pass
+
+
+def test_start_state_wrapper_falls_back_when_the_game_ends():
+    pool = collect_start_states(['random', 'random'], 1, EnvConf(size=3), collect_home=False, collect_away=True)
+    env = StartStateWrapper(BotBowlEnv(EnvConf(size=3), seed=0, away_agent=EndingBot()), pool)
+    _, _, mask = env.reset()
+    assert env.start_state_idx is None
+    assert not env.game.state.game_over
+    assert mask.any()
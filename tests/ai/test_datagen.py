@@ -0,0 +1,96 @@
+import os
+import numpy as np
+import pytest
+
+import botbowl
+from botbowl.ai.env import BotBowlEnv, EnvConf
+from botbowl.ai.datagen import ShardWriter, ShardDataset, create_schema, write_index, generate_dataset, \
+    replay_game, convert_replays
+
+
+@pytest.mark.parametrize("obs_dtype", [np.float32, np.uint8])
+def test_shard_writer_round_trip(tmp_path, obs_dtype):
+    env = BotBowlEnv(EnvConf(size=3, obs_dtype=obs_dtype), away_agent='human')
+    schema = create_schema(env)
+    writer = ShardWriter(str(tmp_path), schema, prefix="000", shard_size=16)
+    samples = []
+    spatial_obs, non_spatial_obs, mask = env.reset()
+    rnd = np.random.RandomState(0)
+    for _ in range(40):
+        action_idx = rnd.choice(np.where(mask)[0])
+        writer.append(spatial_obs, non_spatial_obs, mask, action_idx)
+        samples.append((spatial_obs, non_spatial_obs, mask, action_idx))
+        (spatial_obs, non_spatial_obs, mask), _, done, _ = env.step(action_idx)
+        assert not done
+    shards = writer.close()
+    assert [shard['num_samples'] for shard in shards] == [16, 16, 8]
+    write_index(str(tmp_path), schema, shards)
+
+    dataset = ShardDataset(str(tmp_path))
+    assert len(dataset) == len(samples)
+    obs_max = 1 if obs_dtype == np.float32 else 255
+    for i, (spatial_obs, non_spatial_obs, mask, action_idx) in enumerate(samples):
+        decoded = dataset[i]
+        assert decoded[0].dtype == np.float32
+        assert np.allclose(decoded[0], spatial_obs / obs_max, atol=0.5 / obs_max)
+        assert np.allclose(decoded[1], non_spatial_obs / obs_max)
+        assert np.array_equal(decoded[2], mask)
+        assert decoded[3] == action_idx
+    batches = list(dataset.iterate(batch_size=10))
+    assert [len(batch[3]) for batch in batches] == [10, 6, 10, 6, 8]
+    assert np.array_equal(np.concatenate([batch[3] for batch in batches]), [sample[3] for sample in samples])
+
+
+@pytest.mark.parametrize("num_processes", [1, 2])
+def test_generate_dataset(tmp_path, num_processes):
+    dataset = generate_dataset(str(tmp_path), ('random', 'random'), num_games=2, env_conf=EnvConf(size=1),
+                               num_processes=num_processes, shard_size=500)
+    assert len(dataset) > 0
+    assert len({shard['name'].split('_')[0] for shard in dataset.shards}) == num_processes
+    for spatial_obs, non_spatial_obs, mask, action_idx in dataset.iterate(batch_size=256):
+        assert mask[np.arange(len(action_idx)), action_idx].all()
+
+
+def record_game(seed, human):
+    config = botbowl.load_config("gym-1")
+    ruleset = botbowl.load_rule_set(config.ruleset)
+    home = botbowl.load_team_by_filename("human", ruleset)
+    away = botbowl.load_team_by_filename("human", ruleset)
+    agents = [botbowl.Agent("human", human=True) if human else botbowl.make_bot('random') for _ in range(2)]
+    game = botbowl.Game(str(seed), home, away, agents[0], agents[1], config, ruleset=ruleset, seed=seed, record=True)
+    game.init()
+    bot = botbowl.make_bot('random')
+    while not game.state.game_over:
+        game.step(bot.act(game))
+    return game
+
+
+@pytest.mark.parametrize("human", [False, True])
+def test_replay_game(tmp_path, monkeypatch, human):
+    monkeypatch.setattr(botbowl.core.model, "get_data_path", lambda rel_path: str(tmp_path))
+    game = record_game(0, human)
+    actions = []
+    replayed_game = replay_game(game.replay, lambda g, action: actions.append(action))
+    assert replayed_game.state.game_over
+    assert [report.to_json() for report in replayed_game.state.reports] == \
+        [report.to_json() for report in game.state.reports]
+    assert len(actions) == len(game.replay.actions) - (0 if human else 1)
+
+
+def test_convert_replays(tmp_path, monkeypatch):
+    monkeypatch.setattr(botbowl.core.model, "get_data_path", lambda rel_path: str(tmp_path / "replays"))
+    for seed in range(3):
+        record_game(seed, human=False)
+    replay_files = sorted(str(path) for path in (tmp_path / "replays").glob("*.rep"))
+    directory = str(tmp_path / "dataset")
+    dataset = convert_replays(replay_files[:2], directory, env_conf=EnvConf(size=1), num_processes=2, shard_size=100)
+    num_samples = len(dataset)
+    assert num_samples > 0
+    for spatial_obs, non_spatial_obs, mask, action_idx in dataset.iterate(batch_size=64):
+        assert mask[np.arange(len(action_idx)), action_idx].all()
+
+    # Converted replays are skipped when the conversion is resumed
+    os.remove(replay_files[0])
+    dataset = convert_replays(replay_files, directory, env_conf=EnvConf(size=1), shard_size=100)
+    assert len(dataset) > num_samples
+    assert len({shard['name'].rsplit('_', 1)[0] for shard in dataset.shards}) == 3
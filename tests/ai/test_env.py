@@ -7,7 +7,7 @@ from typing import Optional
 import numpy as np
 
 import botbowl
-from botbowl.ai.env import BotBowlEnv, ScriptedActionWrapper, RewardWrapper, EnvConf
+from botbowl.ai.env import BotBowlEnv, SyncBotBowlVecEnv, ScriptedActionWrapper, RewardWrapper, EnvConf
 from examples.a2c.a2c_env import A2C_Reward
 import gym
 
@@ -45,6 +45,18 @@ def test_compute_action():
         assert action.position == same_action.position, f"Wrong position: {action} != {same_action}"
 
 
+def test_action_to_idx():
+    env = BotBowlEnv()
+    env.reset()
+    square = env.game.get_square(3, 4)
+    move_idx = env.action_to_idx(botbowl.Action(botbowl.ActionType.MOVE, position=square), flip=False)
+    assert move_idx == env._compute_action_idx(botbowl.Action(botbowl.ActionType.MOVE, position=square), flip=False)
+    assert env.action_to_idx(botbowl.Action(botbowl.ActionType.END_TURN)) is not None
+    assert env.action_to_idx(botbowl.Action(botbowl.ActionType.MOVE)) is None
+    assert env.compute_action(move_idx, flip=False)[0].position is square
+    assert env.action_to_idx(botbowl.Action(botbowl.ActionType.PLACE_PLAYER, position=square)) is None
+
+
 def test_reward_and_scripted_wrapper():
 
     reward_func = A2C_Reward()
@@ -128,6 +140,227 @@ def test_observation_ranges(pathfinding):
     env.close()
 
 
+@pytest.mark.parametrize("obs_dtype", [np.float32, np.uint8])
+def test_observation_dtype(obs_dtype):
+    env = BotBowlEnv(EnvConf(size=1, obs_dtype=obs_dtype), away_agent='human')
+    float_env = BotBowlEnv(EnvConf(size=1, obs_dtype=np.float64), away_agent='human')
+    spatial_obs, non_spatial_obs, mask = env.reset()
+    float_env.game = env.game
+
+    assert spatial_obs.dtype == obs_dtype
+    assert non_spatial_obs.dtype == obs_dtype
+    assert env.observation_space.dtype == obs_dtype
+
+    rnd = np.random.RandomState(0)
+    done = False
+    while not done:
+        float_spatial_obs, float_non_spatial_obs, float_mask = float_env.get_state()
+        scale = 1.0 if obs_dtype == np.float32 else 255.0
+        assert np.allclose(spatial_obs / scale, float_spatial_obs, atol=1/255)
+        assert np.allclose(non_spatial_obs / scale, float_non_spatial_obs, atol=1/255)
+        assert np.array_equal(mask, float_mask)
+
+        action_idx = rnd.choice(np.where(mask)[0])
+        (spatial_obs, non_spatial_obs, mask), _, done, _ = env.step(action_idx)
+
+
+def test_observation_buffers_without_copy():
+    env = BotBowlEnv(EnvConf(size=1, copy_obs=False), away_agent='human')
+    spatial_obs, non_spatial_obs, mask = env.reset()
+    next_spatial_obs, next_non_spatial_obs, next_mask = env.get_state(flip=False)
+
+    assert np.shares_memory(spatial_obs, next_spatial_obs)
+    assert np.shares_memory(non_spatial_obs, next_non_spatial_obs)
+    assert np.shares_memory(mask, next_mask)
+
+    flipped_spatial_obs, _, _ = env.get_state(flip=True)
+    assert np.shares_memory(flipped_spatial_obs, next_spatial_obs)
+    assert np.array_equal(flipped_spatial_obs, next_spatial_obs[:, :, ::-1])
+
+
+def test_feature_layer_requires_produce():
+    class NoProduceLayer(botbowl.FeatureLayer):
+        def name(self):
+            return "no produce"
+
+    class ProduceLayer(NoProduceLayer):
+        def produce(self, game):
+            return np.ones((game.arena.height, game.arena.width))
+
+    with pytest.raises(TypeError):
+        NoProduceLayer()
+    env = BotBowlEnv(EnvConf(size=3, extra_feature_layers=[ProduceLayer()]))
+    spatial_obs, _, _ = env.reset()
+    assert (spatial_obs[-1] == 1).all()
+
+
+def test_get_states_requires_perspective_of_custom_layers():
+    class OwnBallLayer(botbowl.FeatureLayer):
+        def produce(self, game):
+            out = np.zeros((game.arena.height, game.arena.width))
+            ball_carrier = game.get_ball_carrier()
+            if ball_carrier is not None and ball_carrier.team is game.active_team:
+                out[ball_carrier.position.y, ball_carrier.position.x] = 1.0
+            return out
+
+        def name(self):
+            return "own ball"
+
+    class SharedLayer(OwnBallLayer):
+        def perspective(self):
+            return botbowl.Perspective.SHARED
+
+    env = BotBowlEnv(EnvConf(size=3, extra_feature_layers=[OwnBallLayer()]))
+    env.reset()
+    env.get_state()
+    with pytest.raises(ValueError):
+        env.get_states()
+    env = BotBowlEnv(EnvConf(size=3, extra_feature_layers=[SharedLayer()]))
+    env.reset()
+    env.get_states()
+
+
+def test_legacy_non_spatial_layout():
+    env = BotBowlEnv(EnvConf(size=3), away_agent='human')
+    fixed_env = BotBowlEnv(EnvConf(size=3, legacy_non_spatial=False), away_agent='human')
+    assert env.num_non_spatial_observables == fixed_env.num_non_spatial_observables + 1
+    num_state_features = 50
+    num_procedures = len(env.env_conf.procedures)
+    opp_apothecaries = 35
+    _, non_spatial_obs, mask = env.reset()
+    fixed_env.game = env.game
+    rnd = np.random.RandomState(0)
+    for _ in range(100):
+        _, fixed_non_spatial_obs, _ = fixed_env.get_state()
+        game = env.game
+        assert non_spatial_obs[opp_apothecaries] == (game.active_team.state.apothecaries / 2 if game.active_team else 0)
+        if game.active_team is not None:
+            opp_team = game.get_opp_team(game.active_team)
+            assert fixed_non_spatial_obs[opp_apothecaries] == opp_team.state.apothecaries / 2
+        legacy_only = [opp_apothecaries, num_state_features + num_procedures]
+        assert non_spatial_obs[num_state_features + num_procedures] == 0
+        assert np.array_equal(np.delete(non_spatial_obs, legacy_only),
+                              np.delete(fixed_non_spatial_obs, opp_apothecaries))
+        (_, non_spatial_obs, mask), _, done, _ = env.step(rnd.choice(np.where(mask)[0]))
+        if done:
+            break
+
+
+def test_extra_non_spatial_features():
+    class OwnPlayersOnPitchFeature(botbowl.NonSpatialFeature):
+        def size(self):
+            return 2
+
+        def produce_into(self, game, team, out):
+            out[0] = len(game.get_players_on_pitch(team))
+            out[1] = len(game.get_players_on_pitch(game.get_opp_team(team)))
+
+        def name(self):
+            return "players on pitch"
+
+    env = BotBowlEnv(EnvConf(size=3, extra_non_spatial_features=[OwnPlayersOnPitchFeature()]), away_agent='human')
+    default_env = BotBowlEnv(EnvConf(size=3), away_agent='human')
+    _, non_spatial_obs, mask = env.reset()
+    default_env.game = env.game
+    num_features = sum(feature.size() for feature in default_env.env_conf.non_spatial_features)
+    assert env.num_non_spatial_observables == default_env.num_non_spatial_observables + 2
+
+    rnd = np.random.RandomState(0)
+    for _ in range(100):
+        _, default_non_spatial_obs, _ = default_env.get_state()
+        game = env.game
+        assert np.array_equal(non_spatial_obs[:num_features], default_non_spatial_obs[:num_features])
+        assert non_spatial_obs[num_features] == len(game.get_players_on_pitch(game.active_team))
+        assert non_spatial_obs[num_features + 1] == len(game.get_players_on_pitch(game.get_opp_team(game.active_team)))
+        assert np.array_equal(non_spatial_obs[num_features + 2:], default_non_spatial_obs[num_features:])
+        (_, non_spatial_obs, mask), _, done, _ = env.step(rnd.choice(np.where(mask)[0]))
+        if done:
+            break
+
+
+@pytest.mark.parametrize("obs_dtype", [np.float32, np.uint8])
+def test_get_states(obs_dtype):
+    env = BotBowlEnv(EnvConf(size=3, obs_dtype=obs_dtype), away_agent='human')
+    env.reset()
+    layer_idx = {layer.name(): i for i, layer in enumerate(env.env_conf.layers)}
+    empty_layers = [i for i, layer in enumerate(env.env_conf.layers)
+                    if layer.perspective() is botbowl.Perspective.ACTIVE_ONLY]
+    num_features = sum(feature.size() for feature in env.env_conf.non_spatial_features)
+    obs_max = 1 if obs_dtype is np.float32 else np.iinfo(obs_dtype).max
+
+    rnd = np.random.RandomState(0)
+    num_away_active = 0
+    for _ in range(200):
+        game = env.game
+        states = env.get_states()
+        active_obs = env.get_state()
+        active = 1 if env.away_team_active() else 0
+        num_away_active += active
+        for state, expected in zip(states[active], active_obs):
+            assert np.array_equal(state, expected)
+
+        # The other team sees its own players, its own half and no available actions
+        spatial_obs, non_spatial_obs, mask = states[1 - active]
+        team = game.get_opp_team(game.active_team)
+        own_players = np.zeros((env.height, env.width), dtype=obs_dtype)
+        opp_players = np.zeros((env.height, env.width), dtype=obs_dtype)
+        for player in game.get_players_on_pitch():
+            players = own_players if player.team is team else opp_players
+            players[player.position.y, player.position.x] = obs_max
+        own_half = np.array([[obs_max * (tile in (botbowl.TwoPlayerArena.home_tiles if team is game.state.home_team
+                                                  else botbowl.TwoPlayerArena.away_tiles)) for tile in row]
+                             for row in game.arena.board], dtype=obs_dtype)
+        if team is game.state.away_team:
+            own_players, opp_players, own_half = own_players[:, ::-1], opp_players[:, ::-1], own_half[:, ::-1]
+        assert np.array_equal(spatial_obs[layer_idx["own players"]], own_players)
+        assert np.array_equal(spatial_obs[layer_idx["opp players"]], opp_players)
+        assert np.array_equal(spatial_obs[layer_idx["own half"]], own_half)
+        assert not spatial_obs[empty_layers].any()
+        features = np.zeros(num_features, dtype=np.float32)
+        offset = 0
+        for feature in env.env_conf.non_spatial_features:
+            feature.produce_into(game, team, features[offset:offset + feature.size()])
+            offset += feature.size()
+        if obs_dtype is not np.float32:
+            features = np.rint(features * obs_max)
+        assert np.array_equal(non_spatial_obs[:num_features], features.astype(obs_dtype))
+        assert not non_spatial_obs[num_features:].any()
+        assert not mask.any()
+
+        _, _, done, _ = env.step(rnd.choice(np.where(active_obs[2])[0]))
+        if done:
+            break
+    assert num_away_active > 0
+
+
+@pytest.mark.parametrize("obs_dtype", [np.float32, np.uint8])
+def test_sync_vec_env(obs_dtype):
+    envs = [BotBowlEnv(EnvConf(size=1, obs_dtype=obs_dtype), seed=seed, away_agent='human') for seed in range(3)]
+    envs[2] = RewardWrapper(envs[2], home_reward_func=A2C_Reward())
+    vec_env = SyncBotBowlVecEnv(envs)
+    spatial_obs, non_spatial_obs, mask = vec_env.reset()
+    assert spatial_obs.shape == (3,) + envs[0].observation_space.shape
+    assert spatial_obs.dtype == obs_dtype
+
+    rnd = np.random.RandomState(0)
+    num_flipped = 0
+    num_done = 0
+    for _ in range(300):
+        for i, env in enumerate(envs):
+            env_spatial_obs, env_non_spatial_obs, env_mask = env.root_env.get_state() if i == 2 else env.get_state()
+            assert np.array_equal(spatial_obs[i], env_spatial_obs)
+            assert np.array_equal(non_spatial_obs[i], env_non_spatial_obs)
+            assert np.array_equal(mask[i], env_mask)
+        num_flipped += sum(game.active_team is game.state.away_team for game in vec_env.games)
+        actions = [rnd.choice(np.where(env_mask)[0]) for env_mask in mask]
+        (spatial_obs, non_spatial_obs, mask), rewards, dones, _ = vec_env.step(actions)
+        num_done += dones.sum()
+        for i in np.flatnonzero(dones):
+            assert not vec_env.games[i].state.game_over
+    assert num_flipped > 0
+    assert num_done > 0
+
+
 def worker(remote, parent_remote, env: BotBowlEnv):
     parent_remote.close()
     seed = env._seed
@@ -180,3 +413,33 @@ def test_multiple_gyms():
     for remote, p in zip(remotes, ps):
         remote.send('close')
         p.join()
+
+
+def test_factorized_actions():
+    env = BotBowlEnv(EnvConf(size=3), away_agent='human')
+    num_simple_actions = len(env.env_conf.simple_action_types)
+    rnd = np.random.RandomState(0)
+    env.reset()
+    for _ in range(300):
+        spatial_obs, non_spatial_obs, action_mask = env.get_state()
+        factorized_spatial_obs, factorized_non_spatial_obs, factorized_mask = env.get_factorized_state()
+        assert np.array_equal(factorized_spatial_obs, spatial_obs)
+        assert np.array_equal(factorized_non_spatial_obs, non_spatial_obs)
+        assert np.array_equal(factorized_mask.to_flat(env.board_squares), action_mask)
+
+        # Sample hierarchically: first the action type, then the position
+        action_type_idx = rnd.choice(np.flatnonzero(factorized_mask.action_type_mask))
+        position_idx = None
+        if action_type_idx >= num_simple_actions:
+            position_idx = rnd.choice(factorized_mask.positions[action_type_idx - num_simple_actions])
+        action_idx = env.flat_action_idx(action_type_idx, position_idx)
+        assert action_mask[action_idx]
+        assert env.factorize_action_idx(action_idx) == (action_type_idx, position_idx)
+
+        obs, _, done, _ = env.step(action_idx, skip_observation=True)
+        assert obs == (None, None, None)
+        if done:
+            env.reset(skip_observation=True)
+
+    with pytest.raises(ValueError):
+        env.flat_action_idx(num_simple_actions)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from botbowl.ai.env import BotBowlEnv, EnvConf
+from botbowl.ai.search import BatchedSearch, BatchedSearchBot
+
+
+def uniform_model(spatial_obs, non_spatial_obs, action_mask):
+    values = np.linspace(-0.5, 0.5, len(spatial_obs))
+    return values, action_mask / action_mask.sum(axis=1, keepdims=True)
+
+
+def assert_consistent(node):
+    assert np.array_equal(node.child_visits, np.round(node.child_visits))
+    for i, child in enumerate(node.children):
+        if child is None:
+            assert node.child_visits[i] == 0
+        elif child.terminal_value is None:
+            assert not child.pending
+            assert node.child_visits[i] == 1 + child.num_visits()
+            assert_consistent(child)
+
+
+def make_game(seed, num_steps):
+    env = BotBowlEnv(EnvConf(size=1), seed=seed, away_agent='human')
+    _, _, mask = env.reset()
+    rnd = np.random.RandomState(seed)
+    for _ in range(num_steps):
+        (_, _, mask), _, done, _ = env.step(rnd.choice(np.where(mask)[0]))
+    return env.game
+
+
+def game_state_without_clocks(game):
+    state = game.to_json()['state']
+    del state['clocks']
+    return state
+
+
+def test_batched_search():
+    game = make_game(0, 20)
+    state_before = game_state_without_clocks(game)
+    for batch_size in [1, 8]:
+        search = BatchedSearch(EnvConf(size=1), uniform_model, batch_size=batch_size, seed=0)
+        root = search.search(game, 100)
+        assert root.num_visits() == 100
+        assert_consistent(root)
+        if batch_size == 1:
+            assert search.num_model_calls == 101
+        else:
+            assert search.num_model_calls < 101
+    assert game_state_without_clocks(game) == state_before
+
+
+def test_batched_search_bot():
+    game = make_game(1, 30)
+    bot = BatchedSearchBot("search", EnvConf(size=1), uniform_model, num_simulations=20, batch_size=4, seed=0)
+    bot.new_game(game, game.active_team)
+    for _ in range(5):
+        if game.state.game_over:
+            break
+        action = bot.act(game)
+        assert game._is_action_allowed(action)
+        game.step(action)
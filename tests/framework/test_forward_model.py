@@ -3,7 +3,8 @@ from itertools import cycle
 from tests.util import *
 import pytest
 from copy import deepcopy
-from botbowl.core.forward_model import ReversibleSet
+import pickle
+from botbowl.core.forward_model import ReversibleSet, ReversibleList, ReversibleDict, AssignmentStep
 from botbowl.ai.registry import make_bot
 
 
@@ -61,6 +62,36 @@ def test_logged_state():
         ms.data = CantLogThis()
 
 
+def test_set_trajectory_tracks_instance_attributes():
+    class SlottedState(Reversible):
+        __slots__ = ('_trajectory', '_ignored_keys', 'values', 'unset')
+        shared = []
+
+        def __init__(self):
+            super().__init__()
+            self.values = [1]
+
+    class MyState(SlottedState):
+        def __init__(self):
+            super().__init__()
+            self.items = {1: 2}
+            self.ignored = []
+            self._private = []
+            self._ignored_keys.add('ignored')
+
+    trajectory = Trajectory()
+    trajectory.enabled = True
+    state = MyState()
+    state.set_trajectory(trajectory)
+    assert type(state.values) is ReversibleList and type(state.items) is ReversibleDict
+    assert type(state.ignored) is list and type(state._private) is list
+    assert type(MyState.shared) is list and not hasattr(state, 'unset')
+
+    state.values.append(2)
+    trajectory.revert(0)
+    assert state.values == [1]
+
+
 def test_logged_set():
     traj = Trajectory()
     traj.enabled = True
@@ -124,6 +155,29 @@ def test_forward_model_revert_every_step():
         game.step(get_random_action(game))
 
 
+def test_compacted_rollout_revert():
+    game = get_game()
+    for _ in range(20):
+        game.step(get_random_action(game))
+    game_at_checkpoint = deepcopy(game)
+    checkpoint = game.set_checkpoint()
+    for _ in range(200):
+        if game.state.game_over:
+            break
+        game.step(get_random_action(game))
+    game_at_end = deepcopy(game)
+    assert not game.trajectory.is_valid_step(checkpoint + 1)
+
+    steps = game.revert(checkpoint)
+    assert len({(id(step.owner), step.key) for step in steps if type(step) is AssignmentStep}) == \
+        len([step for step in steps if type(step) is AssignmentStep])
+    assert_game_states(game, game_at_checkpoint, equal=True)
+    game.forward(steps)
+    assert_game_states(game, game_at_end, equal=True)
+    game.revert(checkpoint)
+    assert_game_states(game, game_at_checkpoint, equal=True)
+
+
 def get_game(fast_mode=True, human_agents=True):
     config = load_config("bot-bowl")
     config.fast_mode = fast_mode
@@ -180,3 +234,189 @@ def test_immutability():
     with pytest.raises(AttributeError):
         sq.x = 2
     assert sq.x == 1
+
+
+def test_diff_since():
+    game = get_game(fast_mode=True, human_agents=True)
+    game_json = json.loads(json.dumps(game.to_json()))
+    while not game.state.game_over:
+        for _ in range(3):
+            game.step(get_random_action(game))
+            if game.state.game_over:
+                break
+        diff = json.loads(json.dumps(game.diff_since(game_json['step'])))
+        assert diff['from_step'] == game_json['step']
+        apply_game_diff(game_json, diff)
+        expected = json.loads(json.dumps(game.to_json()))
+        game_json['state']['clocks'] = expected['state']['clocks'] = None
+        assert game_json == expected
+
+
+def test_diff_since_compacted_step():
+    game = get_game(fast_mode=True, human_agents=True)
+    for _ in range(10):
+        game.step(get_random_action(game))
+    game_json = json.loads(json.dumps(game.to_json()))
+    game.set_checkpoint()
+    game.step(get_random_action(game))
+    step = game.get_step()
+    for _ in range(5):
+        game.step(get_random_action(game))
+    assert not game.trajectory.is_valid_step(step)
+    old_json = json.loads(json.dumps(game.to_json()))
+    diff = json.loads(json.dumps(game.diff_since(step)))
+    assert 'full_game' in diff
+    apply_game_diff(game_json, diff)
+    game_json['state']['clocks'] = old_json['state']['clocks'] = None
+    assert game_json == old_json
+
+
+def test_save_state_with_checkpoint_raises():
+    game = get_game(fast_mode=True, human_agents=True)
+    root = game.save_state()
+    game.step(get_random_action(game))
+    game.set_checkpoint()
+    game.step(get_random_action(game))
+    with pytest.raises(RuntimeError):
+        game.save_state()
+    with pytest.raises(RuntimeError):
+        game.load_state(root)
+    game.revert(root.step)
+    game.load_state(root)
+
+
+def test_swap_is_reverted():
+    game = get_game()
+    while type(game.get_procedure()) is not Setup:
+        game.step(get_random_action(game))
+    team = game.get_procedure().team
+    formation = [choice for choice in game.state.available_actions if choice.action_type.name.startswith("SETUP_")][0]
+    game.step(Action(formation.action_type))
+    game_before_swap = deepcopy(game)
+    step = game.get_step()
+    player_a, player_b = game.get_players_on_pitch(team)[:2]
+    game.swap(player_a, player_b)
+    assert_game_states(game, game_before_swap, equal=False)
+    game.revert(step)
+    assert_game_states(game, game_before_swap, equal=True)
+
+
+def test_revert_rewinds_dice():
+    game = get_game()
+    step = game.get_step()
+    rolls = [D6(game.dice).get_value() for _ in range(10)]
+    game.revert(step)
+    assert [D6(game.dice).get_value() for _ in range(10)] == rolls
+
+
+def test_action_index_follows_available_actions():
+    game = get_game_turn()
+    game.enable_forward_model()
+    step = game.get_step()
+    player = game.get_players_on_pitch(game.active_team)[0]
+    game.step(Action(ActionType.START_MOVE, player=player))
+    move = [choice for choice in game.state.available_actions if choice.action_type == ActionType.MOVE][0]
+    illegal = [square for square in game.get_adjacent_squares(player.position, occupied=True)
+               if square not in move.positions]
+    assert game._is_action_allowed(Action(ActionType.MOVE, position=move.positions[0]))
+    assert not game._is_action_allowed(Action(ActionType.MOVE, position=Square(0, 0)))
+    assert not game._is_action_allowed(Action(ActionType.BLOCK, position=move.positions[0]))
+    for square in illegal:
+        assert not game._is_action_allowed(Action(ActionType.MOVE, position=square))
+    game.revert(step)
+    assert not game._is_action_allowed(Action(ActionType.MOVE, position=move.positions[0]))
+    assert game._is_action_allowed(Action(ActionType.START_MOVE, player=player))
+
+
+def test_slotted_models_pickle_and_revert():
+    game = get_game_turn()
+    game.enable_forward_model()
+    step = game.get_step()
+    player = game.get_players_on_pitch(game.active_team)[0]
+    assert not hasattr(player.state, '__dict__')
+    # Bots can attach their own attributes to players
+    player.bot_role = "runner"
+    position = player.position
+    game.step(Action(ActionType.START_MOVE, player=player))
+    game.step(Action(ActionType.MOVE, position=game.get_available_actions()[0].positions[0]))
+    assert player.state.moves == 1
+    game.revert(step)
+    assert player.state.moves == 0 and player.position == position
+    for copied in [deepcopy(game), pickle.loads(pickle.dumps(game))]:
+        assert_game_states(game, copied, equal=True)
+        assert copied.get_player(player.player_id).bot_role == "runner"
+        square = copied.get_square(3, 4)
+        with pytest.raises(AttributeError):
+            square.x = 5
+
+
+def test_load_state_between_branches():
+    game = get_game()
+    for _ in range(20):
+        game.step(get_random_action(game))
+    root = game.save_state()
+    assert game.save_state() is root
+    copies = {root: deepcopy(game)}
+    handles = []
+    for branch in range(3):
+        game.load_state(root)
+        for depth in range(3):
+            for _ in range(5):
+                if not game.state.game_over:
+                    game.step(get_random_action(game))
+            handle = game.save_state()
+            handles.append(handle)
+            copies[handle] = deepcopy(game)
+    game.load_state(root)
+    assert_game_states(game, copies[root], equal=True)
+    for handle in reversed(handles):
+        game.load_state(handle)
+        assert_game_states(game, copies[handle], equal=True)
+    game.load_state(handles[-1])
+    game.step(get_random_action(game))
+    game.load_state(handles[1])
+    assert_game_states(game, copies[handles[1]], equal=True)
+
+
+def test_random_streams_are_common_and_reverted():
+    game = get_game()
+    for _ in range(20):
+        game.step(get_random_action(game))
+    step = game.get_step()
+    dice = game.dice
+    dice_index = dice.index
+    rnd = game.rnd
+    rollouts = []
+    for _ in range(2):
+        game.set_random_streams(7)
+        for _ in range(30):
+            if not game.state.game_over:
+                game.step(get_random_action(game))
+        rollouts.append(deepcopy(game))
+        game.revert(step)
+        assert game.dice is dice and game.rnd is rnd
+        assert game.dice.index == dice_index
+    assert_game_states(rollouts[0], rollouts[1], equal=True)
+
+
+def test_outcome_counter_follows_reports_and_revert():
+    game = get_game()
+    outcome_types = [OutcomeType.KNOCKED_DOWN, OutcomeType.SUCCESSFUL_DODGE, OutcomeType.TURNOVER]
+    counter = game.subscribe_outcomes(outcome_types)
+    step = game.get_step()
+    num_reports = len(game.state.reports)
+    for _ in range(200):
+        if not game.state.game_over:
+            game.step(get_random_action(game))
+    expected = np.zeros((2, len(outcome_types)), dtype=np.int64)
+    for outcome in game.state.reports[num_reports:]:
+        team = outcome.player.team if outcome.player is not None else outcome.team
+        if outcome.outcome_type in outcome_types and team is not None:
+            expected[0 if team is game.state.home_team else 1, outcome_types.index(outcome.outcome_type)] += 1
+    assert expected.sum() > 0
+    assert (counter.counts == expected).all()
+    game.revert(step)
+    assert (counter.counts == 0).all()
+    game.unsubscribe_outcomes(counter)
+    game.step(get_random_action(game))
+    assert (counter.counts == 0).all()
@@ -0,0 +1,29 @@
+import botbowl
+
+
+def test_replay_navigation(tmp_path, monkeypatch):
+    monkeypatch.setattr(botbowl.core.model, "get_data_path", lambda rel_path: str(tmp_path))
+    config = botbowl.load_config("gym-1")
+    ruleset = botbowl.load_rule_set(config.ruleset)
+    home = botbowl.load_team_by_filename("human", ruleset)
+    away = botbowl.load_team_by_filename("human", ruleset)
+    game = botbowl.Game("replay", home, away, botbowl.make_bot('random'), botbowl.make_bot('random'), config,
+                        ruleset=ruleset, seed=0, record=True)
+    game.init()
+    replay = game.replay
+    assert len(replay.actions) > 0
+
+    keys = sorted(replay.steps)
+    assert replay.first() is replay.steps[keys[0]]
+    visited = [replay.idx]
+    while replay.next() is not None:
+        visited.append(replay.idx)
+    assert visited == keys
+    assert replay.idx == keys[-1]
+
+    visited = [replay.idx]
+    while replay.prev() is not None:
+        visited.append(replay.idx)
+    assert visited == keys[::-1]
+
+    assert replay.last() is replay.steps[keys[-1]]
@@ -29,3 +29,18 @@ def test_get_adjacent_opponents():
             assert len(game.get_assisting_players(opponent, player)) == i-1
             i += 1
 
+
+def test_square_ids():
+    game = get_game_turn(empty=True)
+    width, height = game.arena.width, game.arena.height
+    squares = [game.get_square(x, y) for y in range(height) for x in range(width)]
+    assert len({hash(square) for square in squares}) == len(squares)
+    ids = game.get_square_ids(squares)
+    assert list(ids) == list(range(width * height))
+    assert all(game.get_square_by_id(game.get_square_id(square)) is square for square in squares)
+    assert game.get_squares_by_ids(ids[[3, 40]]) == [squares[3], squares[40]]
+    layer = np.zeros((height, width))
+    layer.flat[game.get_square_ids([Square(5, 2), None])] = 1
+    assert layer[2][5] == 1 and layer.sum() == 1
+    assert game.get_square(-1, 3) is game.get_square(-1, 3)
+    assert game.get_square(-1, 3) == Square(-1, 3) and game.get_square(-1, 3).out_of_bounds
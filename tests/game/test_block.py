@@ -184,3 +184,36 @@ def test_available_actions_on_block_reroll():
     assert len(actions) == 2
 
 
+def test_is_crowd_push():
+    game = get_game_turn(empty=True)
+    team = game.get_agent_team(game.actor)
+    opp_team = game.get_opp_team(team)
+    attacker = team.players[0]
+    defender = opp_team.players[0]
+    defender.extra_skills = []
+    game.put(attacker, Square(5, 3))
+    game.put(defender, Square(5, 2))
+    assert not game.is_crowd_push(attacker, defender)
+    push_squares = game.get_push_squares(attacker.position, defender.position)
+    assert push_squares == [Square(6, 1), Square(5, 1), Square(4, 1)]
+    assert all(square is game.get_square(square.x, square.y) for square in push_squares)
+    # Pushed from the sideline
+    game.remove(attacker)
+    game.remove(defender)
+    game.put(attacker, Square(5, 2))
+    game.put(defender, Square(5, 1))
+    assert game.is_crowd_push(attacker, defender)
+    push_squares = game.get_push_squares(attacker.position, defender.position)
+    assert len(push_squares) == 3
+    assert all(square.out_of_bounds for square in push_squares)
+    assert all(square is game.get_square(square.x, square.y) for square in push_squares)
+    # A diagonal block pushes towards the free square on the pitch
+    game.remove(attacker)
+    game.put(attacker, Square(4, 2))
+    assert not game.is_crowd_push(attacker, defender)
+    assert game.get_push_squares(attacker.position, defender.position) == [Square(6, 1)]
+    # Side step lets the defender choose any free adjacent square
+    defender.extra_skills = [Skill.SIDE_STEP]
+    game.remove(attacker)
+    game.put(attacker, Square(5, 2))
+    assert not game.is_crowd_push(attacker, defender)
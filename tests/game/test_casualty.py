@@ -252,6 +252,8 @@ def test_casualty_regeneration_failure():
     D6.fix(2)
     # add a value for casualty effect #2 - DEAD
     D6.fix(6)
+    # fix the second regeneration roll
+    D6.fix(2)
 
     game.step(Action(ActionType.START_BLOCK, player=attacker))
     game.step(Action(ActionType.BLOCK, position=defender.position))
@@ -0,0 +1,73 @@
+import pytest
+from botbowl.core.game import *
+from tests.util import *
+
+
+def dodge_setup(game):
+    team = game.get_agent_team(game.actor)
+    player = game.get_players_on_pitch(team=team)[1]
+    opp_player = game.get_players_on_pitch(game.get_opp_team(team))[1]
+    game.put(player, Square(11, 11))
+    game.put(opp_player, Square(12, 12))
+    game.set_available_actions()
+    game.step(Action(ActionType.START_MOVE, player=player))
+    return player
+
+
+def test_dodge_chance_node():
+    game = get_game_turn()
+    game.chance_nodes_enabled = True
+    player = dodge_setup(game)
+    game.step(Action(ActionType.MOVE, player=player, position=Square(11, 12)))
+    assert type(game.get_procedure()) is Dodge
+    assert len(game.state.available_actions) == 0
+    outcomes = game.get_chance_outcomes()
+    assert sum(outcome.probability for outcome in outcomes) == pytest.approx(1)
+    outcome_types = [outcome.outcome_type for outcome in outcomes]
+    assert set(outcome_types) == {OutcomeType.FAILED_DODGE, OutcomeType.SUCCESSFUL_DODGE}
+    success = outcomes[outcome_types.index(OutcomeType.SUCCESSFUL_DODGE)]
+    game.resolve_chance(success)
+    assert game.has_report_of_type(OutcomeType.SUCCESSFUL_DODGE)
+    assert player.position == Square(11, 12)
+    assert player.state.up
+
+
+def test_chance_nodes_disabled():
+    game = get_game_turn()
+    player = dodge_setup(game)
+    D6.fix(6)
+    game.step(Action(ActionType.MOVE, player=player, position=Square(11, 12)))
+    assert game.get_chance_outcomes() is None
+    assert game.has_report_of_type(OutcomeType.SUCCESSFUL_DODGE)
+
+
+@pytest.mark.parametrize("num_assists", [0, 1, 2])
+def test_block_chance_outcomes(num_assists):
+    game = get_game_turn(empty=True)
+    team = game.get_agent_team(game.actor)
+    attacker = team.players[0]
+    defender = game.get_opp_team(team).players[0]
+    game.put(attacker, Square(5, 5))
+    game.put(defender, Square(6, 5))
+    for i in range(num_assists):
+        game.put(team.players[i + 1], Square(7, 4 + i * 2))
+    num_dice = abs(game.num_block_dice(attacker, defender))
+    outcomes = Block(game, attacker, defender).chance_outcomes()
+    assert sum(outcome.probability for outcome in outcomes) == pytest.approx(1)
+    assert all(len(outcome.rolls) == num_dice for outcome in outcomes)
+    assert len(outcomes) == len(set(tuple(outcome.rolls) for outcome in outcomes))
+
+
+def test_armor_and_injury_chance_outcomes():
+    game = get_game_turn(empty=True)
+    team = game.get_agent_team(game.actor)
+    player = game.get_opp_team(team).players[0]
+    game.put(player, Square(5, 5))
+    armor = Armor(game, player).chance_outcomes()
+    broken = [outcome for outcome in armor if outcome.outcome_type == OutcomeType.ARMOR_BROKEN]
+    assert sum(outcome.probability for outcome in broken) == pytest.approx(
+        sum(1 for a in range(1, 7) for b in range(1, 7) if a + b > player.get_av()) / 36)
+    injury = Injury(game, player).chance_outcomes()
+    assert sum(outcome.probability for outcome in injury) == pytest.approx(1)
+    assert {outcome.outcome_type for outcome in injury} == \
+        {OutcomeType.STUNNED, OutcomeType.KNOCKED_OUT, OutcomeType.CASUALTY}
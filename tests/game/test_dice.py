@@ -1,5 +1,5 @@
 import pytest
-from botbowl.core.model import D3, D6, D8, BBDie
+from botbowl.core.model import D3, D6, D8, BBDie, DiceSource
 from botbowl.core.table import BBDieResult
 import numpy as np
 
@@ -108,3 +108,21 @@ def test_bb_fixation():
         assert BBDie(rnd).value == BBDieResult.DEFENDER_DOWN
     with pytest.raises(ValueError):
         BBDie.fix(1)
+
+
+@pytest.mark.parametrize("die", [D3, D6, D8])
+def test_dice_source(die):
+    sides = {D3: 3, D6: 6, D8: 8}[die]
+    results = [die(DiceSource(0)).value for _ in range(5)]
+    assert len(set(results)) == 1  # Same seed, same result
+    dice = DiceSource(1)
+    results = [die(dice).value for _ in range(DiceSource.BLOCK_SIZE + 1000)]
+    assert set(results) == set(range(1, sides + 1))
+    assert dice.index == DiceSource.BLOCK_SIZE + 1000
+    die.fix(1)
+    die.fix(2)
+    assert die(dice).value == 1
+    assert die(dice).value == 2
+    assert dice.index == DiceSource.BLOCK_SIZE + 1000
+    with pytest.raises(ValueError):
+        dice.randint(1, 6)
@@ -69,6 +69,9 @@ def test_dodge_skill_reroll_single_use_limit():
     D6.fix(4)  # pass on dodge skill
     D6.fix(1)  # fail second dodge
     D6.fix(6)  # second dodge skill use will pass - if the code is wrong!
+    D6.fix(5)  # armor roll
+    D6.fix(3)  # injury roll
+    D6.fix(2)  # injury roll
     game.step(Action(ActionType.MOVE, player=player, position=to))
     assert player.position == to
     assert player.state.up
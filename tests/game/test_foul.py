@@ -137,6 +137,9 @@ def test_foul_success_assist():
     d = 6
     D6.fix(d)
     D6.fix(defender.get_av() - d)
+    # Injury - no doubles
+    D6.fix(5)
+    D6.fix(3)
 
     game.step(Action(ActionType.START_FOUL, player=fouler))
     assert game.has_report_of_type(OutcomeType.FOUL_ACTION_STARTED)
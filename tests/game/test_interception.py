@@ -135,3 +135,18 @@ def test_interception_modifiers():
     interceptor.extra_skills = [Skill.EXTRA_ARMS]
     mod = game.get_catch_modifiers(interceptor, interception=True)
     assert mod == -1
+
+
+def test_interceptors_in_corridor():
+    # Diagonal pass from (2, 2) to (6, 6): only opponents on or next to the line and between the two can intercept
+    game, (passer, catcher, *opponents) = get_custom_game_turn(player_positions=[(2, 2), (6, 6)],
+                                                               opp_player_positions=[(4, 4), (5, 4), (3, 5), (7, 7),
+                                                                                     (6, 2), (1, 1)])
+    interceptors = game.get_interceptors(passer.position, catcher.position, opponents[0].team)
+    assert set(interceptors) == set(opponents[:3])
+    # Reversed direction, (3, 5) is now outside the bounding box
+    game.remove(opponents[0])
+    game.move(passer, Square(8, 8))
+    game.move(catcher, Square(4, 4))
+    interceptors = game.get_interceptors(passer.position, catcher.position, opponents[1].team)
+    assert set(interceptors) == {opponents[1], opponents[3]}
@@ -23,3 +23,24 @@ def test_team(race):
     assert len(home.players) >= 11
     assert len(away.players) >= 11
 
+
+def test_team_fresh_copy():
+    config = load_config("gym-11")
+    ruleset = load_rule_set(config.ruleset)
+    team = load_team_by_filename("human", ruleset)
+    game = Game(1, team, load_team_by_filename("orc", ruleset), Agent("human1", human=True),
+                Agent("human2", human=True), config, ruleset=ruleset)
+    game.init()
+    home = game.state.home_team
+    assert home is not team
+    assert home.team_id == team.team_id
+    assert home.state.rerolls == team.rerolls
+    for copied, original in zip(home.players, team.players):
+        assert copied is not original
+        assert copied.player_id == original.player_id
+        assert copied.team is home
+        assert copied.role is original.role
+        assert copied.state is not original.state
+        assert copied.extra_skills is not original.extra_skills
+    assert all(player.position is None for player in team.players)
+    assert all(not player.state.used for player in team.players)
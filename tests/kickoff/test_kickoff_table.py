@@ -140,9 +140,11 @@ def test_high_kick_touchback():
 
 def test_blitz_movement():
     game = get_game_kickoff()
+    D8.fix(4)  # Scatter direction
     D6.fix(1)  # Scatter
     D6.fix(5)  # Blitz
     D6.fix(5)  # Blitz
+    D6.fix(6)  # Really stupid
     game.step(Action(ActionType.PLACE_BALL, position=game.state.available_actions[0].positions[0]))
     assert game.has_report_of_type(OutcomeType.KICKOFF_BLITZ)
     actor = game.actor
@@ -425,6 +427,12 @@ def test_throw_a_rock_same_cas():
     game.state.away_team.state.fame = 0
     assert len(game.get_players_on_pitch(game.state.home_team)) == 11
     assert len(game.get_players_on_pitch(game.state.away_team)) == 11
+    # Replace the troll so a regeneration roll is not needed
+    troll = [player for player in game.get_players_on_pitch(game.state.away_team)
+             if player.has_skill(Skill.REGENERATION)][0]
+    position = troll.position
+    game.pitch_to_reserves(troll)
+    game.reserves_to_pitch(game.get_reserves(game.state.away_team)[0], position)
     D6.fix(1)  # Scatter
     D6.fix(5)  # Throw a rock
     D6.fix(6)  # Throw a rock
@@ -125,3 +125,25 @@ def test_player_count_setup(home_team):
     assert game.get_agent_team(game.actor) == team
     game.step(Action(ActionType.END_SETUP))
     assert game.get_agent_team(game.actor) != team
+
+
+@pytest.mark.parametrize("home_team", [True, False])
+def test_formation_setup(home_team):
+    game = get_game_setup(home_team)
+    team = game.state.home_team if home_team else game.state.away_team
+    proc = game.get_procedure()
+    assert type(proc) == Setup
+    for formation in proc.formations:
+        # Placing the players one by one must give the same setup as the bulk placement
+        expected = deepcopy(game)
+        expected_team = expected.state.home_team if home_team else expected.state.away_team
+        for action in formation.actions(expected, expected_team):
+            expected.step(action)
+        game.step(Action(ActionType.SETUP_FORMATION_SPREAD if formation.name == "Spread" else
+                         ActionType.SETUP_FORMATION_ZONE if formation.name == "Zone" else
+                         ActionType.SETUP_FORMATION_LINE if formation.name == "Line" else
+                         ActionType.SETUP_FORMATION_WEDGE))
+        assert game.is_setup_legal(team)
+        assert [player.position for player in team.players] == \
+               [player.position for player in expected_team.players]
+        assert len(game.get_reserves(team)) == len(expected.get_reserves(expected_team))
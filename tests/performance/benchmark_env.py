@@ -1,5 +1,5 @@
 from botbowl import RandomBot
-from botbowl.ai.env import BotBowlEnv
+from botbowl.ai.env import BotBowlEnv, EnvConf, SyncBotBowlVecEnv
 import numpy as np
 from time import perf_counter as timer
 
@@ -31,6 +31,15 @@ def run_game():
             steps += 1
     return steps
 
+def run_vec_env(num_envs=16, size=1, num_steps=500):
+    envs = [BotBowlEnv(EnvConf(size=size)) for _ in range(num_envs)]
+    vec_env = SyncBotBowlVecEnv(envs)
+    _, _, masks = vec_env.reset()
+    for _ in range(num_steps):
+        actions = [np.random.choice(np.where(mask)[0]) for mask in masks]
+        (_, _, masks), _, _, _ = vec_env.step(actions)
+    return num_envs * num_steps
+
 
 if __name__ == "__main__":
     start_time = timer()
@@ -38,4 +47,9 @@ if __name__ == "__main__":
     elapsed_time = timer() - start_time
 
 
-    print(f"took {elapsed_time:.2f} seconds, steps={steps}, step_rate = {elapsed_time/steps:.5f}")
\ No newline at end of file
+    print(f"took {elapsed_time:.2f} seconds, steps={steps}, step_rate = {elapsed_time/steps:.5f}")
+
+    start_time = timer()
+    steps = run_vec_env()
+    elapsed_time = timer() - start_time
+    print(f"vec env took {elapsed_time:.2f} seconds, steps={steps}, step_rate = {elapsed_time/steps:.5f}")
@@ -59,6 +59,27 @@ def normal_games():
     print(f"Forward model is {elapsed_time_fm_enabled/elapsed_time_fm_disabled:.2f}x slower")
 
 
+def compacted_rollouts():
+    nbr_of_games = 10
+    for compact in [False, True]:
+        log_length = 0
+        elapsed_time_revert = 0
+        for i in range(nbr_of_games):
+            game = Game(i, home, away, Agent('human1', human=True), Agent('human2', human=True), config, seed=i)
+            game.init()
+            game.enable_forward_model()
+            step = game.set_checkpoint() if compact else game.get_step()
+            bot = RandomBot('random', seed=i)
+            while not game.state.game_over:
+                game.step(bot.act(game))
+            log_length += len(game.trajectory) - step
+            start_time = timer()
+            game.revert(step)
+            elapsed_time_revert += timer() - start_time
+        print(f"{'Compacted' if compact else 'Full'} trajectory: {log_length / nbr_of_games:.0f} steps per game, "
+              f"reverted in {elapsed_time_revert / nbr_of_games * 1000:.1f} ms")
+
+
 def profile_forward_model_random_games():
     pr = cProfile.Profile()
 
@@ -75,4 +96,5 @@ def profile_forward_model_random_games():
 
 if __name__ == "__main__":
     normal_games()
+    compacted_rollouts()
     #profile_forward_model_random_games()
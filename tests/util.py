@@ -38,7 +38,7 @@ def get_game_turn(seed=0, empty=False, home_team: str = 'human', away_team: str
     game.step(Action(ActionType.END_SETUP))
     game.step(Action(ActionType.SETUP_FORMATION_WEDGE))
     game.step(Action(ActionType.END_SETUP))
-    random_agent = RandomBot("home")
+    random_agent = RandomBot("home", seed=seed)
     while type(game.get_procedure()) is not Turn or game.is_quick_snap() or game.is_blitz():
         action = random_agent.act(game)
         game.step(action)